@@ -1,46 +1,56 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g, send_file
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
-import json
-import sys
 import logging
+import threading
+import time
 import numpy as np
 from datetime import datetime
 from utils import InputAgent, OutputAgent
+from utils.output_agent import STREAM_DEFAULT_VISUALIZATIONS
 from utils.alert_system import alert_system, AlertType, AlertSeverity
 from utils.alert_templates import AlertTemplates, AlertUIComponents
+from utils.subscription_import import SubscriptionImporter, parse_subscription_rows
+from utils.event_stream import event_broker, format_sse, location_topic, contact_topic
+from utils.realtime_data_source import realtime_data_source
 from model_design import AirQualityPredictor
-from utils.geocoding import GeocodingService
+from utils.geocoding import geocoding_service, MAX_BATCH_LOCATIONS
+from utils.gazetteer import gazetteer
+from utils.pipeline import QueryPipeline, NO_LOCATION_MESSAGE
+from utils.metrics import (registry, timed, start_request_timings, request_timings, server_timing_header,
+                           HTTP_REQUEST_SECONDS, CONTENT_TYPE as METRICS_CONTENT_TYPE)
+from utils.profiling import (RequestProfile, admin_token_valid, list_profiles, process_profiler, profile_path,
+                             MAX_PROCESS_PROFILE_SECONDS, SAMPLE_INTERVAL_SECONDS)
+from utils.logging_config import configure_logging, Payload, SAMPLED
+from utils.serialization import FastJSONProvider, dumps
+from utils.compression import compress_response
+from utils.http_cache import StaticPayload, cached_response, grid_cell, make_etag, seconds_until_next_hour
 
 
 # Load environment variables
 load_dotenv()
 
-# Configure logging
+# Configure logging (records are written to stdout by a background thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-# Create console handler with formatting
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(formatter)
-
-# Add handler to logger
-logger.addHandler(console_handler)
-
 # Initialize Flask app and components
 app = Flask(__name__)
+# jsonify encodes numpy values and datetimes directly (orjson when installed)
+app.json = FastJSONProvider(app)
 CORS(app)
 input_agent = InputAgent()
 output_agent = OutputAgent()
 
 
-# Initialize ML model and geocoding service
+# Initialize ML model (geocoding_service is the shared process-wide instance)
 print("🚀 Initializing Air Quality Prediction Model...")
 predictor = AirQualityPredictor()
-geocoding_service = GeocodingService()
+
+# Index the offline gazetteer now rather than on the first geocoding request
+gazetteer.preload()
 
 # Load and train model on startup
 try:
@@ -56,6 +66,29 @@ except Exception as e:
     predictor.train_model(X, y)
     print("✅ Model trained in dry run mode!")
 
+# Request pipeline for /api/extract-parameters
+query_pipeline = QueryPipeline(input_agent, output_agent, geocoding_service, predictor)
+
+# Predictive alerts: evaluate subscriptions against batched model forecasts
+FORECAST_ALERT_HOURS = int(os.getenv('FORECAST_ALERT_HOURS', 6))
+FORECAST_ALERT_INTERVAL_SECONDS = int(os.getenv('FORECAST_ALERT_INTERVAL_SECONDS', 3600))
+if FORECAST_ALERT_INTERVAL_SECONDS > 0:
+    alert_system.start_forecast_monitoring(
+        predictor,
+        hours=FORECAST_ALERT_HOURS,
+        interval_seconds=FORECAST_ALERT_INTERVAL_SECONDS,
+        geocoder=geocoding_service
+    )
+
+# Server-Sent Events settings
+STREAM_HEARTBEAT_SECONDS = 15
+STREAM_MAX_SECONDS = int(os.getenv('STREAM_MAX_SECONDS', 900))  # clients reconnect automatically
+STREAM_RETRY_MS = 5000
+# Each open stream holds a server thread (gunicorn --threads 32), so cap them
+# well below the thread count to leave room for ordinary requests
+STREAM_MAX_CONNECTIONS = int(os.getenv('STREAM_MAX_CONNECTIONS', 8))
+stream_slots = threading.BoundedSemaphore(STREAM_MAX_CONNECTIONS)
+
 # Error handling
 class InvalidUsage(Exception):
     status_code = 400
@@ -79,12 +112,86 @@ def handle_invalid_usage(error):
     response.status_code = error.status_code
     return response
 
+# Compress large JSON and text responses (registered first, so it runs after the other after_request hooks)
+@app.after_request
+def compress_large_responses(response):
+    return compress_response(response)
+
+# Request timing: latency histogram plus a Server-Timing header with the stages
+# timed during the request (streamed responses report the stages before the body)
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    start_request_timings()
+
+@app.after_request
+def record_request_timing(response):
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint, status=str(response.status_code))
+    timings = request_timings() + [('total', elapsed * 1000)]
+    response.headers['Server-Timing'] = server_timing_header(timings)
+    return response
+
+# Gauges read when /metrics is scraped
+registry.gauge('auracast_alert_subscriptions', 'Alert subscriptions').set_function(
+    lambda: len(alert_system.user_alerts)
+)
+registry.gauge('auracast_alert_history_events', 'Events held in alert history').set_function(
+    lambda: len(alert_system.alert_history)
+)
+monitoring_lag = registry.gauge(
+    'auracast_monitoring_lag_seconds', 'How far a monitoring loop is behind its schedule', ['loop']
+)
+monitoring_lag.set_function(realtime_data_source.monitoring_lag_seconds, loop='realtime')
+monitoring_lag.set_function(alert_system.forecast_lag_seconds, loop='forecast')
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics"""
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+# Opt-in request profiling: "X-Profile: cprofile|sample" (or ?profile=...) with a
+# valid X-Admin-Token; the stored profile's file name comes back in X-Profile-File
+def require_admin():
+    if not admin_token_valid(request.headers.get('X-Admin-Token')):
+        raise InvalidUsage('A valid admin token is required', status_code=403)
+
+@app.before_request
+def start_request_profile():
+    mode = request.headers.get('X-Profile') or request.args.get('profile')
+    if not mode:
+        return
+    require_admin()
+    try:
+        profile = RequestProfile(mode.lower())
+    except ValueError as e:
+        raise InvalidUsage(str(e))
+    profile.start()
+    g.request_profile = profile
+
+@app.after_request
+def finish_request_profile(response):
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        response.headers['X-Profile-File'] = profile.stop()
+    return response
+
+@app.teardown_request
+def discard_request_profile(error=None):
+    # Requests that failed before after_request still stop their profiler
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        profile.stop()
+
 # Health check endpoint
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({
         'status': 'success',
-        'message': 'Service is running'
+        'message': 'Service is running',
+        'parameter_extraction': input_agent.get_stats(),
+        'analysis_cache': output_agent.analysis_cache.get_stats()
     })
 
 # Frontend metrics endpoint
@@ -95,7 +202,8 @@ def get_weather_metrics():
         # Default location (can be made configurable)
         default_location = request.args.get('location', 'Athlone')
         default_location = request.args.get('location', 'Athlone')
-        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # Predictions only depend on the hour, so the metrics are the same all hour
+        current_time = datetime.now().strftime('%Y-%m-%d %H:00:00')
         
         logger.info(f"Getting frontend metrics for {default_location}")
         
@@ -109,21 +217,23 @@ def get_weather_metrics():
             # Fallback to Athlone coordinates
             lat, lon = 53.2734, -8.1111
         
-        # Get comprehensive predictions
-        predictions = predictor.predict_comprehensive(lat, lon, current_time)
-
-        # Convert numpy types to native Python types and round to 2 decimal places
-        metrics = predictions['frontend_metrics']
-        converted_metrics = {k: round(float(v), 2) if hasattr(v, 'item') else v for k, v in metrics.items()}
-
-        # Return just the frontend metrics
-        return jsonify({
-            'status': 'success',
-            'location': default_location,
-            'coordinates': {'lat': lat, 'lon': lon},
-            'timestamp': current_time,
-            'metrics': converted_metrics
-        })
+        def build_metrics():
+            # Get comprehensive predictions
+            with timed('prediction'):
+                predictions = predictor.predict_comprehensive(lat, lon, current_time)
+            
+            # Return just the frontend metrics
+            return jsonify({
+                'status': 'success',
+                'location': default_location,
+                'coordinates': {'lat': lat, 'lon': lon},
+                'timestamp': current_time,
+                'metrics': predictions['frontend_metrics']
+            })
+        
+        # Revalidations within the hour are answered without predicting
+        etag = make_etag(predictor.model_version, default_location, grid_cell(lat, lon), current_time)
+        return cached_response(etag, build_metrics, max_age=seconds_until_next_hour())
         
     except Exception as e:
         logger.error(f"Error getting frontend metrics: {str(e)}")
@@ -156,7 +266,7 @@ def extract_parameters():
 
     try:
         data = request.get_json()
-        logger.info(f"Request data: {data}")
+        logger.info("Request data: %s", Payload(data), extra=SAMPLED)
     except Exception as e:
         logger.error(f"Error parsing JSON: {str(e)}")
         return jsonify({
@@ -192,62 +302,13 @@ def extract_parameters():
 
     try:
         logger.info("Processing request...")
-        # Extract parameters using Input Agent
-        extracted_params = input_agent.extract_parameters(data['prompt'])
-        
-        # Add original prompt to parameters
-        extracted_params['original_prompt'] = data['prompt']
-        
-        # Get model predictions using actual ML model
-        logger.info("Getting model predictions...")
-        
-        # Extract location and datetime from parameters
-        location_name = extracted_params.get('location')  # Don't provide default
-        if not location_name:
-            logger.error("No location found in prompt")
-            return jsonify({
-                'status_code': 400,
-                'display_text': "I couldn't find a location in your request. Could you please mention which area you'd like to know about? For example: 'How is the air quality in Dublin?' or 'What's the pollution level in Galway?'",
-                'metadata': {
-                    'status': 'error',
-                    'error': 'Location missing in prompt'
-                }
-            }), 400
-            
-        datetime_str = extracted_params.get('datetime', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))  # Default time
-        
-        logger.info(f"Location: {location_name}, DateTime: {datetime_str}")
-        
-        # Convert location name to coordinates using geocoding
-        coords = geocoding_service.geocode(location_name)
+        # Extraction, geocoding, prediction and analysis run as a concurrent pipeline
+        result, status_code = query_pipeline.run(data['prompt'])
         
-        if coords:
-            lat, lon = coords['lat'], coords['lon']
-            location_name = coords['display_name']
-            logger.info(f"Coordinates found: {lat}, {lon}")
-            
-            # Get model predictions
-            predictions = predictor.predict_comprehensive(lat, lon, datetime_str)
-            # Convert numpy types to native Python types and round to 2 decimal places
-            predictions = {k: round(float(v), 2) if hasattr(v, 'item') else v for k, v in predictions.items()}
-            logger.info(f"Model predictions generated successfully for coordinates: {lat}, {lon}")
-            
-        else:
-            logger.warning(f"Could not geocode location: {location_name}, using default coordinates")
-            # Fallback to default coordinates (New York)
-            default_lat, default_lon = 40.7128, -74.0060
-            predictions = predictor.predict_comprehensive(default_lat, default_lon, datetime_str)
-            location_name = "New York"  # Default location name for fallback
-            # Convert numpy types to native Python types and round to 2 decimal places
-            predictions = {k: round(float(v), 2) if hasattr(v, 'item') else v for k, v in predictions.items()}
-        
-        # Generate response using Output Agent
-        result = output_agent.analyze_predictions(predictions, extracted_params, lat, lon, location_name)
-        
-        app.logger.info(f"Final response: {result}")
+        app.logger.info("Final response: %s", Payload(result), extra=SAMPLED)
         app.logger.info("=== Request Processing Completed ===")
 
-        return jsonify(result), result['status_code']
+        return jsonify(result), status_code
         
     except Exception as e:
         app.logger.error(f"Error processing request: {str(e)}")
@@ -260,7 +321,115 @@ def extract_parameters():
             }
         }), 500
 
+@app.route('/api/extract-parameters/stream', methods=['POST'])
+def extract_parameters_stream():
+    """Streaming /api/extract-parameters over Server-Sent Events
+    
+    Sends the deterministic parts as soon as they are ready: 'parameters'
+    (the extracted query), 'predictions' (location, model predictions and
+    frontend_metrics) and 'dashboard' (visualizations built from the
+    predictions). The analysis follows as 'text' chunks while the model writes
+    it, then 'result' carries the complete /api/extract-parameters response.
+    An 'error' event ends the stream early if the query can't be answered.
+    """
+    data = request.get_json(silent=True)
+    prompt = data.get('prompt') if isinstance(data, dict) else None
+    if not isinstance(prompt, str) or not prompt.strip():
+        raise InvalidUsage("Provide a JSON body with a non-empty 'prompt'")
+    
+    def generate():
+        try:
+            extracted_params = input_agent.extract_parameters(prompt)
+            extracted_params['original_prompt'] = prompt
+            yield format_sse(extracted_params, event='parameters')
+            
+            location_name = extracted_params.get('location')
+            if not location_name:
+                yield format_sse({
+                    'status_code': 400,
+                    'display_text': NO_LOCATION_MESSAGE,
+                    'metadata': {'status': 'error', 'error': 'Location missing in prompt'}
+                }, event='error')
+                return
+            
+            datetime_str = extracted_params.get('datetime', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            lat, lon, location_name = query_pipeline.locate(location_name)
+            predictions = query_pipeline.predict(lat, lon, datetime_str)
+            yield format_sse({
+                'location': location_name,
+                'lat': lat,
+                'lon': lon,
+                'datetime': datetime_str,
+                'predictions': predictions,
+                'frontend_metrics': predictions.get('frontend_metrics', {})
+            }, event='predictions')
+            
+            yield format_sse(output_agent.build_dashboard_details(
+                predictions=predictions,
+                location=extracted_params.get('location', 'Unknown'),
+                suggested_vis=STREAM_DEFAULT_VISUALIZATIONS,
+                latitude=lat,
+                longitude=lon,
+                location_name=location_name
+            ), event='dashboard')
+            
+            for event, payload in output_agent.stream_analysis(predictions, extracted_params, lat, lon, location_name):
+                yield format_sse(payload, event=event)
+        except Exception as e:
+            app.logger.error(f"Error processing streamed request: {str(e)}")
+            yield format_sse({
+                'status_code': 500,
+                'display_text': "I apologize, but I'm having trouble processing your request right now. Please try again in a moment.",
+                'metadata': {'status': 'error', 'error': str(e)}
+            }, event='error')
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # disable proxy buffering (nginx)
+    return response
+
 # Integrated Alert Subscription (uses Input Agent context)
+@app.route('/api/geocode/batch', methods=['POST'])
+def geocode_batch():
+    """Geocode many location names, streaming NDJSON results as they resolve
+    
+    Body: a JSON array of names, {"locations": [...]}, or one name per line.
+    Gazetteer and cache hits come back immediately; remaining names are looked
+    up through the rate-limited Nominatim queue unless ?remote=false. Names
+    still queued at the batch deadline come back with status 'timeout'.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        locations = data.get('locations') if isinstance(data, dict) else data
+    else:
+        locations = [line.strip() for line in request.get_data(as_text=True).splitlines() if line.strip()]
+    
+    if not isinstance(locations, list) or not all(isinstance(l, str) for l in locations):
+        raise InvalidUsage('Expected a list of location names')
+    if not locations:
+        raise InvalidUsage('No locations provided')
+    if len(locations) > MAX_BATCH_LOCATIONS:
+        raise InvalidUsage(f'At most {MAX_BATCH_LOCATIONS} locations per request')
+    
+    remote = request.args.get('remote', 'true').lower() != 'false'
+    
+    def generate():
+        counts = {}
+        try:
+            for name, result, source in geocoding_service.geocode_many(locations, remote=remote):
+                counts[source] = counts.get(source, 0) + 1
+                line = {'location': name, 'status': 'ok' if result else source, 'source': source}
+                if result:
+                    line.update(lat=result['lat'], lon=result['lon'], display_name=result.get('display_name'))
+                yield dumps(line) + '\n'
+        except Exception as e:
+            logger.error(f"Error during batch geocoding: {str(e)}")
+            yield dumps({'status': 'error', 'message': 'Internal server error during batch geocoding'}) + '\n'
+            return
+        yield dumps({'summary': dict(counts, total=len(locations))}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/subscribe-alert', methods=['POST'])
 def subscribe_alert_from_query():
     """Subscribe to alerts based on user query context"""
@@ -366,6 +535,35 @@ def subscribe_alert():
             'message': 'Internal server error while subscribing to alerts'
         }), 500
 
+@app.route('/api/alerts/subscribe/bulk', methods=['POST'])
+def subscribe_alerts_bulk():
+    """Bulk-subscribe from an NDJSON, CSV or JSON array body
+    
+    Rows take contact_info, location, notification_methods and either a
+    template_id or an alert_type (plus optional custom_thresholds). Per-row
+    results are streamed back as NDJSON as each row's location resolves (so
+    not in row order), followed by a summary line.
+    """
+    body = request.get_data(as_text=True)
+    if not body.strip():
+        return jsonify({
+            'status_code': 400,
+            'message': 'Request body is empty'
+        }), 400
+    
+    rows = parse_subscription_rows(body, request.content_type)
+    importer = SubscriptionImporter(alert_system, geocoding_service)
+    
+    def generate():
+        try:
+            for result in importer.run(rows):
+                yield dumps(result) + '\n'
+        except Exception as e:
+            logger.error(f"Error during bulk subscription import: {str(e)}")
+            yield dumps({'status': 'error', 'message': 'Internal server error during bulk import'}) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
 @app.route('/api/alerts/unsubscribe/<alert_id>', methods=['DELETE'])
 def unsubscribe_alert(alert_id):
     """Unsubscribe user from alerts"""
@@ -456,20 +654,7 @@ def check_alerts():
         )
         
         # Convert to JSON-serializable format
-        alerts_data = []
-        for alert in triggered_alerts:
-            alerts_data.append({
-                'alert_id': alert.alert_id,
-                'user_id': alert.user_id,
-                'location': alert.location,
-                'parameter': alert.parameter,
-                'current_value': alert.current_value,
-                'threshold_value': alert.threshold_value,
-                'severity': alert.severity.value,
-                'message': alert.message,
-                'timestamp': alert.timestamp.isoformat(),
-                'is_resolved': alert.is_resolved
-            })
+        alerts_data = [alert.to_dict() for alert in triggered_alerts]
         
         return jsonify({
             'status_code': 200,
@@ -485,46 +670,61 @@ def check_alerts():
             'message': 'Internal server error while checking alerts'
         }), 500
 
-@app.route('/api/alerts/templates', methods=['GET'])
-def get_alert_templates():
-    """Get available alert templates for frontend"""
+@app.route('/api/alerts/check-forecast', methods=['POST'])
+def check_forecast_alerts():
+    """Check all subscriptions against the model forecast for the next N hours"""
     try:
-        templates = AlertTemplates.get_templates()
+        data = request.get_json(silent=True) or {}
+        hours = int(data.get('hours', FORECAST_ALERT_HOURS))
+        
+        if not 1 <= hours <= 72:
+            return jsonify({
+                'status_code': 400,
+                'message': 'hours must be between 1 and 72'
+            }), 400
+        
+        forecast_alerts = alert_system.check_forecast_alerts(predictor, hours=hours, geocoder=geocoding_service)
+        alerts_data = [alert.to_dict() for alert in forecast_alerts]
         
         return jsonify({
             'status_code': 200,
-            'templates': templates,
-            'count': len(templates)
+            'forecast_alerts': alerts_data,
+            'count': len(alerts_data),
+            'hours': hours
         }), 200
         
     except Exception as e:
-        app.logger.error(f"Error getting alert templates: {str(e)}")
+        app.logger.error(f"Error checking forecast alerts: {str(e)}")
         return jsonify({
             'status_code': 500,
-            'message': 'Internal server error while getting alert templates'
+            'message': 'Internal server error while checking forecast alerts'
         }), 500
 
+# Alert templates and UI components never change while the app runs; serialize them once
+_alert_templates = AlertTemplates.get_templates()
+ALERT_TEMPLATES_PAYLOAD = StaticPayload({
+    'status_code': 200,
+    'templates': _alert_templates,
+    'count': len(_alert_templates)
+})
+ALERT_UI_COMPONENTS_PAYLOAD = StaticPayload({
+    'status_code': 200,
+    'components': {
+        'alert_button': AlertUIComponents.get_alert_button_config(),
+        'alert_card': AlertUIComponents.get_alert_card_config(),
+        'alert_history': AlertUIComponents.get_alert_history_config()
+    }
+})
+
+@app.route('/api/alerts/templates', methods=['GET'])
+def get_alert_templates():
+    """Get available alert templates for frontend"""
+    return ALERT_TEMPLATES_PAYLOAD.response()
+
 @app.route('/api/alerts/ui-components', methods=['GET'])
 def get_alert_ui_components():
     """Get UI component configurations for alert system"""
-    try:
-        components = {
-            'alert_button': AlertUIComponents.get_alert_button_config(),
-            'alert_card': AlertUIComponents.get_alert_card_config(),
-            'alert_history': AlertUIComponents.get_alert_history_config()
-        }
-        
-        return jsonify({
-            'status_code': 200,
-            'components': components
-        }), 200
-        
-    except Exception as e:
-        app.logger.error(f"Error getting UI components: {str(e)}")
-        return jsonify({
-            'status_code': 500,
-            'message': 'Internal server error while getting UI components'
-        }), 500
+    return ALERT_UI_COMPONENTS_PAYLOAD.response()
 
 @app.route('/api/alerts/subscribe-from-template', methods=['POST'])
 def subscribe_from_template():
@@ -577,6 +777,110 @@ def subscribe_from_template():
             'message': 'Internal server error while subscribing from template'
         }), 500
 
+@app.route('/api/stream', methods=['GET'])
+def stream_events():
+    """Server-Sent Events stream of alerts and fresh readings
+    
+    Query params: location (alerts + readings for that location) and/or
+    contact_info (alerts for that subscriber). Replaces polling
+    /api/alerts/history and re-fetching dashboards.
+    """
+    location = request.args.get('location')
+    contact_info = request.args.get('contact_info')
+    
+    if not location and not contact_info:
+        raise InvalidUsage('Provide a location and/or contact_info to stream')
+    
+    topics = []
+    if location:
+        topics.append(location_topic(location))
+    if contact_info:
+        topics.append(contact_topic(contact_info))
+    
+    if not stream_slots.acquire(blocking=False):
+        response = jsonify({
+            'status': 'error',
+            'message': 'Too many open streams, please retry shortly'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(STREAM_RETRY_MS // 1000)
+        return response
+    
+    def generate():
+        # Subscribed and monitored only while the generator runs, so both are undone
+        # in its finally block when the client disconnects
+        subscription = event_broker.subscribe(topics)
+        if location:
+            # Keep readings for this location flowing while someone is listening
+            realtime_data_source.add_monitoring_location(location)
+            realtime_data_source.start_monitoring(alert_system)
+        deadline = time.monotonic() + STREAM_MAX_SECONDS
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            yield format_sse({'topics': topics}, event='subscribed')
+            while time.monotonic() < deadline:
+                message = subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                if message is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(message['data'], event=message['event'], event_id=message['id'])
+        finally:
+            event_broker.unsubscribe(subscription)
+            if location:
+                realtime_data_source.remove_monitoring_location(location)
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if the stream never started
+    response.call_on_close(stream_slots.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # disable proxy buffering (nginx)
+    return response
+
+# Admin: whole-process sampling profiles and stored profile downloads
+@app.route('/api/admin/profile', methods=['GET'])
+def process_profile_status():
+    require_admin()
+    return jsonify(process_profiler.status())
+
+@app.route('/api/admin/profile/start', methods=['POST'])
+def start_process_profile():
+    """Sample every thread (request, pipeline and monitoring) for up to MAX_PROCESS_PROFILE_SECONDS"""
+    require_admin()
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get('seconds', 30))
+        interval = float(data.get('interval', SAMPLE_INTERVAL_SECONDS))
+    except (TypeError, ValueError):
+        raise InvalidUsage("'seconds' and 'interval' must be numbers")
+    if seconds <= 0 or seconds > MAX_PROCESS_PROFILE_SECONDS or interval <= 0:
+        raise InvalidUsage(f"'seconds' must be between 0 and {MAX_PROCESS_PROFILE_SECONDS}, 'interval' positive")
+    try:
+        return jsonify(process_profiler.start(seconds, interval))
+    except RuntimeError as e:
+        raise InvalidUsage(str(e), status_code=409)
+
+@app.route('/api/admin/profile/stop', methods=['POST'])
+def stop_process_profile():
+    require_admin()
+    try:
+        return jsonify(process_profiler.stop())
+    except RuntimeError as e:
+        raise InvalidUsage(str(e), status_code=409)
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def get_profiles():
+    require_admin()
+    return jsonify({'profiles': list_profiles()})
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    require_admin()
+    path = profile_path(name)
+    if path is None:
+        raise InvalidUsage('Profile not found', status_code=404)
+    return send_file(path, mimetype='text/plain' if name.endswith('.collapsed') else 'application/octet-stream',
+                     as_attachment=True, download_name=name)
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -0,0 +1,185 @@
+"""
+ASGI entry point for AuraCast
+
+    uvicorn asgi:app --host 0.0.0.0 --port 8080
+
+The chat endpoints (/api/extract-parameters and its /stream variant) run as
+async handlers on AsyncQueryPipeline, so a request waiting on Gemini or
+Nominatim holds no thread and one instance can keep hundreds of them in
+flight. Every other route is served by the Flask app (app.py) through a WSGI
+adapter with its own thread pool.
+"""
+
+import logging
+import os
+import time
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, input_agent, output_agent, geocoding_service, predictor
+from utils.event_stream import format_sse
+from utils.metrics import HTTP_REQUEST_SECONDS, request_timings, server_timing_header, start_request_timings
+from utils.output_agent import STREAM_DEFAULT_VISUALIZATIONS
+from utils.pipeline import AsyncQueryPipeline, NO_LOCATION_MESSAGE
+from utils.query_extractor import resolve_datetime
+from utils.serialization import dumps_bytes, loads
+
+logger = logging.getLogger('app')
+
+# Threads serving the Flask routes (each open /api/stream connection holds one)
+WSGI_THREADS = int(os.getenv('WSGI_THREADS', 32))
+
+async_pipeline = AsyncQueryPipeline(input_agent, output_agent, geocoding_service, predictor)
+
+
+def json_response(payload, status_code: int = 200) -> Response:
+    return Response(dumps_bytes(payload) + b'\n', status_code=status_code, media_type='application/json')
+
+
+def _prompt_error(display_text: str, error: str) -> Response:
+    logger.error("Error: %s", error)
+    return json_response({
+        'status_code': 400,
+        'display_text': display_text,
+        'metadata': {
+            'status': 'error',
+            'error': error
+        }
+    }, 400)
+
+
+def _finish(request: Request, response: Response, started: float) -> Response:
+    """Request histogram and Server-Timing, as app.py's after_request hook does for Flask routes"""
+    elapsed = time.perf_counter() - started
+    HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=request.url.path,
+                                 status=str(response.status_code))
+    response.headers['Server-Timing'] = server_timing_header(request_timings() + [('total', elapsed * 1000)])
+    return response
+
+
+async def extract_parameters(request: Request) -> Response:
+    """/api/extract-parameters (see app.py) without a thread per request"""
+    started = time.perf_counter()
+    start_request_timings()
+    logger.info("=== New Request Received ===")
+
+    mimetype = request.headers.get('content-type', '').split(';')[0].strip().lower()
+    if not (mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))):
+        return _finish(request, _prompt_error("Invalid request format. Please provide a JSON request.",
+                                              'Request must be JSON'), started)
+    try:
+        data = loads(await request.body())
+    except ValueError:
+        return _finish(request, _prompt_error("Invalid JSON format. Please check your request format.",
+                                              'Invalid JSON'), started)
+    if not isinstance(data, dict) or 'prompt' not in data:
+        return _finish(request, _prompt_error(
+            "I didn't receive any question. What would you like to know about the air quality?",
+            'Missing prompt in request'), started)
+    if not isinstance(data['prompt'], str) or not data['prompt'].strip():
+        return _finish(request, _prompt_error(
+            "I didn't receive a valid question. Could you please rephrase your query?",
+            'Invalid prompt format'), started)
+
+    # The agents log through current_app; the context is copied into the pipeline's tasks
+    with flask_app.app_context():
+        try:
+            result, status_code = await async_pipeline.run_async(data['prompt'])
+            logger.info("=== Request Processing Completed ===")
+            response = json_response(result, status_code)
+        except Exception as e:
+            logger.error(f"Error processing request: {str(e)}")
+            response = json_response({
+                'status_code': 500,
+                'display_text': "I apologize, but I'm having trouble processing your request right now. Please try again in a moment.",
+                'metadata': {
+                    'status': 'error',
+                    'error': str(e)
+                }
+            }, 500)
+    return _finish(request, response, started)
+
+
+async def extract_parameters_stream(request: Request) -> Response:
+    """/api/extract-parameters/stream (see app.py) without a thread per request"""
+    started = time.perf_counter()
+    start_request_timings()
+    try:
+        data = loads(await request.body())
+    except ValueError:
+        data = None
+    prompt = data.get('prompt') if isinstance(data, dict) else None
+    if not isinstance(prompt, str) or not prompt.strip():
+        return _finish(request, json_response({'message': "Provide a JSON body with a non-empty 'prompt'"}, 400),
+                       started)
+
+    async def generate():
+        with flask_app.app_context():
+            try:
+                extracted_params = await input_agent.extract_parameters_async(prompt)
+                extracted_params['original_prompt'] = prompt
+                yield format_sse(extracted_params, event='parameters')
+
+                location_name = extracted_params.get('location')
+                if not location_name:
+                    yield format_sse({
+                        'status_code': 400,
+                        'display_text': NO_LOCATION_MESSAGE,
+                        'metadata': {'status': 'error', 'error': 'Location missing in prompt'}
+                    }, event='error')
+                    return
+
+                datetime_str = extracted_params.get('datetime') or resolve_datetime(None)
+                lat, lon, location_name = await async_pipeline.locate_async(location_name)
+                predictions = await async_pipeline.predict_async(lat, lon, datetime_str)
+                yield format_sse({
+                    'location': location_name,
+                    'lat': lat,
+                    'lon': lon,
+                    'datetime': datetime_str,
+                    'predictions': predictions,
+                    'frontend_metrics': predictions.get('frontend_metrics', {})
+                }, event='predictions')
+
+                yield format_sse(output_agent.build_dashboard_details(
+                    predictions=predictions,
+                    location=extracted_params.get('location', 'Unknown'),
+                    suggested_vis=STREAM_DEFAULT_VISUALIZATIONS,
+                    latitude=lat,
+                    longitude=lon,
+                    location_name=location_name
+                ), event='dashboard')
+
+                async for event, payload in output_agent.stream_analysis_async(
+                        predictions, extracted_params, lat, lon, location_name):
+                    yield format_sse(payload, event=event)
+            except Exception as e:
+                logger.error(f"Error processing streamed request: {str(e)}")
+                yield format_sse({
+                    'status_code': 500,
+                    'display_text': "I apologize, but I'm having trouble processing your request right now. Please try again in a moment.",
+                    'metadata': {'status': 'error', 'error': str(e)}
+                }, event='error')
+
+    response = StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',  # disable proxy buffering (nginx)
+    })
+    return _finish(request, response, started)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/extract-parameters', extract_parameters, methods=['POST']),
+        Route('/api/extract-parameters/stream', extract_parameters_stream, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app, workers=WSGI_THREADS)),
+    ],
+    # Same policy as Flask-CORS's defaults in app.py, for the async routes too
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+)
@@ -0,0 +1,4 @@
+"""
+Standalone benchmarks for the AuraCast backend
+Run from the backend directory, e.g. ``python -m benchmarks.bench_alert_memory``
+"""
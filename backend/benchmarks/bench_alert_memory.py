@@ -0,0 +1,173 @@
+"""
+Memory benchmark for alert subscriptions and alert history
+Compares the original dict-backed dataclasses (a per-subscription threshold
+list and a stored message per event) with slotted/interned subscriptions and
+the columnar AlertHistory.
+
+    python -m benchmarks.bench_alert_memory --events 1000000 --subscriptions 100000
+"""
+
+import argparse
+import gc
+import random
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from utils.alert_system import (AlertEvent, AlertHistory, AlertSeverity, AlertSystem, AlertType,
+                                UserAlert, format_alert_message, intern_thresholds)
+
+
+# Previous representations, kept here for comparison only
+@dataclass
+class LegacyThreshold:
+    parameter: str
+    warning_level: float
+    critical_level: float
+    unit: str
+    description: str
+
+
+@dataclass
+class LegacyUserAlert:
+    contact_info: str
+    location: str
+    alert_type: AlertType
+    thresholds: List[LegacyThreshold]
+    notification_method: str
+    is_active: bool = True
+    created_at: datetime = None
+    last_triggered: Optional[datetime] = None
+    context_from_query: Dict[str, Any] = None
+
+
+@dataclass
+class LegacyAlertEvent:
+    alert_id: str
+    contact_info: str
+    location: str
+    parameter: str
+    current_value: float
+    threshold_value: float
+    severity: AlertSeverity
+    message: str
+    timestamp: datetime
+    is_resolved: bool = False
+
+
+LOCATIONS = ['Dublin', 'Cork', 'Galway', 'Limerick', 'Waterford', 'London', 'Paris', 'Berlin']
+
+
+def measure(label: str, build) -> int:
+    """Traced memory still allocated once ``build`` returns, in bytes: what its result retains"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = len(result)
+    del result
+    gc.collect()
+    print(f"  {label:<28} {current / 1024 / 1024:9.1f} MiB  ({size} items)")
+    return current
+
+
+def legacy_subscriptions(n: int, defaults: Dict[AlertType, tuple]):
+    rng = random.Random(42)
+    alerts = {}
+    now = datetime.now()
+    for i in range(n):
+        alert_type = rng.choice(list(defaults))
+        location = rng.choice(LOCATIONS)
+        alerts[f"user{i}@example.com_{location}_{alert_type.value}_{i}"] = LegacyUserAlert(
+            contact_info=f"user{i}@example.com",
+            location=location.lower().title(),  # fresh string, as parsed from a request
+            alert_type=alert_type,
+            thresholds=[LegacyThreshold(t.parameter, t.warning_level, t.critical_level,
+                                        t.unit, t.description) for t in defaults[alert_type]],
+            notification_method=','.join(['email']),
+            created_at=now
+        )
+    return alerts
+
+
+def interned_subscriptions(n: int, defaults: Dict[AlertType, tuple]):
+    rng = random.Random(42)
+    alerts = {}
+    now = datetime.now()
+    for i in range(n):
+        alert_type = rng.choice(list(defaults))
+        location = rng.choice(LOCATIONS)
+        alerts[f"user{i}@example.com_{location}_{alert_type.value}_{i}"] = UserAlert(
+            contact_info=f"user{i}@example.com",
+            location=sys.intern(location.lower().title()),
+            alert_type=alert_type,
+            thresholds=intern_thresholds(defaults[alert_type]),
+            notification_method=sys.intern(','.join(['email'])),
+            created_at=now
+        )
+    return alerts
+
+
+def _event_fields(n: int, defaults: Dict[AlertType, tuple], subscriptions: int):
+    rng = random.Random(7)
+    start = datetime.now() - timedelta(days=30)
+    types = list(defaults)
+    for i in range(n):
+        u = rng.randrange(subscriptions)
+        alert_type = types[u % len(types)]
+        threshold = rng.choice(defaults[alert_type])
+        severity = rng.choice((AlertSeverity.MEDIUM, AlertSeverity.CRITICAL))
+        value = threshold.warning_level * rng.uniform(1.0, 2.0)
+        location = LOCATIONS[u % len(LOCATIONS)]
+        yield (f"user{u}@example.com_{location}_{alert_type.value}_{u}", f"user{u}@example.com",
+               location, alert_type, threshold, value, severity,
+               start + timedelta(seconds=i * 2))
+
+
+def legacy_history(n: int, defaults, subscriptions: int):
+    history = []
+    for alert_id, contact, location, alert_type, t, value, severity, ts in _event_fields(n, defaults, subscriptions):
+        history.append(LegacyAlertEvent(
+            alert_id=alert_id, contact_info=contact, location=location, parameter=t.parameter,
+            current_value=value, threshold_value=t.warning_level, severity=severity,
+            message=format_alert_message(alert_type, location, t, value, severity),
+            timestamp=ts
+        ))
+    return history
+
+
+def columnar_history(n: int, defaults, subscriptions: int):
+    history = AlertHistory()
+    for alert_id, contact, location, alert_type, t, value, severity, ts in _event_fields(n, defaults, subscriptions):
+        history.append(AlertEvent(
+            alert_id=alert_id, contact_info=contact, location=location,
+            current_value=value, threshold_value=t.warning_level, severity=severity,
+            timestamp=ts, threshold=t, alert_type=alert_type
+        ))
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--subscriptions', type=int, default=100_000)
+    args = parser.parse_args()
+
+    defaults = AlertSystem().default_thresholds
+
+    print(f"Subscriptions (n={args.subscriptions})")
+    before = measure('dataclass + list', lambda: legacy_subscriptions(args.subscriptions, defaults))
+    after = measure('slots + interned thresholds', lambda: interned_subscriptions(args.subscriptions, defaults))
+    print(f"  reduction: {100 * (1 - after / before):.0f}%")
+
+    print(f"Alert history (n={args.events})")
+    before = measure('list of dataclasses', lambda: legacy_history(args.events, defaults, args.subscriptions))
+    after = measure('columnar AlertHistory', lambda: columnar_history(args.events, defaults, args.subscriptions))
+    print(f"  reduction: {100 * (1 - after / before):.0f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,289 @@
+"""
+Micro-benchmarks for the AuraCast backend hot paths
+Times the predictor, AQI and humidity conversions, time parsing, local
+geocoding, alert checks and history queries, dashboard building, response
+serialization and compression on seeded synthetic data (benchmarks/synthetic.py), so every run does the same work.
+
+    python -m benchmarks.run_benchmarks
+    python -m benchmarks.run_benchmarks --group alerts --output before.json
+    python -m benchmarks.run_benchmarks --quick --baseline before.json
+
+Each case reports the best and median time per call over ``--repeat`` rounds;
+``--output`` saves them as JSON, with any sizes a case measures (subscribers,
+compressed bytes), and ``--baseline`` prints the change against an earlier run.
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import subprocess
+import time
+import timeit
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks import synthetic
+from model_design import AirQualityPredictor
+from utils.alert_system import AlertSystem
+from utils.location_cache import get_cached_coordinates
+from utils.output_agent import OutputAgent
+from utils.compression import brotli, compress
+from utils.serialization import dumps_bytes
+from utils.time_parser import TimeParser
+
+# Each round runs a case for at least this long
+MIN_ROUND_SECONDS = 0.2
+
+# (name, function, operations per call[, measured values]): names stay the same from run to run so
+# --baseline can match them; sizes and ratios that depend on the data go in the optional dict
+Case = Tuple[Any, ...]
+
+
+def predictor_cases(quick: bool) -> List[Case]:
+    predictor = synthetic.trained_predictor(rows=2000 if quick else 5000)
+    lats, lons, datetimes = synthetic.prediction_inputs(10000)
+    single = iter(range(10 ** 9))
+
+    def predict_one():
+        i = next(single) % len(lats)
+        predictor.predict_comprehensive(lats[i], lons[i], str(datetimes[i]))
+
+    cases = [('predict_comprehensive[1]', predict_one, 1)]
+    for n in ((1000,) if quick else (1000, 10000)):
+        cases.append((f'predict_batch[{n}]',
+                      lambda n=n: predictor.predict_batch(lats[:n], lons[:n], datetimes[:n]), n))
+    return cases
+
+
+def conversion_cases(quick: bool) -> List[Case]:
+    predictor = AirQualityPredictor()
+    pm25, o3 = synthetic.pollutant_pairs(10000)
+    q, temp_k = synthetic.humidity_inputs(10000)
+    pm25_list, o3_list = pm25.tolist(), o3.tolist()
+    q_list, temp_list = q.tolist(), temp_k.tolist()
+
+    def aqi_scalar():
+        for a, b in zip(pm25_list, o3_list):
+            predictor.calculate_aqi(a, b)
+
+    def humidity_scalar():
+        for a, b in zip(q_list, temp_list):
+            predictor.convert_specific_to_relative_humidity(a, b)
+
+    return [
+        ('calculate_aqi[10000 calls]', aqi_scalar, 10000),
+        ('calculate_aqi_array[10000]', lambda: predictor.calculate_aqi_array(pm25, o3), 10000),
+        ('convert_specific_to_relative_humidity[10000 calls]', humidity_scalar, 10000),
+        ('convert_specific_to_relative_humidity_array[10000]',
+         lambda: predictor.convert_specific_to_relative_humidity_array(q, temp_k), 10000),
+    ]
+
+
+def parsing_cases(quick: bool) -> List[Case]:
+    parser = TimeParser()
+    descriptors = synthetic.TIME_DESCRIPTORS
+    queries = synthetic.LOCATION_QUERIES
+    get_cached_coordinates(queries[0])  # load the gazetteer outside the timing
+
+    def parse_all():
+        for descriptor in descriptors:
+            parser.parse_time(descriptor, synthetic.REFERENCE_TIME)
+
+    def lookup_all():
+        for query in queries:
+            get_cached_coordinates(query)
+
+    return [
+        (f'TimeParser.parse_time[{len(descriptors)} descriptors]', parse_all, len(descriptors)),
+        (f'get_cached_coordinates[{len(queries)} queries]', lookup_all, len(queries)),
+    ]
+
+
+def alert_cases(quick: bool) -> List[Case]:
+    cases = []
+    readings = synthetic.air_quality_readings()
+    for n in ((10000,) if quick else (10000, 100000)):
+        system = synthetic.alert_system(n)
+        busiest = synthetic.LOCATIONS[0]
+        subscribers = len(system._location_index[busiest.lower()])
+        steady = readings[0]
+        toggles = iter(range(10 ** 9))
+
+        def check_changing(system=system, busiest=busiest, toggles=toggles):
+            # Alternating clean/polluted readings: every call changes alert state
+            system.check_alerts(busiest, readings[next(toggles) % len(readings)])
+
+        measured = {'subscribers_at_location': subscribers}
+        cases.append((f'check_alerts[{n} subs, busiest location, steady]',
+                      lambda system=system, busiest=busiest: system.check_alerts(busiest, steady), subscribers,
+                      measured))
+        cases.append((f'check_alerts[{n} subs, busiest location, changing]',
+                      check_changing, subscribers, measured))
+
+    events = 100000 if quick else 1000000
+    system = AlertSystem()
+    synthetic.alert_history(system, events, contacts=10000)
+    cases.extend([
+        (f'get_alert_history[{events} events, contact, 24h]',
+         lambda: system.get_alert_history(contact_info='user42@example.com', hours=24), 1),
+        (f'get_alert_history[{events} events, location, 24h]',
+         lambda: system.get_alert_history(location='Galway', hours=24), 1),
+        (f'get_alert_history[{events} events, all, 1h]',
+         lambda: system.get_alert_history(hours=1), 1),
+    ])
+    return cases
+
+
+def dashboard_cases(quick: bool) -> List[Case]:
+    # build_dashboard_details never calls the model, so skip OutputAgent.__init__ (and its API key)
+    agent = OutputAgent.__new__(OutputAgent)
+    predictions = synthetic.comprehensive_predictions()
+    suggestions = ['time_series', 'concentration map', 'wind_rose', 'NO2 spatial distribution',
+                   'pollutant comparison', 'forecast']
+    return [
+        (f'build_dashboard_details[{len(suggestions)} suggestions]',
+         lambda: agent.build_dashboard_details(predictions, 'Dublin', suggestions, 53.35, -6.26, 'Dublin'), 1),
+    ]
+
+
+def serialization_cases(quick: bool) -> List[Case]:
+    # Model outputs as the API returns them: numpy scalars, and arrays for batches
+    predictor = synthetic.trained_predictor(rows=2000)
+    lats, lons, datetimes = synthetic.prediction_inputs(10000)
+    single = predictor.predict_comprehensive(lats[0], lons[0], str(datetimes[0]))
+    cases = [('serialize_prediction[1]', lambda: dumps_bytes(single), 1)]
+    for n in ((1000,) if quick else (1000, 10000)):
+        batch = predictor.predict_batch(lats[:n], lons[:n], datetimes[:n])
+        cases.append((f'serialize_batch[{n}]', lambda batch=batch: dumps_bytes(batch), n))
+    return cases
+
+
+def compression_cases(quick: bool) -> List[Case]:
+    # Sizes and ratio are reported with the timings, to weigh time against ratio when picking levels
+    agent = OutputAgent.__new__(OutputAgent)
+    suggestions = ['time_series', 'concentration map', 'wind_rose', 'NO2 spatial distribution',
+                   'pollutant comparison', 'forecast']
+    dashboard = agent.build_dashboard_details(synthetic.comprehensive_predictions(), 'Dublin', suggestions,
+                                              53.35, -6.26, 'Dublin')
+    system = AlertSystem()
+    synthetic.alert_history(system, 100000, contacts=10000)
+    history = system.get_alert_history(location='Galway', hours=24)
+    predictor = synthetic.trained_predictor(rows=2000)
+    lats, lons, datetimes = synthetic.prediction_inputs(1000)
+    payloads = {
+        'dashboard': dumps_bytes(dashboard),
+        'alert_history[Galway, 24h]': dumps_bytes({'status_code': 200, 'alerts': history, 'count': len(history)}),
+        'predict_batch[1000]': dumps_bytes(predictor.predict_batch(lats, lons, datetimes)),
+    }
+    levels = [('gzip', level) for level in ((1, 6, 9) if quick else (1, 3, 6, 9))]
+    if brotli is not None:
+        levels += [('br', quality) for quality in ((1, 5, 11) if quick else (1, 4, 5, 6, 11))]
+
+    cases = []
+    for name, data in payloads.items():
+        for encoding, level in levels:
+            size = len(compress(data, encoding, level))
+            cases.append((f'compress[{name}, {encoding} {level}]',
+                          lambda data=data, encoding=encoding, level=level: compress(data, encoding, level), 1,
+                          {'input_bytes': len(data), 'output_bytes': size, 'ratio': round(size / len(data), 4)}))
+    return cases
+
+
+GROUPS = {
+    'predictor': predictor_cases,
+    'conversions': conversion_cases,
+    'parsing': parsing_cases,
+    'alerts': alert_cases,
+    'dashboard': dashboard_cases,
+    'serialization': serialization_cases,
+    'compression': compression_cases,
+}
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < MIN_ROUND_SECONDS:
+        number = max(1, int(number * MIN_ROUND_SECONDS / max(elapsed, 1e-9)))
+    gc.collect()
+    rounds = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        'best_s': min(rounds),
+        'median_s': statistics.median(rounds),
+        'calls_per_round': number,
+    }
+
+
+def _format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('µs', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:8.2f} {unit}"
+    return f"{seconds / 1e-9:8.2f} ns"
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--group', action='append', choices=list(GROUPS), help='only run these groups (repeatable)')
+    parser.add_argument('--filter', help='only run cases whose name contains this text')
+    parser.add_argument('--repeat', type=int, default=5, help='timing rounds per case')
+    parser.add_argument('--quick', action='store_true', help='smaller data sizes (10k subs, 100k events)')
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--baseline', help='earlier --output file to compare against')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    np.random.seed(0)
+    results: Dict[str, Dict[str, Any]] = {}
+    print(f"{'case':<68} {'best':>11} {'median':>11} {'per op':>11}" + (f" {'Δmedian':>8}" if baseline else ''))
+    for group_name, group in GROUPS.items():
+        if args.group and group_name not in args.group:
+            continue
+        setup_started = time.perf_counter()
+        cases = group(args.quick)
+        setup_seconds = time.perf_counter() - setup_started
+        for name, fn, ops, *measured in cases:
+            if args.filter and args.filter.lower() not in name.lower():
+                continue
+            stats = measure(fn, args.repeat)
+            stats['ops'] = ops
+            stats['per_op_s'] = stats['median_s'] / ops
+            stats['setup_s'] = round(setup_seconds, 3)
+            stats.update(*measured)
+            results[name] = stats
+            line = (f"{name:<68} {_format_time(stats['best_s'])} {_format_time(stats['median_s'])} "
+                    f"{_format_time(stats['per_op_s'])}")
+            before = baseline.get(name)
+            if before:
+                line += f" {(stats['median_s'] / before['median_s'] - 1) * 100:>+7.1f}%"
+            if measured:
+                line += '  ' + ', '.join(f"{key}={value}" for key, value in measured[0].items())
+            print(line, flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'commit': git_commit(),
+                'timestamp': datetime.now().isoformat(timespec='seconds'),
+                'settings': {'quick': args.quick, 'repeat': args.repeat, 'groups': args.group, 'filter': args.filter},
+                'results': results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Seeded synthetic data for the AuraCast benchmarks
+Everything here is deterministic for a given seed, so benchmark runs on
+different commits measure the same work.
+"""
+
+import contextlib
+import io
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from model_design import AirQualityPredictor
+from utils.alert_system import AlertEvent, AlertHistory, AlertSeverity, AlertSystem, AlertType
+
+LOCATIONS = ['Dublin', 'Galway', 'Cork', 'Limerick', 'Athlone', 'Waterford', 'Sligo', 'Kilkenny',
+             'New York', 'Boston', 'Chicago', 'Toronto', 'Los Angeles', 'Seattle', 'Denver', 'Miami']
+
+# Looked up by get_cached_coordinates: city cache hits, gazetteer hits and misses
+LOCATION_QUERIES = [
+    'new york', 'Toronto', '  Chicago ', 'mexico city',
+    'Dublin', 'Galway', 'Cabinteely', 'Dun Laoghaire', 'Paris', 'Berlin', 'São Paulo',
+    'Springfield', 'Atlantis', 'nowhere in particular', 'Fort Zzyzx',
+]
+
+TIME_DESCRIPTORS = [
+    'now', 'today', 'tomorrow', 'tomorrow morning', 'tonight', 'this evening', 'next monday',
+    'next friday afternoon', 'in 3 hours', 'in 2 days', 'at 5pm', 'tomorrow at 7:30 am',
+    'march 15th', '12/25', 'this weekend', 'next week',
+]
+
+REFERENCE_TIME = datetime(2025, 10, 4, 12, 0)
+
+
+def training_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """A dataset shaped like comprehensive_unified_dataset.csv"""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(25, 55, rows)
+    lon = rng.uniform(-125, -65, rows)
+    datetimes = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24, rows), unit='h')
+    hour = datetimes.hour.values
+    daily = np.sin(hour / 24 * 2 * np.pi)
+    pm25 = np.clip(12 + 6 * daily + (lat - 40) * 0.2 + rng.normal(0, 4, rows), 0, None)
+    return pd.DataFrame({
+        'datetime': datetimes.astype(str),
+        'lat': lat,
+        'lon': lon,
+        'tempo_no2_no2_weight': rng.normal(3e15, 1e15, rows),
+        'tempo_hcho_hcho_weight': rng.normal(8e15, 2e15, rows),
+        'tempo_co_co_vmr': rng.normal(1e18, 3e17, rows),
+        'aerosol': np.clip(rng.normal(0.15, 0.08, rows), 0, None),
+        'T2M': 285 + 8 * daily - (lat - 40) * 0.5 + rng.normal(0, 2, rows),
+        'QV2M': np.clip(rng.normal(0.008, 0.003, rows), 0.001, None),
+        'wind_speed': np.clip(rng.normal(4, 2, rows), 0, None),
+        'precipitation': np.clip(rng.normal(0, 0.5, rows), 0, None),
+        'ground_pm25': pm25,
+        'ground_o3': np.clip(60 + 25 * daily + rng.normal(0, 10, rows), 0, None),
+        'ground_no2': np.clip(rng.normal(20, 8, rows), 0, None),
+        'ground_co': np.clip(rng.normal(300, 80, rows), 0, None),
+    })
+
+
+def trained_predictor(rows: int = 5000, seed: int = 0) -> AirQualityPredictor:
+    """An AirQualityPredictor trained (quietly) on a synthetic dataset"""
+    predictor = AirQualityPredictor()
+    with contextlib.redirect_stdout(io.StringIO()):
+        X, y = predictor.prepare_features(training_frame(rows, seed))
+        predictor.train_model(X, y)
+    return predictor
+
+
+def prediction_inputs(n: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, pd.DatetimeIndex]:
+    rng = np.random.default_rng(seed)
+    datetimes = pd.DatetimeIndex(pd.Timestamp('2025-06-01') + pd.to_timedelta(rng.integers(0, 30 * 24, n), unit='h'))
+    return rng.uniform(25, 55, n), rng.uniform(-125, -65, n), datetimes
+
+
+def pollutant_pairs(n: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """(PM2.5, O3) pairs covering every AQI breakpoint segment"""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 250, n), rng.uniform(0, 300, n)
+
+
+def humidity_inputs(n: int, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """(specific humidity kg/kg, temperature K) pairs"""
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0.001, 0.02, n), rng.uniform(253, 313, n)
+
+
+def alert_system(subscriptions: int, seed: int = 0) -> AlertSystem:
+    """An AlertSystem with ``subscriptions`` subscribers over LOCATIONS (first location busiest)"""
+    rng = random.Random(seed)
+    system = AlertSystem()
+    types = [AlertType.HEALTH, AlertType.GENERAL, AlertType.OUTDOOR_ACTIVITY, AlertType.INDUSTRIAL]
+    # Zipf-like popularity: Dublin gets the most subscribers
+    weights = [1 / (rank + 1) for rank in range(len(LOCATIONS))]
+    system.bulk_subscribe([
+        {
+            'user_id': f"user{i}@example.com",
+            'location': rng.choices(LOCATIONS, weights)[0],
+            'alert_type': rng.choice(types),
+            'notification_methods': ['email'],
+        }
+        for i in range(subscriptions)
+    ])
+    return system
+
+
+def air_quality_readings(seed: int = 0) -> List[Dict[str, float]]:
+    """Alternating clean and polluted readings, so repeated checks change alert state"""
+    rng = random.Random(seed)
+    readings = []
+    for polluted in (False, True) * 4:
+        scale = 2.5 if polluted else 0.4
+        readings.append({
+            'aqi': 80 * scale * rng.uniform(0.9, 1.1),
+            'pm25': 25 * scale * rng.uniform(0.9, 1.1),
+            'o3': 90 * scale * rng.uniform(0.9, 1.1),
+            'no2': 2.5e15 * scale * rng.uniform(0.9, 1.1),
+            'co': 2e18 * scale * rng.uniform(0.9, 1.1),
+            'aod': 0.35 * scale * rng.uniform(0.9, 1.1),
+        })
+    return readings
+
+
+def alert_history(system: AlertSystem, events: int, contacts: int, days: int = 7, seed: int = 0) -> AlertHistory:
+    """Fill ``system.alert_history`` with ``events`` events spread evenly over the last ``days``"""
+    rng = random.Random(seed)
+    types = list(system.default_thresholds)
+    now = datetime.now()
+    step = timedelta(days=days) / events
+    start = now - timedelta(days=days)
+    history = system.alert_history
+    for i in range(events):
+        u = rng.randrange(contacts)
+        alert_type = types[u % len(types)]
+        threshold = rng.choice(system.default_thresholds[alert_type])
+        severity = rng.choice((AlertSeverity.MEDIUM, AlertSeverity.CRITICAL))
+        location = LOCATIONS[u % len(LOCATIONS)]
+        history.append(AlertEvent(
+            alert_id=f"user{u}@example.com_{location}_{alert_type.value}_{u}",
+            contact_info=f"user{u}@example.com",
+            location=location,
+            current_value=threshold.warning_level * rng.uniform(1.0, 2.0),
+            threshold_value=threshold.warning_level,
+            severity=severity,
+            timestamp=start + step * i,
+            threshold=threshold,
+            alert_type=alert_type,
+        ))
+    return history
+
+
+def comprehensive_predictions(seed: int = 0) -> Dict:
+    """A predict_comprehensive-shaped result (as converted for the API)"""
+    rng = random.Random(seed)
+    return {
+        'satellite_data': {'tempo_no2': 3.1e15, 'tempo_ch2o': 8.2e15, 'tropomi_co': 1.1e18, 'modis_aod': 0.18},
+        'weather_data': {'temperature_2m': round(rng.uniform(5, 25), 2), 'humidity': round(rng.uniform(40, 90), 2),
+                         'pbl_height': 800, 'wind_speed': round(rng.uniform(2, 30), 2), 'precipitation': 0.1},
+        'air_quality': {'pm25': round(rng.uniform(5, 60), 2), 'o3': round(rng.uniform(20, 120), 2),
+                        'aqi': round(rng.uniform(20, 160), 2)},
+        'frontend_metrics': {'temperature': 14.2, 'aqi': 57, 'humidity': 71, 'windSpeed': 12.5},
+    }
@@ -0,0 +1,4 @@
+"""
+Load-testing tools for the AuraCast backend
+Run from the backend directory, e.g. ``python -m loadtest.standins``
+"""
@@ -0,0 +1,330 @@
+"""
+Load generator for the AuraCast API
+Replays a weighted mix of weather-metrics, extract-parameters and alert
+subscribe/check/history requests against a running backend (normally with
+the external services pointed at loadtest.standins). Closed-loop mode keeps
+``--concurrency`` requests in flight; open-loop mode sends Poisson arrivals at
+``--rate`` requests/second whatever the response times, and measures latency
+from each request's scheduled start so queueing delay is included.
+
+    python -m loadtest.loadgen --url http://localhost:5000 --duration 60 --concurrency 16
+    python -m loadtest.loadgen --rate 20 --duration 120 --output results/main.json --baseline results/before.json
+
+Per-endpoint p50/p95/p99 latency, throughput and error rate are printed and
+written to ``--output`` as JSON, together with the run settings and git commit.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import requests
+
+LOCATIONS = ['Dublin', 'Galway', 'Cork', 'Limerick', 'Athlone', 'Waterford', 'Sligo', 'Kilkenny',
+             'London', 'Paris', 'Berlin', 'New York', 'Madrid', 'Rome', 'Amsterdam', 'Lisbon']
+
+PROMPT_TEMPLATES = [
+    "What's the air quality in {location}?",
+    "How is the air quality in {location} tomorrow morning?",
+    "Is it safe to go jogging in {location} this evening?",
+    "I have asthma, should I be worried about pollution in {location} today?",
+    "Give me a detailed analysis of pollution near the industrial area in {location} this week",
+    "Will traffic make the air bad in {location} at 5pm?",
+    "Forecast for {location} this weekend",
+]
+
+# Share of requests per scenario (relative weights)
+DEFAULT_MIX = {
+    'weather_metrics': 40,
+    'extract_parameters': 25,
+    'alerts_subscribe': 10,
+    'alerts_check': 15,
+    'alerts_history': 10,
+}
+
+# (method, path) for each scenario
+ENDPOINTS = {
+    'weather_metrics': ('GET', '/api/weather-metrics'),
+    'extract_parameters': ('POST', '/api/extract-parameters'),
+    'alerts_subscribe': ('POST', '/api/alerts/subscribe'),
+    'alerts_check': ('POST', '/api/alerts/check'),
+    'alerts_history': ('GET', '/api/alerts/history'),
+}
+
+REQUEST_TIMEOUT_SECONDS = 60
+
+
+class RequestFactory:
+    """Seeded request bodies for each scenario"""
+
+    def __init__(self, seed: int, users: int):
+        self.rng = random.Random(seed)
+        self.users = users
+        self._lock = threading.Lock()
+
+    def build(self, scenario: str) -> Dict[str, Any]:
+        with self._lock:
+            rng = self.rng
+            location = rng.choice(LOCATIONS)
+            user = f"loadtest-user-{rng.randrange(self.users)}@example.com"
+            if scenario == 'weather_metrics':
+                return {'params': {'location': location}}
+            if scenario == 'extract_parameters':
+                return {'json': {'prompt': rng.choice(PROMPT_TEMPLATES).format(location=location)}}
+            if scenario == 'alerts_subscribe':
+                return {'json': {
+                    'user_id': user,
+                    'location': location,
+                    'alert_type': rng.choice(['health', 'general', 'outdoor_activity', 'industrial']),
+                    'notification_methods': ['email']
+                }}
+            if scenario == 'alerts_check':
+                return {'json': {'location': location, 'air_quality_data': {
+                    'aqi': round(rng.uniform(10, 180), 1),
+                    'pm25': round(rng.uniform(2, 80), 1),
+                    'o3': round(rng.uniform(20, 160), 1),
+                    'no2': round(rng.uniform(5, 120), 1),
+                }}}
+            if scenario == 'alerts_history':
+                params = {'hours': rng.choice([1, 24, 168])}
+                if rng.random() < 0.5:
+                    params['contact_info'] = user
+                else:
+                    params['location'] = location
+                return {'params': params}
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+
+class Recorder:
+    """Latencies and outcomes per endpoint"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {name: [] for name in ENDPOINTS}
+        self.errors: Dict[str, int] = {name: 0 for name in ENDPOINTS}
+        self.status_codes: Dict[str, Dict[str, int]] = {name: {} for name in ENDPOINTS}
+        self._lock = threading.Lock()
+
+    def record(self, scenario: str, latency_ms: float, status: Optional[int]):
+        key = str(status) if status is not None else 'exception'
+        with self._lock:
+            self.latencies[scenario].append(latency_ms)
+            codes = self.status_codes[scenario]
+            codes[key] = codes.get(key, 0) + 1
+            if status is None or status >= 400:
+                self.errors[scenario] += 1
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, Dict[str, Any]]:
+    summary = {}
+    everything: List[float] = []
+    total_errors = 0
+    for scenario, latencies in recorder.latencies.items():
+        if not latencies:
+            continue
+        values = sorted(latencies)
+        everything.extend(values)
+        total_errors += recorder.errors[scenario]
+        summary[scenario] = _stats(values, recorder.errors[scenario], elapsed)
+        summary[scenario]['endpoint'] = ' '.join(ENDPOINTS[scenario])
+        summary[scenario]['status_codes'] = recorder.status_codes[scenario]
+    if everything:
+        summary['all'] = _stats(sorted(everything), total_errors, elapsed)
+    return summary
+
+
+def _stats(values: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    def ms(value):
+        return round(value, 2) if value is not None else None
+
+    return {
+        'requests': len(values),
+        'errors': errors,
+        'error_rate': round(errors / len(values), 4),
+        'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': ms(sum(values) / len(values)),
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(values[-1]),
+    }
+
+
+class LoadGenerator:
+    """Sends the scenario mix at a fixed concurrency or arrival rate"""
+
+    def __init__(self, base_url: str, mix: Dict[str, float], concurrency: int, seed: int = 0, users: int = 1000):
+        self.base_url = base_url.rstrip('/')
+        self.scenarios = [name for name, weight in mix.items() if weight > 0]
+        self.weights = [mix[name] for name in self.scenarios]
+        self.concurrency = concurrency
+        self.factory = RequestFactory(seed, users)
+        self.rng = random.Random(seed + 1)
+        self.recorder = Recorder()
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _pick(self) -> str:
+        return self.rng.choices(self.scenarios, self.weights)[0]
+
+    def _send(self, scenario: str, scheduled: float, record: bool = True):
+        method, path = ENDPOINTS[scenario]
+        kwargs = self.factory.build(scenario)
+        status = None
+        try:
+            response = self._session().request(method, self.base_url + path, timeout=REQUEST_TIMEOUT_SECONDS, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            pass
+        if record:
+            self.recorder.record(scenario, (time.perf_counter() - scheduled) * 1000, status)
+
+    def run_closed(self, duration: float, warmup: float = 0.0) -> float:
+        """Each of ``concurrency`` workers sends its next request as soon as the last one returns"""
+        started = time.perf_counter()
+        measure_from = started + warmup
+        deadline = measure_from + duration
+
+        def worker(worker_rng: random.Random):
+            while True:
+                now = time.perf_counter()
+                if now >= deadline:
+                    return
+                scenario = worker_rng.choices(self.scenarios, self.weights)[0]
+                self._send(scenario, now, record=now >= measure_from)
+
+        threads = [threading.Thread(target=worker, args=(random.Random(self.rng.random()),), daemon=True)
+                   for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - measure_from
+
+    def run_open(self, rate: float, duration: float, warmup: float = 0.0) -> float:
+        """Poisson arrivals at ``rate``/s, served by up to ``concurrency`` requests in flight"""
+        started = time.perf_counter()
+        measure_from = started + warmup
+        deadline = measure_from + duration
+        next_arrival = started
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                next_arrival += self.rng.expovariate(rate)
+                if next_arrival >= deadline:
+                    break
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._send, self._pick(), next_arrival, next_arrival >= measure_from)
+        return time.perf_counter() - measure_from
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_mix(text: Optional[str]) -> Dict[str, float]:
+    if not text:
+        return dict(DEFAULT_MIX)
+    mix = {name: 0.0 for name in ENDPOINTS}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"Unknown scenario {name.strip()!r}; choose from {', '.join(ENDPOINTS)}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def print_summary(summary: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Dict[str, Any]]] = None):
+    header = f"{'scenario':<20} {'reqs':>7} {'rps':>8} {'err%':>6} {'p50ms':>9} {'p95ms':>9} {'p99ms':>9}"
+    if baseline:
+        header += f" {'Δp95':>8}"
+    print(header)
+    for scenario, stats in summary.items():
+        line = (f"{scenario:<20} {stats['requests']:>7} {stats['throughput_rps']:>8.2f} "
+                f"{stats['error_rate'] * 100:>6.2f} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} "
+                f"{stats['p99_ms']:>9.1f}")
+        before = (baseline or {}).get(scenario)
+        if before and before.get('p95_ms'):
+            line += f" {(stats['p95_ms'] / before['p95_ms'] - 1) * 100:>+7.1f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--duration', type=float, default=60, help='measured seconds')
+    parser.add_argument('--warmup', type=float, default=5, help='unmeasured seconds before the run')
+    parser.add_argument('--concurrency', type=int, default=16, help='requests in flight (closed loop) or max in flight (open loop)')
+    parser.add_argument('--rate', type=float, help='open loop: Poisson arrival rate in requests/second')
+    parser.add_argument('--mix', help='scenario weights, e.g. "weather_metrics=50,extract_parameters=50"')
+    parser.add_argument('--users', type=int, default=1000, help='distinct alert subscribers')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=f"loadtest-{datetime.now():%Y%m%d-%H%M%S}.json")
+    parser.add_argument('--baseline', help='earlier --output file to compare p95 against')
+    args = parser.parse_args()
+
+    generator = LoadGenerator(args.url, parse_mix(args.mix), args.concurrency, args.seed, args.users)
+    mode = f"open loop at {args.rate:g} req/s" if args.rate else f"closed loop, {args.concurrency} concurrent"
+    print(f"Load testing {args.url} for {args.duration:g}s ({mode}, {args.warmup:g}s warmup)")
+    if args.rate:
+        elapsed = generator.run_open(args.rate, args.duration, args.warmup)
+    else:
+        elapsed = generator.run_closed(args.duration, args.warmup)
+
+    summary = summarize(generator.recorder, elapsed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print_summary(summary, baseline)
+
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'settings': {
+            'url': args.url,
+            'mode': 'open' if args.rate else 'closed',
+            'rate': args.rate,
+            'concurrency': args.concurrency,
+            'duration': args.duration,
+            'warmup': args.warmup,
+            'mix': parse_mix(args.mix),
+            'users': args.users,
+            'seed': args.seed,
+        },
+        'elapsed_seconds': round(elapsed, 2),
+        'results': summary,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+"""
+Local stand-ins for AuraCast's external services
+One Flask server that answers like Gemini (generateContent and
+streamGenerateContent), OpenAQ (/v2/measurements, /v2/sensors, /v2/locations)
+and Nominatim (/search, /reverse). Every service has its own lognormal latency
+and error rate, and all randomness comes from one seed, so load tests are
+reproducible on a single machine.
+
+Run (from backend/):
+    python -m loadtest.standins --port 8090 --gemini-median-ms 900 --gemini-error-rate 0.01
+
+and start the app with
+    GEMINI_BASE_URL=http://localhost:8090 OPENAQ_BASE_URL=http://localhost:8090 \\
+    NOMINATIM_BASE_URL=http://localhost:8090 NOMINATIM_RATE_PER_SECOND=1000 ...
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from flask import Flask, Response, jsonify, request
+
+from utils.query_extractor import QueryExtractor
+
+SERVICES = ('gemini', 'openaq', 'nominatim')
+
+# (median latency ms, lognormal sigma, error rate) per service
+DEFAULT_PROFILES = {
+    'gemini': (900.0, 0.5, 0.0),
+    'openaq': (250.0, 0.4, 0.0),
+    'nominatim': (150.0, 0.3, 0.0),
+}
+
+# A streamed Gemini reply arrives in chunks of about this many characters
+STREAM_CHUNK_CHARS = 40
+# Share of a streamed reply's latency spent before the first chunk
+FIRST_CHUNK_SHARE = 0.3
+
+STATIONS_PER_QUERY = 3
+OPENAQ_PARAMETERS = {'pm25': (12.0, 'µg/m³'), 'o3': (60.0, 'µg/m³'), 'no2': (25.0, 'µg/m³'), 'co': (300.0, 'µg/m³')}
+
+
+class ServiceProfile:
+    """Latency and failure behaviour of one stand-in service"""
+
+    def __init__(self, median_ms: float, sigma: float, error_rate: float, rng: random.Random,
+                 lock: threading.Lock):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._rng = rng
+        self._lock = lock
+
+    def sample(self) -> Tuple[float, bool]:
+        """(latency in seconds, whether this call fails)"""
+        with self._lock:
+            latency_ms = self.median_ms * math.exp(self._rng.gauss(0.0, self.sigma)) if self.sigma else self.median_ms
+            failed = self._rng.random() < self.error_rate
+        return latency_ms / 1000.0, failed
+
+
+def _stable_hash(text: str) -> int:
+    return int(hashlib.sha1(text.encode('utf-8')).hexdigest()[:12], 16)
+
+
+def _coordinates_for(name: str) -> Tuple[float, float]:
+    """The same made-up coordinates for a place name every time"""
+    h = _stable_hash(name.strip().lower())
+    return round((h % 120000) / 1000.0 - 55.0, 6), round((h // 120000 % 340000) / 1000.0 - 170.0, 6)
+
+
+def _station(station_id: int, lat: float, lon: float) -> Dict[str, Any]:
+    return {
+        'id': station_id,
+        'name': f"Stand-in station {station_id}",
+        'coordinates': {'latitude': lat, 'longitude': lon},
+        'sensors': [
+            {'id': station_id * 10 + i, 'parameter': {'name': parameter, 'units': units}}
+            for i, (parameter, (_, units)) in enumerate(OPENAQ_PARAMETERS.items())
+        ]
+    }
+
+
+def _stations_near(lat: float, lon: float) -> List[Dict[str, Any]]:
+    """Deterministic stations around a point (one per 0.01° cell, offset within the cell)"""
+    base = _stable_hash(f"{lat:.2f},{lon:.2f}")
+    stations = []
+    for i in range(STATIONS_PER_QUERY):
+        station_id = (base + i) % 10_000_000 + 1
+        stations.append(_station(station_id, round(lat + 0.01 * (i - 1), 5), round(lon + 0.005 * i, 5)))
+    return stations
+
+
+def _measurement(sensor_id: int, parameter: str, when: datetime, lat: float, lon: float) -> Dict[str, Any]:
+    baseline, units = OPENAQ_PARAMETERS[parameter]
+    # Smooth daily cycle plus a per-sensor offset
+    value = baseline * (1.0 + 0.3 * math.sin(when.hour / 24 * 2 * math.pi) + (sensor_id % 7 - 3) / 20)
+    return {
+        'locationId': sensor_id // 10,
+        'sensorId': sensor_id,
+        'parameter': parameter,
+        'value': round(value, 2),
+        'unit': units,
+        'date': {'utc': when.strftime('%Y-%m-%dT%H:%M:%SZ')},
+        'datetime': when.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'coordinates': {'latitude': lat, 'longitude': lon}
+    }
+
+
+def _parse_time(value: Optional[str], default: datetime) -> datetime:
+    if not value:
+        return default
+    try:
+        return datetime.fromisoformat(value.rstrip('Z'))
+    except ValueError:
+        return default
+
+
+# ---------------------------------------------------------------------- Gemini replies
+
+_INPUT_TEXT = re.compile(r'\nInput text: (.*)\Z', re.S)
+_AIR_QUALITY_DATA = re.compile(r'AIR QUALITY DATA:\n(.*?)\n\nGenerate a response', re.S)
+_CONTEXT_LOCATION = re.compile(r'^- Location: (.*)$', re.M)
+
+_extractor = QueryExtractor()
+
+
+def _extraction_reply(prompt_text: str) -> Dict[str, Any]:
+    params, _ = _extractor.extract(prompt_text)
+    params.pop('datetime', None)
+    return params
+
+
+def _analysis_reply(prompt: str) -> Dict[str, Any]:
+    location = (_CONTEXT_LOCATION.search(prompt) or [None, 'this area'])[1]
+    try:
+        data = json.loads(_AIR_QUALITY_DATA.search(prompt).group(1))
+    except (AttributeError, ValueError):
+        data = {}
+    air_quality = data.get('air_quality', {}) if isinstance(data, dict) else {}
+    aqi = air_quality.get('aqi')
+    pm25 = air_quality.get('pm25')
+    status = 'good' if aqi is None or aqi <= 50 else 'moderate' if aqi <= 100 else 'unhealthy'
+
+    display_text = f"Air quality in {location} is expected to be {status}"
+    display_text += f" with an AQI of {aqi}." if aqi is not None else "."
+    analysis_results: Dict[str, Any] = {}
+    if aqi is not None:
+        analysis_results['aqi'] = {'value': aqi, 'status': status, 'interpretation': f"Air quality is {status}"}
+    if pm25 is not None:
+        analysis_results['pm25'] = {'value': pm25, 'status': status, 'interpretation': f"PM2.5 levels are {status}"}
+    return {
+        'display_text': display_text,
+        'analysis_results': analysis_results,
+        'recommendations': ["Check conditions again before heading out"],
+        'suggested_visualizations': ['time_series', 'concentration map'],
+        'status_code': 200
+    }
+
+
+def gemini_reply(prompt: str) -> str:
+    """What the stand-in model says to one of AuraCast's prompts"""
+    if prompt.startswith('Extract parameters from the input'):
+        match = _INPUT_TEXT.search(prompt)
+        return json.dumps(_extraction_reply(match.group(1) if match else ''))
+    if prompt.startswith('Analyze these extracted parameters'):
+        return json.dumps({'sufficient': True, 'missing_information': [],
+                           'validation_message': 'Parameters are sufficient'})
+    return json.dumps(_analysis_reply(prompt))
+
+
+def _gemini_payload(text: str, finished: bool = True) -> Dict[str, Any]:
+    candidate: Dict[str, Any] = {'content': {'role': 'model', 'parts': [{'text': text}]}, 'index': 0}
+    if finished:
+        candidate['finishReason'] = 'STOP'
+    return {'candidates': [candidate]}
+
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    return ''.join(part.get('text', '') for content in body.get('contents', [])
+                   for part in content.get('parts', []))
+
+
+# ---------------------------------------------------------------------- app
+
+def create_app(profiles: Optional[Dict[str, Tuple[float, float, float]]] = None, seed: int = 0) -> Flask:
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    profiles = {name: ServiceProfile(*(profiles or {}).get(name, DEFAULT_PROFILES[name]), rng, lock)
+                for name in SERVICES}
+    stats = {name: {'requests': 0, 'errors': 0} for name in SERVICES}
+
+    app = Flask(__name__)
+
+    def delay(service: str) -> bool:
+        """Sleep for the service's latency; True if this call should fail"""
+        latency, failed = profiles[service].sample()
+        with lock:
+            stats[service]['requests'] += 1
+            stats[service]['errors'] += failed
+        time.sleep(latency)
+        return failed
+
+    def unavailable(service: str):
+        if service == 'gemini':
+            return jsonify({'error': {'code': 503, 'message': 'The model is overloaded.', 'status': 'UNAVAILABLE'}}), 503
+        return jsonify({'error': 'Service unavailable'}), 503
+
+    @app.route('/stats')
+    def get_stats():
+        with lock:
+            return jsonify({name: dict(counts) for name, counts in stats.items()})
+
+    # Gemini
+
+    @app.route('/v1beta/models/<model>:generateContent', methods=['POST'])
+    def generate_content(model):
+        if delay('gemini'):
+            return unavailable('gemini')
+        return jsonify(_gemini_payload(gemini_reply(_prompt_text(request.get_json(force=True)))))
+
+    @app.route('/v1beta/models/<model>:streamGenerateContent', methods=['POST'])
+    def stream_generate_content(model):
+        latency, failed = profiles['gemini'].sample()
+        with lock:
+            stats['gemini']['requests'] += 1
+            stats['gemini']['errors'] += failed
+        if failed:
+            time.sleep(latency)
+            return unavailable('gemini')
+        text = gemini_reply(_prompt_text(request.get_json(force=True)))
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or ['']
+
+        def generate() -> Iterator[str]:
+            time.sleep(latency * FIRST_CHUNK_SHARE)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(latency * (1 - FIRST_CHUNK_SHARE) / max(len(chunks) - 1, 1))
+                yield f"data: {json.dumps(_gemini_payload(chunk, i == len(chunks) - 1))}\r\n\r\n"
+
+        return Response(generate(), mimetype='text/event-stream')
+
+    # OpenAQ
+
+    def _point() -> Tuple[float, float]:
+        lat, lon = (request.args.get('coordinates') or '0,0').split(',')[:2]
+        return float(lat), float(lon)
+
+    @app.route('/v2/locations')
+    def openaq_locations():
+        if delay('openaq'):
+            return unavailable('openaq')
+        results = _stations_near(*_point())
+        return jsonify({'meta': {'found': len(results)}, 'results': results})
+
+    @app.route('/v2/sensors')
+    @app.route('/v2/sensors/<int:sensor_id>')
+    def openaq_sensors(sensor_id: Optional[int] = None):
+        if delay('openaq'):
+            return unavailable('openaq')
+        if sensor_id is None:
+            sensors = [dict(s, locationId=station['id']) for station in _stations_near(*_point())
+                       for s in station['sensors']]
+        else:
+            parameter = list(OPENAQ_PARAMETERS)[sensor_id % 10 % len(OPENAQ_PARAMETERS)]
+            sensors = [{'id': sensor_id, 'locationId': sensor_id // 10, 'parameter': {'name': parameter}}]
+        return jsonify({'meta': {'found': len(sensors)}, 'results': sensors})
+
+    @app.route('/v2/measurements')
+    def openaq_measurements():
+        if delay('openaq'):
+            return unavailable('openaq')
+        now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+        date_to = _parse_time(request.args.get('date_to'), now)
+        date_from = _parse_time(request.args.get('date_from'), date_to - timedelta(hours=1))
+        limit = int(request.args.get('limit', 100))
+
+        if request.args.get('sensor_id'):
+            sensor_id = int(request.args['sensor_id'])
+            series = [(sensor_id, list(OPENAQ_PARAMETERS)[sensor_id % 10 % len(OPENAQ_PARAMETERS)], 0.0, 0.0)]
+        else:
+            wanted = (request.args.get('parameter') or ','.join(OPENAQ_PARAMETERS)).split(',')
+            series = [(s['id'], s['parameter']['name'], station['coordinates']['latitude'],
+                       station['coordinates']['longitude'])
+                      for station in _stations_near(*_point()) for s in station['sensors']
+                      if s['parameter']['name'] in wanted]
+
+        hours = max(int((date_to - date_from).total_seconds() // 3600), 0) + 1
+        results = [
+            _measurement(sensor_id, parameter, date_to - timedelta(hours=h), lat, lon)
+            for h in range(hours) for sensor_id, parameter, lat, lon in series
+        ][:limit]
+        if request.args.get('sort') == 'asc':
+            results.reverse()
+        return jsonify({'meta': {'found': len(results)}, 'results': results})
+
+    # Nominatim
+
+    @app.route('/search')
+    def nominatim_search():
+        if delay('nominatim'):
+            return unavailable('nominatim')
+        query = request.args.get('q', '')
+        if not query.strip():
+            return jsonify([])
+        lat, lon = _coordinates_for(query)
+        return jsonify([{
+            'place_id': _stable_hash(query) % 10_000_000,
+            'lat': str(lat),
+            'lon': str(lon),
+            'display_name': query.strip().title(),
+            'type': 'city'
+        }][:int(request.args.get('limit', 1))])
+
+    @app.route('/reverse')
+    def nominatim_reverse():
+        if delay('nominatim'):
+            return unavailable('nominatim')
+        lat, lon = float(request.args.get('lat', 0)), float(request.args.get('lon', 0))
+        return jsonify({'lat': str(lat), 'lon': str(lon), 'display_name': f"Stand-in place ({lat:.3f}, {lon:.3f})"})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--seed', type=int, default=0)
+    for name in SERVICES:
+        median_ms, sigma, error_rate = DEFAULT_PROFILES[name]
+        parser.add_argument(f'--{name}-median-ms', type=float, default=median_ms)
+        parser.add_argument(f'--{name}-sigma', type=float, default=sigma, help='lognormal spread of the latency')
+        parser.add_argument(f'--{name}-error-rate', type=float, default=error_rate)
+    args = parser.parse_args()
+
+    profiles = {name: (getattr(args, f'{name}_median_ms'), getattr(args, f'{name}_sigma'),
+                       getattr(args, f'{name}_error_rate')) for name in SERVICES}
+    print(f"Stand-ins on http://{args.host}:{args.port} (seed {args.seed}): "
+          + ', '.join(f"{name} {m:g}ms±{s:g} err {e:g}" for name, (m, s, e) in profiles.items()))
+    create_app(profiles, args.seed).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,8 @@ from sklearn.multioutput import MultiOutputRegressor
 from sklearn.ensemble import RandomForestRegressor
 import os
 import time
+import hashlib
+import pickle
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -58,6 +60,8 @@ class AirQualityPredictor:
             'ground_pm25', 'ground_o3', 'ground_no2', 'ground_co'
         ]
         self.dataset = None
+        # Identifies the trained model (and so its predictions), e.g. for HTTP ETags
+        self.model_version = None
         
     def load_data(self, data_path='preprocessed_data/comprehensive_unified_dataset.csv', dry_run=False, sample_size=100):
         """
@@ -265,6 +269,7 @@ class AirQualityPredictor:
         
         training_time = time.time() - start_time
         print(f"✅ Model training completed in {training_time:.1f} seconds!")
+        self.model_version = hashlib.sha1(pickle.dumps((self.feature_names, self.scaler, self.model))).hexdigest()[:12]
         
         # Evaluate on all splits
         print("\\n📊 MODEL PERFORMANCE:")
@@ -381,6 +386,63 @@ class AirQualityPredictor:
         
         return result
     
+    def predict_batch(self, lats, lons, datetimes):
+        """
+        Vectorized predictions for many (lat, lon, datetime) rows in one model call
+        Returns the predict_comprehensive structure with numpy arrays as values
+        """
+        if self.model is None:
+            raise ValueError("Model not trained yet!")
+        
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        if isinstance(datetimes, pd.DatetimeIndex):
+            dt = datetimes
+        else:
+            dt = pd.DatetimeIndex([pd.Timestamp(d) for d in datetimes])
+        
+        columns = {
+            'lat': lats,
+            'lon': lons,
+            'hour': dt.hour.values,
+            'day_of_year': dt.dayofyear.values,
+            'month': dt.month.values,
+            'is_weekend': dt.weekday.values >= 5
+        }
+        X = np.column_stack([
+            np.asarray(columns.get(col, np.zeros(len(lats))), dtype=float) for col in self.feature_names
+        ])
+        
+        # Scale and predict all rows at once
+        predictions = self.model.predict(self.scaler.transform(X))
+        pred = {target: predictions[:, i] for i, target in enumerate(self.target_names) if i < predictions.shape[1]}
+        zeros = np.zeros(len(lats))
+        
+        pm25 = pred.get('pm25', zeros)
+        o3 = pred.get('o3', zeros)
+        temp_kelvin = pred.get('temperature_2m', zeros + 273.15)
+        relative_humidity = self.convert_specific_to_relative_humidity_array(pred.get('humidity', zeros + 0.01), temp_kelvin)
+        
+        return {
+            "satellite_data": {
+                "tempo_no2": pred.get('tempo_no2', zeros),
+                "tempo_ch2o": pred.get('tempo_ch2o', zeros),
+                "tropomi_co": pred.get('tropomi_co', zeros),
+                "modis_aod": pred.get('modis_aod', zeros)
+            },
+            "weather_data": {
+                "temperature_2m": temp_kelvin - 273.15,
+                "humidity": relative_humidity,
+                "wind_speed": pred.get('wind_speed', zeros) * 3.6,
+                "precipitation": pred.get('precipitation', zeros)
+            },
+            "air_quality": {
+                "pm25": pm25,
+                "o3": o3,
+                "aqi": self.calculate_aqi_array(pm25, o3)
+            }
+        }
+    
     def calculate_aqi(self, pm25, o3):
         """
         Calculate Air Quality Index from PM2.5 and O3
@@ -407,6 +469,39 @@ class AirQualityPredictor:
         # Return maximum AQI (worst pollutant determines overall AQI)
         return max(pm25_aqi, o3_aqi)
     
+    def calculate_aqi_array(self, pm25, o3):
+        """
+        Vectorized calculate_aqi over arrays of PM2.5 and O3
+        """
+        pm25 = np.asarray(pm25, dtype=float)
+        o3_ppb = np.asarray(o3, dtype=float) * 0.5
+        
+        pm25_aqi = np.select(
+            [pm25 <= 12, pm25 <= 35.4, pm25 <= 55.4],
+            [pm25 * 50 / 12,
+             50 + (pm25 - 12) * 50 / (35.4 - 12),
+             100 + (pm25 - 35.4) * 50 / (55.4 - 35.4)],
+            np.minimum(300, 150 + (pm25 - 55.4) * 150 / 150)
+        )
+        o3_aqi = np.select(
+            [o3_ppb <= 54, o3_ppb <= 70],
+            [o3_ppb * 50 / 54,
+             50 + (o3_ppb - 54) * 50 / (70 - 54)],
+            np.minimum(300, 100 + (o3_ppb - 70) * 100 / 100)
+        )
+        return np.maximum(pm25_aqi, o3_aqi)
+    
+    def convert_specific_to_relative_humidity_array(self, specific_humidity, temperature_k, pressure=101325):
+        """
+        Vectorized convert_specific_to_relative_humidity
+        """
+        temp_c = np.asarray(temperature_k, dtype=float) - 273.15
+        es = 6.112 * np.exp((17.67 * temp_c) / (temp_c + 243.5))
+        specific_humidity = np.asarray(specific_humidity, dtype=float)
+        mixing_ratio = specific_humidity / (1 - specific_humidity)
+        rh = (mixing_ratio * pressure / 100) / es * 100
+        return np.clip(rh, 0, 100)
+    
     def convert_specific_to_relative_humidity(self, specific_humidity, temperature_k, pressure=101325):
         """
         Convert specific humidity (kg/kg) to relative humidity (%)
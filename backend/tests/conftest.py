@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Tests import the backend modules the way app.py does ("from utils... import ...")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the shared on-disk cache out of data/ (read when utils.caching is first imported)
+os.environ.setdefault('AURACAST_CACHE_PATH', os.path.join(tempfile.mkdtemp(prefix='auracast-tests-'), 'cache.sqlite3'))
@@ -0,0 +1,57 @@
+import asyncio
+
+from utils.analysis_cache import AnalysisCache, make_template, render_template, template_values
+from utils.caching import PersistentCache
+
+
+def _predictions(aqi, pm25):
+    return {'air_quality': {'aqi': aqi, 'pm25': pm25}}
+
+
+def test_display_text_numbers_and_place_are_templated():
+    analysis = {'display_text': "The AQI in Cork is 200 with PM2.5 at 35.2 µg/m³ {sic}."}
+    template = make_template(analysis, template_values(_predictions(200, 35.2), 'Cork'), ('Cork',))
+    rendered = render_template(template, template_values(_predictions(160, 30.04), 'Galway'))
+    assert rendered['display_text'] == "The AQI in Galway is 160 with PM2.5 at 30.0 µg/m³ {sic}."
+
+
+def test_structured_fields_are_kept_verbatim():
+    analysis = {
+        'display_text': "Air is unhealthy.",
+        'status_code': 200,
+        'analysis_results': {'who_pm25_limit': 15, 'aqi': 200},
+    }
+    template = make_template(analysis, template_values(_predictions(200, 15.0), 'Cork'), ('Cork',))
+    rendered = render_template(template, template_values(_predictions(160, 12.0), 'Galway'))
+    assert rendered['status_code'] == 200
+    assert rendered['analysis_results'] == {'who_pm25_limit': 15, 'aqi': 200}
+
+
+def test_place_names_match_whole_words_only():
+    analysis = {'display_text': "Cork and Corkscrew Hill"}
+    template = make_template(analysis, template_values({}, 'Cork'), ('Cork',))
+    rendered = render_template(template, template_values({}, 'Galway'))
+    assert rendered['display_text'] == "Galway and Corkscrew Hill"
+
+
+def test_concurrent_async_requests_share_one_compute(tmp_path):
+    cache = AnalysisCache(PersistentCache('output_analysis', 3600, path=str(tmp_path / 'cache.sqlite3')))
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'display_text': "The AQI in Cork is 200."}
+
+    async def request(location_name):
+        return await cache.get_or_compute_async(
+            _predictions(200, 35.2), {'location': location_name}, 51.9, -8.47, location_name, compute
+        )
+
+    async def main():
+        return await asyncio.gather(*(request('Cork') for _ in range(10)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r['display_text'] == "The AQI in Cork is 200." for r in results)
+    assert cache.get_stats()['shared'] == 9
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('starlette')
+pytest.importorskip('a2wsgi')
+httpx = pytest.importorskip('httpx')
+
+
+@pytest.fixture(scope='module')
+def asgi_app(tmp_path_factory):
+    """asgi.app, with the model trained on a small synthetic dataset and no external services"""
+    from benchmarks.synthetic import training_frame
+
+    workdir = tmp_path_factory.mktemp('app')
+    (workdir / 'preprocessed_data').mkdir()
+    training_frame(500).to_csv(workdir / 'preprocessed_data' / 'comprehensive_unified_dataset.csv', index=False)
+
+    patch = pytest.MonkeyPatch()
+    patch.chdir(workdir)
+    patch.setenv('GOOGLE_AI_STUDIO_KEY', 'test')
+    patch.setenv('GEMINI_BASE_URL', 'http://127.0.0.1:9')
+    patch.setenv('FORECAST_ALERT_INTERVAL_SECONDS', '0')
+    try:
+        import asgi
+        yield asgi.app
+    finally:
+        patch.undo()
+
+
+def _request(app, method, path, **kwargs):
+    async def send():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://testserver') as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(send())
+
+
+def test_async_route_rejects_invalid_json(asgi_app):
+    response = _request(asgi_app, 'POST', '/api/extract-parameters',
+                        content=b'{not json', headers={'Content-Type': 'application/json'})
+    assert response.status_code == 400
+    assert response.json()['metadata']['error'] == 'Invalid JSON'
+    assert 'Server-Timing' in response.headers
+
+
+def test_flask_routes_are_mounted(asgi_app):
+    response = _request(asgi_app, 'GET', '/api/health')
+    assert response.status_code == 200
@@ -0,0 +1,21 @@
+import pytest
+
+from loadtest.loadgen import percentile
+
+
+@pytest.mark.parametrize('values, q, expected', [
+    (list(range(1, 101)), 50, 50),
+    (list(range(1, 101)), 95, 95),
+    (list(range(1, 101)), 99, 99),
+    (list(range(1, 101)), 100, 100),
+    (list(range(1, 11)), 50, 5),
+    (list(range(1, 11)), 95, 10),
+    (list(range(1, 11)), 0, 1),
+    ([7.0], 99, 7.0),
+])
+def test_nearest_rank_percentile(values, q, expected):
+    assert percentile(values, q) == expected
+
+
+def test_percentile_of_nothing():
+    assert percentile([], 50) is None
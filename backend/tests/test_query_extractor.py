@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pytest
+
+from utils.query_extractor import FAST_PATH_MIN_CONFIDENCE, QueryExtractor, normalize_prompt, resolve_datetime
+
+
+@pytest.fixture(scope='module')
+def extractor():
+    return QueryExtractor()
+
+
+@pytest.mark.parametrize('prompt, location', [
+    ("How is the air quality in Dublin?", 'Dublin'),
+    ("air quality in Galway tomorrow morning", 'Galway'),
+    ("Is it safe to go running in Cork today", 'Cork'),
+    ("air quality in Springfield, IL", 'Springfield, IL'),
+    ("What's the AQI in San Jose, CA right now", 'San Jose, CA'),
+    ("In Dublin, what's the air like", 'Dublin'),
+])
+def test_simple_queries_take_the_fast_path(extractor, prompt, location):
+    params, confidence = extractor.extract(prompt)
+    assert params['location'] == location
+    assert confidence >= FAST_PATH_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize('prompt, location', [
+    ("air quality in Trim tomorrow morning", 'Trim'),
+    ("Is air good for kids in Tuam today", 'Tuam'),
+    ("air quality in Dubln", 'Dubln'),
+])
+def test_fuzzy_matches_keep_the_users_text_and_go_to_the_llm(extractor, prompt, location):
+    params, confidence = extractor.extract(prompt)
+    assert params['location'] == location
+    assert confidence < FAST_PATH_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize('prompt', [
+    "air quality in Springfield, Narnia",
+    "air quality in Dublin, Leinster",
+])
+def test_unresolved_qualifier_goes_to_the_llm(extractor, prompt):
+    _, confidence = extractor.extract(prompt)
+    assert confidence < FAST_PATH_MIN_CONFIDENCE
+
+
+def test_lowercase_place_scores_lower(extractor):
+    params, lower = extractor.extract("air quality in dublin")
+    _, capitalized = extractor.extract("air quality in Dublin")
+    assert params['location'] == 'Dublin'
+    assert lower < capitalized
+
+
+def test_no_location(extractor):
+    params, confidence = extractor.extract("is the air good for health")
+    assert params['location'] is None
+    assert confidence == 0.0
+
+
+@pytest.mark.parametrize('prompt', [
+    "air quality in Dublin vs Galway",
+    "compare Dublin and Cork",
+    "Dublin vs Cork air quality",
+    "which is better, London or Paris?",
+    "Is the air in London worse than Paris",
+    "Dublin and Cork air quality",
+])
+def test_comparison_goes_to_the_llm(extractor, prompt):
+    _, confidence = extractor.extract(prompt)
+    assert confidence < FAST_PATH_MIN_CONFIDENCE
+
+
+def test_time_expression_is_not_a_place(extractor):
+    params, _ = extractor.extract("air quality in Dublin in 3 hours")
+    assert params['location'] == 'Dublin'
+    assert params['time_descriptor'] == 'in 3 hours'
+
+
+def test_keywords(extractor):
+    params, _ = extractor.extract("My kid has asthma, is it safe to go cycling in Galway? Explain why")
+    assert params['context_type'] == 'health'
+    assert params['special_concerns'] == ['asthma', 'children']
+    assert params['analysis_depth'] == 'detailed'
+    assert params['query_intent'] == 'analysis'
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  AQI in Dublin?? ") == 'aqi in dublin'
+
+
+def test_resolve_datetime():
+    reference = datetime(2025, 3, 10, 9, 30)  # a Monday
+    assert resolve_datetime(None, reference) == '2025-03-10 09:30:00'
+    assert resolve_datetime('right now', reference) == '2025-03-10 09:30:00'
+    assert resolve_datetime('tomorrow', reference).startswith('2025-03-11')
@@ -0,0 +1,204 @@
+"""
+Per-threshold alert state tracking for AuraCast
+Keeps one ok/warning/critical/resolved state per (subscription, parameter)
+in flat arrays so checks never have to rescan the alert history
+"""
+
+from array import array
+from datetime import datetime, timedelta
+from enum import IntEnum
+from typing import Dict, List, Optional, Tuple
+
+
+class AlertState(IntEnum):
+    OK = 0
+    WARNING = 1
+    CRITICAL = 2
+    RESOLVED = 3
+
+
+class AlertTransition(IntEnum):
+    """What a state update means for the subscriber"""
+    NONE = 0
+    TRIGGERED = 1    # ok/resolved -> warning/critical
+    ESCALATED = 2    # warning -> critical
+    DEESCALATED = 3  # critical -> warning
+    REMINDER = 4     # still breached and cooldown elapsed
+    RESOLVED = 5     # warning/critical -> resolved
+
+
+# States in which a threshold counts as an open alert
+ACTIVE_STATES = (AlertState.WARNING, AlertState.CRITICAL)
+
+# Default re-notification windows while a breach persists
+DEFAULT_COOLDOWNS = {
+    AlertState.WARNING: timedelta(minutes=30),
+    AlertState.CRITICAL: timedelta(minutes=15),
+}
+
+
+class AlertStateTable:
+    """Array-backed state machine for every (alert_id, parameter) pair
+
+    A breach opens at ``warning_level``/``critical_level`` but only steps down
+    once the value drops below the level by ``hysteresis`` (a fraction of the
+    level), so readings hovering around a threshold do not flap.
+    """
+
+    def __init__(self, hysteresis: float = 0.1,
+                 cooldowns: Optional[Dict[AlertState, timedelta]] = None):
+        self.hysteresis = hysteresis
+        self.cooldowns = dict(DEFAULT_COOLDOWNS)
+        if cooldowns:
+            self.cooldowns.update(cooldowns)
+
+        self._slots: Dict[Tuple[str, str], int] = {}
+        self._slot_keys: List[Optional[Tuple[str, str]]] = []
+        self._alert_slots: Dict[str, List[int]] = {}
+        self._free_slots: List[int] = []
+
+        # Column storage, indexed by slot
+        self.states = array('B')
+        self.values = array('d')
+        self.changed_at = array('d')
+        self.notified_at = array('d')
+        self.forecast_until = array('d')  # last hour of the announced forecast breach episode (0 = none)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def slot(self, alert_id: str, parameter: str) -> int:
+        """Get (or allocate) the slot for an alert/parameter pair"""
+        key = (alert_id, parameter)
+        slot = self._slots.get(key)
+        if slot is not None:
+            return slot
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self.states[slot] = AlertState.OK
+            self.values[slot] = 0.0
+            self.changed_at[slot] = 0.0
+            self.notified_at[slot] = 0.0
+            self.forecast_until[slot] = 0.0
+            self._slot_keys[slot] = key
+        else:
+            slot = len(self.states)
+            self._slot_keys.append(key)
+            self.states.append(AlertState.OK)
+            self.values.append(0.0)
+            self.changed_at.append(0.0)
+            self.notified_at.append(0.0)
+            self.forecast_until.append(0.0)
+
+        self._slots[key] = slot
+        self._alert_slots.setdefault(alert_id, []).append(slot)
+        return slot
+
+    def release(self, alert_id: str):
+        """Drop all state for a subscription and recycle its slots"""
+        for slot in self._alert_slots.pop(alert_id, []):
+            del self._slots[self._slot_keys[slot]]
+            self._slot_keys[slot] = None
+            self._free_slots.append(slot)
+
+    def get_state(self, alert_id: str, parameter: str) -> AlertState:
+        """Current state for an alert/parameter pair (OK if never seen)"""
+        slot = self._slots.get((alert_id, parameter))
+        if slot is None:
+            return AlertState.OK
+        return AlertState(self.states[slot])
+
+    def get_states(self, alert_id: str) -> Dict[str, AlertState]:
+        """All tracked parameter states for a subscription"""
+        return {
+            self._slot_keys[slot][1]: AlertState(self.states[slot])
+            for slot in self._alert_slots.get(alert_id, [])
+        }
+
+    def get_active(self, alert_id: str) -> List[Tuple[str, AlertState, float, datetime]]:
+        """Open breaches for a subscription as (parameter, state, value, since)"""
+        active = []
+        for slot in self._alert_slots.get(alert_id, []):
+            state = self.states[slot]
+            if state in ACTIVE_STATES:
+                active.append((
+                    self._slot_keys[slot][1],
+                    AlertState(state),
+                    self.values[slot],
+                    datetime.fromtimestamp(self.changed_at[slot])
+                ))
+        return active
+
+    def _classify(self, current: int, value: float,
+                  warning_level: float, critical_level: float) -> AlertState:
+        """Target state for a reading, applying hysteresis on the way down"""
+        if value >= critical_level:
+            return AlertState.CRITICAL
+        if current == AlertState.CRITICAL and value >= critical_level * (1 - self.hysteresis):
+            return AlertState.CRITICAL
+
+        if value >= warning_level:
+            return AlertState.WARNING
+        if current in ACTIVE_STATES and value >= warning_level * (1 - self.hysteresis):
+            return AlertState.WARNING
+
+        if current in ACTIVE_STATES:
+            return AlertState.RESOLVED
+        return AlertState(current) if current == AlertState.RESOLVED else AlertState.OK
+
+    def update(self, alert_id: str, parameter: str, value: float,
+               warning_level: float, critical_level: float,
+               now: datetime) -> Tuple[AlertTransition, AlertState]:
+        """Feed a reading into the state machine
+
+        Returns the transition to report (NONE if the subscriber should not
+        hear about it) and the new state.
+        """
+        slot = self.slot(alert_id, parameter)
+        current = self.states[slot]
+        new_state = self._classify(current, value, warning_level, critical_level)
+        timestamp = now.timestamp()
+
+        self.values[slot] = value
+
+        if new_state == current:
+            cooldown = self.cooldowns.get(new_state)
+            if (cooldown is not None and
+                    timestamp - self.notified_at[slot] >= cooldown.total_seconds()):
+                self.notified_at[slot] = timestamp
+                return AlertTransition.REMINDER, new_state
+            return AlertTransition.NONE, new_state
+
+        self.states[slot] = new_state
+        self.changed_at[slot] = timestamp
+
+        if new_state == AlertState.RESOLVED:
+            transition = AlertTransition.RESOLVED
+        elif current == AlertState.WARNING and new_state == AlertState.CRITICAL:
+            transition = AlertTransition.ESCALATED
+        elif current == AlertState.CRITICAL and new_state == AlertState.WARNING:
+            transition = AlertTransition.DEESCALATED
+        else:
+            transition = AlertTransition.TRIGGERED
+
+        self.notified_at[slot] = timestamp
+        return transition, new_state
+
+    def update_forecast(self, alert_id: str, parameter: str, expected_at: Optional[datetime],
+                        until: Optional[datetime] = None, gap_seconds: float = 3600.0) -> bool:
+        """Record a predicted breach episode (first to last breached hour); True if it is new
+
+        Later checks that still predict the breach, starting no more than
+        ``gap_seconds`` after the announced episode ends, continue that episode
+        and are not announced again. Passing None (no breach expected) ends
+        the episode, so a later prediction is announced again.
+        """
+        slot = self.slot(alert_id, parameter)
+        if expected_at is None:
+            self.forecast_until[slot] = 0.0
+            return False
+
+        announced_until = self.forecast_until[slot]
+        self.forecast_until[slot] = (until or expected_at).timestamp()
+        return not announced_until or expected_at.timestamp() > announced_until + gap_seconds
@@ -5,13 +5,20 @@ Handles threshold monitoring, user notifications, and alert management
 
 import json
 import logging
+import sys
 import time
+from array import array
+from bisect import bisect_left
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple
 from dataclasses import dataclass, asdict
 from enum import Enum
 import threading
 from collections import defaultdict
+import numpy as np
+from .alert_state import AlertState, AlertStateTable, AlertTransition
+from .event_stream import event_broker, location_topic, contact_topic
+from .metrics import timed
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -29,7 +36,7 @@ class AlertType(Enum):
     GENERAL = "general"
     THRESHOLD_BREACH = "threshold_breach"
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AlertThreshold:
     """Defines alert thresholds for different parameters"""
     parameter: str
@@ -38,65 +45,278 @@ class AlertThreshold:
     unit: str
     description: str
 
-@dataclass
+# Interned thresholds and threshold sets, shared by reference across subscriptions
+_interned_thresholds: Dict[AlertThreshold, AlertThreshold] = {}
+_interned_threshold_sets: Dict[Tuple[AlertThreshold, ...], Tuple[AlertThreshold, ...]] = {}
+_intern_lock = threading.Lock()
+
+def intern_thresholds(thresholds: Iterable[AlertThreshold]) -> Tuple[AlertThreshold, ...]:
+    """Return the shared immutable threshold set equal to ``thresholds``"""
+    with _intern_lock:
+        key = tuple(_interned_thresholds.setdefault(t, t) for t in thresholds)
+        return _interned_threshold_sets.setdefault(key, key)
+
+@dataclass(slots=True)
 class UserAlert:
     """User's alert subscription"""
     contact_info: str  # mobile number or email
     location: str
     alert_type: AlertType
-    thresholds: List[AlertThreshold]
+    thresholds: Tuple[AlertThreshold, ...]  # interned, see intern_thresholds
     notification_method: str  # email or sms
     is_active: bool = True
     created_at: datetime = None
     last_triggered: Optional[datetime] = None
     context_from_query: Dict[str, Any] = None  # Store original query context
+    coordinates: Optional[Dict[str, float]] = None  # {'lat', 'lon'} when geocoded
+
+def format_alert_message(alert_type: AlertType, location: str, threshold: AlertThreshold,
+                         current_value: float, severity: AlertSeverity,
+                         is_resolved: bool = False,
+                         expected_at: Optional[datetime] = None) -> str:
+    """Generate human-readable alert message"""
+    if is_resolved:
+        return f"✅ Resolved: {threshold.description} in {location} is back to {current_value:.1f} {threshold.unit} (threshold: {threshold.warning_level:.1f} {threshold.unit})."
+    
+    if expected_at is not None:
+        emoji = "🔮🚨" if severity == AlertSeverity.CRITICAL else "🔮"
+        return f"{emoji} Forecast Alert: {threshold.description} in {location} is expected to reach {current_value:.1f} {threshold.unit} at {expected_at.strftime('%H:00')} (threshold: {threshold.warning_level:.1f} {threshold.unit})."
+    
+    severity_emoji = {
+        AlertSeverity.LOW: "⚠️",
+        AlertSeverity.MEDIUM: "🚨",
+        AlertSeverity.HIGH: "🔴",
+        AlertSeverity.CRITICAL: "🚨🚨"
+    }
+    
+    emoji = severity_emoji.get(severity, "⚠️")
+    
+    if alert_type == AlertType.HEALTH:
+        return f"{emoji} Health Alert: {threshold.description} in {location} is {current_value:.1f} {threshold.unit} (threshold: {threshold.warning_level:.1f} {threshold.unit}). Consider reducing outdoor activities."
+    
+    elif alert_type == AlertType.INDUSTRIAL:
+        return f"{emoji} Industrial Alert: {threshold.description} in {location} industrial area is {current_value:.1f} {threshold.unit} (threshold: {threshold.warning_level:.1f} {threshold.unit}). Monitor ventilation systems."
+    
+    elif alert_type == AlertType.OUTDOOR_ACTIVITY:
+        return f"{emoji} Outdoor Activity Alert: Air quality in {location} is not ideal for outdoor activities. {threshold.description}: {current_value:.1f} {threshold.unit} (threshold: {threshold.warning_level:.1f} {threshold.unit})."
+    
+    else:
+        return f"{emoji} Air Quality Alert: {threshold.description} in {location} is {current_value:.1f} {threshold.unit} (threshold: {threshold.warning_level:.1f} {threshold.unit})."
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class AlertEvent:
-    """Represents a triggered alert"""
+    """Represents a triggered alert (the message is built when read)"""
     alert_id: str
     contact_info: str
     location: str
-    parameter: str
     current_value: float
     threshold_value: float
     severity: AlertSeverity
-    message: str
     timestamp: datetime
+    threshold: AlertThreshold
+    alert_type: AlertType
     is_resolved: bool = False
+    expected_at: Optional[datetime] = None  # set for forecast (predictive) alerts
+    
+    @property
+    def parameter(self) -> str:
+        return self.threshold.parameter
+    
+    @property
+    def message(self) -> str:
+        return format_alert_message(
+            self.alert_type, self.location, self.threshold, self.current_value,
+            self.severity, self.is_resolved, self.expected_at
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable view of the event"""
+        return {
+            'alert_id': self.alert_id,
+            'contact_info': self.contact_info,
+            'location': self.location,
+            'parameter': self.parameter,
+            'current_value': self.current_value,
+            'threshold_value': self.threshold_value,
+            'severity': self.severity.value,
+            'message': self.message,
+            'timestamp': self.timestamp.isoformat(),
+            'is_resolved': self.is_resolved,
+            'expected_at': self.expected_at.isoformat() if self.expected_at else None
+        }
+
+class _InternTable:
+    """Maps values to small integer IDs for columnar storage"""
+    
+    def __init__(self):
+        self.values: List[Any] = []
+        self._ids: Dict[Any, int] = {}
+    
+    def id_for(self, value: Any) -> int:
+        value_id = self._ids.get(value)
+        if value_id is None:
+            value_id = len(self.values)
+            self._ids[value] = value_id
+            self.values.append(value)
+        return value_id
+    
+    def find(self, value: Any) -> Optional[int]:
+        return self._ids.get(value)
+
+_SEVERITIES = list(AlertSeverity)
+_ALERT_TYPES = list(AlertType)
+
+# Threshold parameter -> (predict_batch key, model targets it is computed from)
+# no2/co thresholds are column densities and aod is optical depth, as the
+# satellite targets are; parameters missing here are not forecast
+FORECAST_PARAMETERS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    'pm25': ('pm25', ('pm25',)),
+    'o3': ('o3', ('o3',)),
+    'aqi': ('aqi', ('pm25', 'o3')),
+    'no2': ('tempo_no2', ('tempo_no2',)),
+    'co': ('tropomi_co', ('tropomi_co',)),
+    'aod': ('modis_aod', ('modis_aod',)),
+}
+
+class AlertHistory:
+    """Append-only, column-oriented log of alert events
+    
+    Events are kept as parallel arrays, with strings and thresholds interned
+    in lookup tables; AlertEvent objects are only materialized when read.
+    """
+    
+    def __init__(self):
+        self._timestamps = array('d')
+        self._values = array('d')
+        self._threshold_values = array('d')
+        self._expected_at = array('d')  # 0.0 unless a forecast alert
+        self._severities = array('B')
+        self._alert_types = array('B')
+        self._resolved = array('B')
+        self._alert_ids = array('I')
+        self._contacts = array('I')
+        self._locations = array('I')
+        self._thresholds = array('I')
+        
+        self._alert_id_table = _InternTable()
+        self._contact_table = _InternTable()
+        self._location_table = _InternTable()
+        self._threshold_table = _InternTable()
+    
+    def __len__(self) -> int:
+        return len(self._timestamps)
+    
+    def __iter__(self) -> Iterator[AlertEvent]:
+        for i in range(len(self)):
+            yield self[i]
+    
+    def __getitem__(self, i: int) -> AlertEvent:
+        expected_at = self._expected_at[i]
+        return AlertEvent(
+            alert_id=self._alert_id_table.values[self._alert_ids[i]],
+            contact_info=self._contact_table.values[self._contacts[i]],
+            location=self._location_table.values[self._locations[i]],
+            current_value=self._values[i],
+            threshold_value=self._threshold_values[i],
+            severity=_SEVERITIES[self._severities[i]],
+            timestamp=datetime.fromtimestamp(self._timestamps[i]),
+            threshold=self._threshold_table.values[self._thresholds[i]],
+            alert_type=_ALERT_TYPES[self._alert_types[i]],
+            is_resolved=bool(self._resolved[i]),
+            expected_at=datetime.fromtimestamp(expected_at) if expected_at else None
+        )
+    
+    def append(self, event: AlertEvent):
+        """Add an event; callers append in timestamp order (query bisects the timestamps)"""
+        timestamp = event.timestamp.timestamp()
+        if self._timestamps and timestamp < self._timestamps[-1]:
+            timestamp = self._timestamps[-1]  # e.g. the wall clock stepped back
+        self._timestamps.append(timestamp)
+        self._values.append(event.current_value)
+        self._threshold_values.append(event.threshold_value)
+        self._expected_at.append(event.expected_at.timestamp() if event.expected_at else 0.0)
+        self._severities.append(_SEVERITIES.index(event.severity))
+        self._alert_types.append(_ALERT_TYPES.index(event.alert_type))
+        self._resolved.append(1 if event.is_resolved else 0)
+        self._alert_ids.append(self._alert_id_table.id_for(event.alert_id))
+        self._contacts.append(self._contact_table.id_for(event.contact_info))
+        self._locations.append(self._location_table.id_for(event.location))
+        self._thresholds.append(self._threshold_table.id_for(event.threshold))
+    
+    def query(self, since: datetime, contact_info: Optional[str] = None,
+              location: Optional[str] = None) -> Iterator[AlertEvent]:
+        """Events at or after ``since``, newest first, with optional filters"""
+        # Events whose last column is written; an append still in progress is skipped
+        end = len(self._thresholds)
+        start = bisect_left(self._timestamps, since.timestamp(), 0, end)
+        
+        contact_id = None
+        if contact_info:
+            contact_id = self._contact_table.find(contact_info)
+            if contact_id is None:
+                return
+        
+        location_ids = None
+        if location:
+            location_ids = {
+                i for i, name in enumerate(self._location_table.values)
+                if name.lower() == location.lower()
+            }
+            if not location_ids:
+                return
+        
+        for i in range(end - 1, start - 1, -1):
+            if contact_id is not None and self._contacts[i] != contact_id:
+                continue
+            if location_ids is not None and self._locations[i] not in location_ids:
+                continue
+            yield self[i]
 
 class AlertSystem:
     """Main alert system for real-time monitoring"""
     
-    def __init__(self):
+    def __init__(self, hysteresis: float = 0.1,
+                 cooldowns: Optional[Dict[AlertState, timedelta]] = None):
         self.user_alerts: Dict[str, UserAlert] = {}
-        self.alert_history: List[AlertEvent] = []
+        self.alert_history = AlertHistory()
         self.monitoring_active = False
         self.monitoring_thread = None
+        self.forecast_thread = None
+        self.last_forecast_check: Optional[datetime] = None
+        self.forecast_interval_seconds: Optional[int] = None
+        
+        # Per-(subscription, parameter) ok/warning/critical/resolved state
+        self.alert_states = AlertStateTable(hysteresis=hysteresis, cooldowns=cooldowns)
+        self._lock = threading.RLock()
+        self.event_broker = event_broker
+        
+        # Subscription indexes (alert IDs by lowercased location / contact)
+        self._location_index: Dict[str, set] = defaultdict(set)
+        self._contact_index: Dict[str, set] = defaultdict(set)
         
         # Default thresholds for different contexts
         self.default_thresholds = {
-            AlertType.HEALTH: [
+            AlertType.HEALTH: intern_thresholds([
                 AlertThreshold("pm25", 25.0, 50.0, "µg/m³", "PM2.5 fine particles"),
                 AlertThreshold("o3", 100, 150, "ppb", "Ground-level ozone"),
                 AlertThreshold("no2", 2e15, 4e15, "molecules/cm²", "Nitrogen dioxide"),
                 AlertThreshold("aqi", 100, 150, "index", "Air Quality Index")
-            ],
-            AlertType.INDUSTRIAL: [
+            ]),
+            AlertType.INDUSTRIAL: intern_thresholds([
                 AlertThreshold("pm25", 35.0, 55.0, "µg/m³", "PM2.5 fine particles"),
                 AlertThreshold("no2", 3e15, 5e15, "molecules/cm²", "Nitrogen dioxide"),
                 AlertThreshold("co", 2e18, 3e18, "molecules/cm²", "Carbon monoxide"),
                 AlertThreshold("aod", 0.3, 0.5, "dimensionless", "Aerosol Optical Depth")
-            ],
-            AlertType.OUTDOOR_ACTIVITY: [
+            ]),
+            AlertType.OUTDOOR_ACTIVITY: intern_thresholds([
                 AlertThreshold("pm25", 20.0, 35.0, "µg/m³", "PM2.5 fine particles"),
                 AlertThreshold("o3", 80, 120, "ppb", "Ground-level ozone"),
                 AlertThreshold("aqi", 80, 100, "index", "Air Quality Index")
-            ],
-            AlertType.GENERAL: [
+            ]),
+            AlertType.GENERAL: intern_thresholds([
                 AlertThreshold("aqi", 100, 150, "index", "Air Quality Index"),
                 AlertThreshold("pm25", 25.0, 50.0, "µg/m³", "PM2.5 fine particles")
-            ]
+            ])
         }
     
     def subscribe_user_alert_from_context(self, contact_info: str, location: str, 
@@ -113,19 +333,140 @@ class AlertSystem:
         
         user_alert = UserAlert(
             contact_info=contact_info,
-            location=location,
+            location=sys.intern(location),
             alert_type=alert_type,
             thresholds=thresholds,
-            notification_method=notification_method,
+            notification_method=sys.intern(notification_method),
             created_at=datetime.now(),
             context_from_query=input_context
         )
         
-        self.user_alerts[alert_id] = user_alert
-        logger.info(f"User {contact_info} subscribed to {alert_type.value} alerts for {location}")
+        with self._lock:
+            self._add_alert(alert_id, user_alert)
+        logger.info("User %s subscribed to %s alerts for %s", contact_info, alert_type.value, location)
         
         return alert_id
     
+    def subscribe_user_alert(self, user_id: str, location: str, alert_type: AlertType,
+                             notification_methods: List[str],
+                             custom_thresholds: Optional[List[Any]] = None,
+                             coordinates: Optional[Dict[str, float]] = None) -> str:
+        """Subscribe a user to alerts of a given type, optionally with custom thresholds"""
+        alert_id, user_alert = self._build_user_alert(
+            user_id, location, alert_type, notification_methods, custom_thresholds, coordinates
+        )
+        
+        with self._lock:
+            self._add_alert(alert_id, user_alert)
+        logger.info("User %s subscribed to %s alerts for %s", user_id, alert_type.value, location)
+        
+        return alert_id
+    
+    def bulk_subscribe(self, subscriptions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert many subscriptions in a single transaction
+        
+        Each item takes the keyword arguments of ``subscribe_user_alert``.
+        Subscriptions that already exist (same contact, location, alert type
+        and thresholds) are reported rather than duplicated, so an import can
+        be re-run; different thresholds (another template, custom levels) for
+        the same alert type are a separate subscription.
+        Returns one ``{'alert_id', 'created'}`` dict per item, in order.
+        """
+        built = [
+            self._build_user_alert(
+                item['user_id'], item['location'], item['alert_type'],
+                item['notification_methods'], item.get('custom_thresholds'),
+                item.get('coordinates')
+            )
+            for item in subscriptions
+        ]
+        
+        results = []
+        with self._lock:
+            for alert_id, user_alert in built:
+                existing_id = self._find_existing_alert(user_alert)
+                if existing_id:
+                    results.append({'alert_id': existing_id, 'created': False})
+                    continue
+                # Rows for one contact, location and type in the same second share an ID prefix
+                base_id, suffix = alert_id, 1
+                while alert_id in self.user_alerts:
+                    suffix += 1
+                    alert_id = f"{base_id}_{suffix}"
+                self._add_alert(alert_id, user_alert)
+                results.append({'alert_id': alert_id, 'created': True})
+        
+        created = sum(1 for result in results if result['created'])
+        logger.info(f"Bulk subscription: {created} created, {len(results) - created} already existed")
+        return results
+    
+    def _build_user_alert(self, user_id: str, location: str, alert_type: AlertType,
+                          notification_methods: List[str],
+                          custom_thresholds: Optional[List[Any]],
+                          coordinates: Optional[Dict[str, float]]):
+        """Create (alert_id, UserAlert) for a subscription request"""
+        if isinstance(notification_methods, str):
+            notification_methods = [notification_methods]
+        
+        if custom_thresholds:
+            thresholds = intern_thresholds(self._coerce_threshold(t) for t in custom_thresholds)
+        else:
+            thresholds = self.default_thresholds.get(alert_type, ())
+        
+        alert_id = f"{user_id}_{location}_{alert_type.value}_{int(time.time())}"
+        user_alert = UserAlert(
+            contact_info=user_id,
+            location=sys.intern(location),
+            alert_type=alert_type,
+            thresholds=thresholds,
+            notification_method=sys.intern(','.join(notification_methods)),
+            created_at=datetime.now(),
+            coordinates=coordinates
+        )
+        return alert_id, user_alert
+    
+    def _coerce_threshold(self, threshold: Any) -> AlertThreshold:
+        """Accept AlertThreshold objects or template/JSON style dicts"""
+        if isinstance(threshold, AlertThreshold):
+            return threshold
+        return AlertThreshold(
+            parameter=threshold['parameter'],
+            warning_level=float(threshold.get('warning_level', threshold.get('warning'))),
+            critical_level=float(threshold.get('critical_level', threshold.get('critical'))),
+            unit=threshold.get('unit', ''),
+            description=threshold.get('description', threshold['parameter'])
+        )
+    
+    def _find_existing_alert(self, user_alert: UserAlert) -> Optional[str]:
+        """Alert ID of an equivalent subscription, if one exists"""
+        for alert_id in self._contact_index.get(user_alert.contact_info, ()):
+            existing = self.user_alerts[alert_id]
+            if (existing.location.lower() == user_alert.location.lower() and
+                    existing.alert_type == user_alert.alert_type and
+                    existing.thresholds == user_alert.thresholds):
+                return alert_id
+        return None
+    
+    def _add_alert(self, alert_id: str, user_alert: UserAlert):
+        """Store a subscription and index it (caller holds the lock)"""
+        if alert_id in self.user_alerts:
+            self._remove_alert(alert_id)
+        self.user_alerts[alert_id] = user_alert
+        self._location_index[user_alert.location.lower()].add(alert_id)
+        self._contact_index[user_alert.contact_info].add(alert_id)
+    
+    def _remove_alert(self, alert_id: str):
+        """Drop a subscription, its index entries and its state (caller holds the lock)"""
+        user_alert = self.user_alerts.pop(alert_id)
+        location_key = user_alert.location.lower()
+        self._location_index[location_key].discard(alert_id)
+        if not self._location_index[location_key]:
+            del self._location_index[location_key]
+        self._contact_index[user_alert.contact_info].discard(alert_id)
+        if not self._contact_index[user_alert.contact_info]:
+            del self._contact_index[user_alert.contact_info]
+        self.alert_states.release(alert_id)
+    
     def _determine_alert_type_from_context(self, context: Dict[str, Any]) -> AlertType:
         """Determine alert type from Input Agent context"""
         context_type = context.get('context_type', 'general')
@@ -141,83 +482,243 @@ class AlertSystem:
         else:
             return AlertType.GENERAL
     
-    def _get_thresholds_from_context(self, context: Dict[str, Any], alert_type: AlertType) -> List[AlertThreshold]:
+    def _get_thresholds_from_context(self, context: Dict[str, Any], alert_type: AlertType) -> Tuple[AlertThreshold, ...]:
         """Get appropriate thresholds based on context"""
         # Start with default thresholds for the alert type
-        thresholds = self.default_thresholds.get(alert_type, [])
+        thresholds = self.default_thresholds.get(alert_type, ())
         
         # Adjust based on special concerns
         special_concerns = context.get('special_concerns', [])
         if 'asthma' in str(special_concerns).lower():
             # More sensitive thresholds for asthma
-            thresholds = [
+            thresholds = intern_thresholds([
                 AlertThreshold("pm25", 12.0, 20.0, "µg/m³", "PM2.5 fine particles"),
                 AlertThreshold("o3", 60, 80, "ppb", "Ground-level ozone"),
                 AlertThreshold("aqi", 50, 80, "index", "Air Quality Index")
-            ]
+            ])
         
         return thresholds
     
     def unsubscribe_user_alert(self, alert_id: str) -> bool:
         """Unsubscribe a user from alerts"""
-        if alert_id in self.user_alerts:
-            del self.user_alerts[alert_id]
-            logger.info(f"Alert subscription {alert_id} removed")
-            return True
+        with self._lock:
+            if alert_id in self.user_alerts:
+                self._remove_alert(alert_id)
+                logger.info(f"Alert subscription {alert_id} removed")
+                return True
         return False
     
     def check_alerts(self, location: str, air_quality_data: Dict[str, Any]) -> List[AlertEvent]:
-        """Check if current air quality data triggers any alerts"""
+        """Check if current air quality data triggers any alerts
+        
+        Every threshold of every subscription is tracked independently, so
+        simultaneous breaches each produce an event, and a breach that clears
+        produces a resolution event (``is_resolved=True``).
+        """
         triggered_alerts = []
+        
+        with self._lock:
+            # Taken under the lock, so events reach alert_history in timestamp order
+            current_time = datetime.now()
+            # Find all active alerts for this location
+            location_alerts = [
+                (alert_id, self.user_alerts[alert_id])
+                for alert_id in self._location_index.get(location.lower(), ())
+                if self.user_alerts[alert_id].is_active
+            ]
+            
+            for alert_id, alert in location_alerts:
+                for threshold in alert.thresholds:
+                    parameter = threshold.parameter
+                    current_value = self._get_parameter_value(air_quality_data, parameter)
+                    
+                    if current_value is None:
+                        continue
+                    
+                    transition, state = self.alert_states.update(
+                        alert_id, parameter, current_value,
+                        threshold.warning_level, threshold.critical_level,
+                        current_time
+                    )
+                    
+                    if transition == AlertTransition.NONE:
+                        continue
+                    
+                    is_resolved = transition == AlertTransition.RESOLVED
+                    if is_resolved:
+                        severity = AlertSeverity.LOW
+                    elif state == AlertState.CRITICAL:
+                        severity = AlertSeverity.CRITICAL
+                    else:
+                        severity = AlertSeverity.MEDIUM
+                    
+                    alert_event = AlertEvent(
+                        alert_id=alert_id,
+                        contact_info=alert.contact_info,
+                        location=alert.location,
+                        current_value=current_value,
+                        threshold_value=threshold.critical_level if severity == AlertSeverity.CRITICAL else threshold.warning_level,
+                        severity=severity,
+                        timestamp=current_time,
+                        threshold=threshold,
+                        alert_type=alert.alert_type,
+                        is_resolved=is_resolved
+                    )
+                    
+                    triggered_alerts.append(alert_event)
+                    self.alert_history.append(alert_event)
+                    
+                    if not is_resolved:
+                        alert.last_triggered = current_time
+                    
+                    logger.info("Alert %s: %s", transition.name.lower(), alert_event.message)
+        
+        self._publish_events(triggered_alerts)
+        return triggered_alerts
+    
+    def _publish_events(self, events: List[AlertEvent]):
+        """Push new alert events to streaming clients of the location and contact"""
+        for event in events:
+            payload = event.to_dict()
+            event_name = 'forecast' if event.expected_at else 'alert'
+            self.event_broker.publish(location_topic(event.location), event_name, payload)
+            self.event_broker.publish(contact_topic(event.contact_info), event_name, payload)
+    
+    def check_forecast_alerts(self, predictor, hours: int = 6,
+                              start_time: Optional[datetime] = None,
+                              geocoder=None) -> List[AlertEvent]:
+        """Evaluate all subscriptions against a batched model forecast
+        
+        Every monitored location is forecast for the next ``hours`` hours in
+        a single ``predictor.predict_batch`` call, then each parameter's
+        thresholds are compared against the (location x hour) forecast matrix
+        in one vectorized pass. An "expected breach" event is emitted once per
+        threshold and breach episode: a breach still predicted on the next
+        check is the same episode. Parameters the model does not predict
+        (see FORECAST_PARAMETERS) are skipped.
+        """
         current_time = datetime.now()
+        if start_time is None:
+            start_time = current_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        forecast_times = [start_time + timedelta(hours=h) for h in range(hours)]
         
-        # Find all active alerts for this location
-        location_alerts = [
-            (alert_id, alert) for alert_id, alert in self.user_alerts.items()
-            if alert.location.lower() == location.lower() and alert.is_active
-        ]
+        with self._lock:
+            subscriptions = [(alert_id, alert) for alert_id, alert in self.user_alerts.items() if alert.is_active]
         
-        for alert_id, alert in location_alerts:
+        # One coordinate pair per distinct location
+        location_coords: Dict[str, Optional[Dict[str, float]]] = {}
+        for _, alert in subscriptions:
+            if alert.coordinates and not location_coords.get(alert.location.lower()):
+                location_coords[alert.location.lower()] = alert.coordinates
+        for _, alert in subscriptions:
+            key = alert.location.lower()
+            if key not in location_coords and geocoder is not None:
+                result = geocoder.geocode(alert.location)
+                location_coords[key] = {'lat': result['lat'], 'lon': result['lon']} if result else None
+        
+        location_index: Dict[str, int] = {}
+        lats, lons = [], []
+        for key, coords in location_coords.items():
+            if coords:
+                location_index[key] = len(lats)
+                lats.append(coords['lat'])
+                lons.append(coords['lon'])
+        
+        if not location_index or hours <= 0:
+            self.last_forecast_check = current_time
+            return []
+        
+        # Single batched inference over every (location, hour) pair
+        forecast = predictor.predict_batch(
+            np.repeat(lats, hours), np.repeat(lons, hours), forecast_times * len(lats)
+        )
+        
+        # Group threshold rows by parameter: (location row, warning, critical, refs)
+        by_parameter: Dict[str, tuple] = defaultdict(lambda: ([], [], [], []))
+        for alert_id, alert in subscriptions:
+            row = location_index.get(alert.location.lower())
+            if row is None:
+                continue
             for threshold in alert.thresholds:
-                parameter = threshold.parameter
-                current_value = self._get_parameter_value(air_quality_data, parameter)
-                
-                if current_value is None:
-                    continue
-                
-                # Check if threshold is breached
-                severity = None
-                if current_value >= threshold.critical_level:
-                    severity = AlertSeverity.CRITICAL
-                elif current_value >= threshold.warning_level:
-                    severity = AlertSeverity.MEDIUM
-                
-                if severity:
-                    # Check if we should trigger (avoid spam - only if not triggered recently)
-                    if (alert.last_triggered is None or 
-                        current_time - alert.last_triggered > timedelta(minutes=30)):
-                        
-                        alert_event = AlertEvent(
-                            alert_id=alert_id,
-                            contact_info=alert.contact_info,
-                            location=location,
-                            parameter=parameter,
-                            current_value=current_value,
-                            threshold_value=threshold.warning_level if severity == AlertSeverity.MEDIUM else threshold.critical_level,
-                            severity=severity,
-                            message=self._generate_alert_message(alert, threshold, current_value, severity),
-                            timestamp=current_time
-                        )
-                        
-                        triggered_alerts.append(alert_event)
-                        self.alert_history.append(alert_event)
-                        
-                        # Update last triggered time
-                        alert.last_triggered = current_time
-                        
-                        logger.info(f"Alert triggered: {alert_event.message}")
+                group = by_parameter[threshold.parameter]
+                group[0].append(row)
+                group[1].append(threshold.warning_level)
+                group[2].append(threshold.critical_level)
+                group[3].append((alert_id, alert, threshold))
         
-        return triggered_alerts
+        events = []
+        trained = set(getattr(predictor, 'target_names', None) or ())
+        for parameter, (rows, warning, critical, refs) in by_parameter.items():
+            key, targets = FORECAST_PARAMETERS.get(parameter, (None, ()))
+            # predict_batch fills untrained targets with zeros, which would never breach
+            if key is None or (trained and not trained.issuperset(targets)):
+                logger.debug(f"Forecast check skips {parameter}: not predicted by the model")
+                continue
+            values = self._get_parameter_value(forecast, key)
+            if values is None:
+                continue
+            
+            matrix = np.asarray(values, dtype=float).reshape(len(lats), hours)[np.asarray(rows)]
+            warning_hits = matrix >= np.asarray(warning, dtype=float)[:, None]
+            critical_hits = matrix >= np.asarray(critical, dtype=float)[:, None]
+            breached = warning_hits.any(axis=1)
+            first_hour = warning_hits.argmax(axis=1)
+            
+            with self._lock:
+                # Under the lock, so events reach alert_history in timestamp order
+                event_time = datetime.now()
+                for i, (alert_id, alert, threshold) in enumerate(refs):
+                    if alert_id not in self.user_alerts:
+                        continue
+                    hour = first_hour[i]
+                    expected_at = forecast_times[hour] if breached[i] else None
+                    # The episode runs through the last consecutive breached hour
+                    clear = np.flatnonzero(~warning_hits[i, hour:])
+                    last_hour = hour + (clear[0] if clear.size else hours - hour) - 1
+                    if not self.alert_states.update_forecast(alert_id, parameter, expected_at,
+                                                             until=forecast_times[last_hour]):
+                        continue
+                    
+                    value = float(matrix[i, hour])
+                    severity = AlertSeverity.CRITICAL if critical_hits[i, hour] else AlertSeverity.MEDIUM
+                    event = AlertEvent(
+                        alert_id=alert_id,
+                        contact_info=alert.contact_info,
+                        location=alert.location,
+                        current_value=value,
+                        threshold_value=threshold.critical_level if severity == AlertSeverity.CRITICAL else threshold.warning_level,
+                        severity=severity,
+                        timestamp=event_time,
+                        threshold=threshold,
+                        alert_type=alert.alert_type,
+                        expected_at=expected_at
+                    )
+                    events.append(event)
+                    self.alert_history.append(event)
+        
+        self.last_forecast_check = current_time
+        logger.info(f"Forecast check: {len(lats)} locations x {hours}h, {len(events)} expected breaches")
+        self._publish_events(events)
+        return events
+    
+    def get_active_alerts(self, location: str) -> List[Dict[str, Any]]:
+        """Get currently open (unresolved) breaches for a location from alert state"""
+        active = []
+        with self._lock:
+            for alert_id in self._location_index.get(location.lower(), ()):
+                alert = self.user_alerts[alert_id]
+                for parameter, state, value, since in self.alert_states.get_active(alert_id):
+                    active.append({
+                        'alert_id': alert_id,
+                        'contact_info': alert.contact_info,
+                        'location': alert.location,
+                        'parameter': parameter,
+                        'state': state.name.lower(),
+                        'current_value': value,
+                        'since': since.isoformat(),
+                        'is_resolved': False
+                    })
+        return active
     
     def _get_parameter_value(self, air_quality_data: Dict[str, Any], parameter: str) -> Optional[float]:
         """Extract parameter value from air quality data"""
@@ -232,35 +733,15 @@ class AlertSystem:
         
         return None
     
-    def _generate_alert_message(self, alert: UserAlert, threshold: AlertThreshold, 
-                              current_value: float, severity: AlertSeverity) -> str:
-        """Generate human-readable alert message"""
-        severity_emoji = {
-            AlertSeverity.LOW: "⚠️",
-            AlertSeverity.MEDIUM: "🚨",
-            AlertSeverity.HIGH: "🔴",
-            AlertSeverity.CRITICAL: "🚨🚨"
-        }
-        
-        emoji = severity_emoji.get(severity, "⚠️")
-        
-        if alert.alert_type == AlertType.HEALTH:
-            return f"{emoji} Health Alert: {threshold.description} in {alert.location} is {current_value:.1f} {threshold.unit} (threshold: {threshold.warning_level:.1f} {threshold.unit}). Consider reducing outdoor activities."
-        
-        elif alert.alert_type == AlertType.INDUSTRIAL:
-            return f"{emoji} Industrial Alert: {threshold.description} in {alert.location} industrial area is {current_value:.1f} {threshold.unit} (threshold: {threshold.warning_level:.1f} {threshold.unit}). Monitor ventilation systems."
-        
-        elif alert.alert_type == AlertType.OUTDOOR_ACTIVITY:
-            return f"{emoji} Outdoor Activity Alert: Air quality in {alert.location} is not ideal for outdoor activities. {threshold.description}: {current_value:.1f} {threshold.unit} (threshold: {threshold.warning_level:.1f} {threshold.unit})."
-        
-        else:
-            return f"{emoji} Air Quality Alert: {threshold.description} in {alert.location} is {current_value:.1f} {threshold.unit} (threshold: {threshold.warning_level:.1f} {threshold.unit})."
-    
     def get_user_alerts(self, contact_info: str) -> List[Dict[str, Any]]:
         """Get all alerts for a specific contact (email/mobile)"""
         user_alert_list = []
-        for alert_id, alert in self.user_alerts.items():
-            if alert.contact_info == contact_info:
+        with self._lock:
+            alert_ids = list(self._contact_index.get(contact_info, ()))
+        for alert_id in alert_ids:
+            alert = self.user_alerts.get(alert_id)
+            if alert:
+                states = self.alert_states.get_states(alert_id)
                 user_alert_list.append({
                     'alert_id': alert_id,
                     'contact_info': alert.contact_info,
@@ -269,8 +750,12 @@ class AlertSystem:
                     'is_active': alert.is_active,
                     'created_at': alert.created_at.isoformat() if alert.created_at else None,
                     'last_triggered': alert.last_triggered.isoformat() if alert.last_triggered else None,
-                    'thresholds': [asdict(t) for t in alert.thresholds],
-                    'context_from_query': alert.context_from_query
+                    'thresholds': [
+                        dict(asdict(t), state=states.get(t.parameter, AlertState.OK).name.lower())
+                        for t in alert.thresholds
+                    ],
+                    'context_from_query': alert.context_from_query,
+                    'coordinates': alert.coordinates
                 })
         return user_alert_list
     
@@ -279,31 +764,12 @@ class AlertSystem:
         """Get alert history with optional filters"""
         cutoff_time = datetime.now() - timedelta(hours=hours)
         
-        filtered_alerts = []
-        for alert in self.alert_history:
-            if alert.timestamp < cutoff_time:
-                continue
-            
-            if contact_info and alert.contact_info != contact_info:
-                continue
-            
-            if location and alert.location.lower() != location.lower():
-                continue
-            
-            filtered_alerts.append({
-                'alert_id': alert.alert_id,
-                'contact_info': alert.contact_info,
-                'location': alert.location,
-                'parameter': alert.parameter,
-                'current_value': alert.current_value,
-                'threshold_value': alert.threshold_value,
-                'severity': alert.severity.value,
-                'message': alert.message,
-                'timestamp': alert.timestamp.isoformat(),
-                'is_resolved': alert.is_resolved
-            })
-        
-        return sorted(filtered_alerts, key=lambda x: x['timestamp'], reverse=True)
+        # Appends happen under the same lock
+        with self._lock:
+            return [
+                alert.to_dict()
+                for alert in self.alert_history.query(cutoff_time, contact_info, location)
+            ]
     
     def start_monitoring(self, data_source_callback):
         """Start real-time monitoring (placeholder for actual implementation)"""
@@ -326,9 +792,36 @@ class AlertSystem:
                     logger.error(f"Error in monitoring loop: {e}")
                     time.sleep(30)
         
-        self.monitoring_thread = threading.Thread(target=monitoring_loop, daemon=True)
+        self.monitoring_thread = threading.Thread(target=monitoring_loop, name='alert-monitoring', daemon=True)
         self.monitoring_thread.start()
     
+    def start_forecast_monitoring(self, predictor, hours: int = 6,
+                                  interval_seconds: int = 3600, geocoder=None):
+        """Run check_forecast_alerts for all subscribed locations every interval"""
+        if self.forecast_thread is not None and self.forecast_thread.is_alive():
+            return
+        self.forecast_interval_seconds = interval_seconds
+        
+        def forecast_loop():
+            while True:
+                try:
+                    with timed('forecast_check'):
+                        self.check_forecast_alerts(predictor, hours=hours, geocoder=geocoder)
+                except Exception as e:
+                    logger.error(f"Error in forecast monitoring loop: {e}")
+                time.sleep(interval_seconds)
+        
+        self.forecast_thread = threading.Thread(target=forecast_loop, name='forecast-monitoring', daemon=True)
+        self.forecast_thread.start()
+        logger.info(f"Forecast alert monitoring started ({hours}h horizon, every {interval_seconds}s)")
+    
+    def forecast_lag_seconds(self) -> Optional[float]:
+        """How far forecast monitoring is behind its schedule (None if it isn't running yet)"""
+        if self.last_forecast_check is None or self.forecast_interval_seconds is None:
+            return None
+        elapsed = (datetime.now() - self.last_forecast_check).total_seconds()
+        return max(0.0, elapsed - self.forecast_interval_seconds)
+    
     def stop_monitoring(self):
         """Stop real-time monitoring"""
         self.monitoring_active = False
@@ -4,7 +4,7 @@ Provides predefined alert configurations for different user scenarios
 """
 
 from typing import Dict, List, Any
-from utils.alert_system import AlertType, AlertThreshold
+from utils.alert_system import AlertType, AlertThreshold, intern_thresholds
 
 class AlertTemplates:
     """Predefined alert templates for different user scenarios"""
@@ -133,16 +133,17 @@ class AlertTemplates:
         if not template:
             raise ValueError(f"Template {template_id} not found")
         
-        # Convert template thresholds to AlertThreshold objects
-        thresholds = []
-        for threshold in template.get('thresholds', []):
-            thresholds.append(AlertThreshold(
+        # Convert template thresholds to (shared) AlertThreshold objects
+        thresholds = intern_thresholds(
+            AlertThreshold(
                 parameter=threshold['parameter'],
                 warning_level=threshold['warning'],
                 critical_level=threshold['critical'],
                 unit=threshold['unit'],
                 description=threshold['description']
-            ))
+            )
+            for threshold in template.get('thresholds', [])
+        )
         
         return {
             'user_id': user_id,
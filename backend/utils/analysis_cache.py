@@ -0,0 +1,261 @@
+"""
+Analysis cache for AuraCast
+Reuses OutputAgent analyses across requests whose predictions fall in the
+same quantized bucket (grid cell, hour, AQI band, pollutant and weather
+levels) with the same context. The cached analysis is stored as a template:
+the numbers and place name its display_text quotes are swapped for the current request's
+values when it is reused. Identical analyses requested concurrently share a
+single model call, from threads (get_or_compute) or coroutines
+(get_or_compute_async).
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .caching import MISSING, PersistentCache
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_TTL_SECONDS = int(os.getenv('ANALYSIS_CACHE_TTL_SECONDS', 3600))
+ANALYSIS_CACHE_MAX_ENTRIES = 20000
+
+# Followers wait this long for an identical in-flight analysis before making their own call
+INFLIGHT_WAIT_SECONDS = 30
+
+CELL_DEGREES = 0.1
+AQI_BANDS = (50, 100, 150, 200, 300)
+
+# (name, path into the predictions, quantization step)
+QUANTIZED_FIELDS = (
+    ('pm25', ('air_quality', 'pm25'), 5.0),
+    ('o3', ('air_quality', 'o3'), 10.0),
+    ('temperature', ('weather_data', 'temperature_2m'), 2.0),
+    ('humidity', ('weather_data', 'humidity'), 10.0),
+    ('wind_speed', ('weather_data', 'wind_speed'), 5.0),
+)
+TEMPLATE_FIELDS = (('aqi', ('air_quality', 'aqi')),) + tuple((name, path) for name, path, _ in QUANTIZED_FIELDS)
+
+# Numbers standing alone in the text ("AQI of 42", "15.2 µg/m³"), not inside names like "PM2.5"
+_NUMBER = re.compile(r'(?<![\w.])\d+(?:\.\d+)?(?![\w.]*\d)')
+
+
+def _value(predictions: Dict, path: Tuple[str, str]) -> Optional[float]:
+    value = predictions.get(path[0], {}).get(path[1])
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _quantize(value: Optional[float], step: float) -> str:
+    return '-' if value is None else str(math.floor(value / step))
+
+
+def aqi_band(aqi: Optional[float]) -> int:
+    if aqi is None:
+        return -1
+    return next((i for i, upper in enumerate(AQI_BANDS) if aqi <= upper), len(AQI_BANDS))
+
+
+def analysis_cache_key(predictions: Dict, user_context: Dict, lat: float, lon: float) -> str:
+    """Requests with equal keys can share one analysis"""
+    concerns = user_context.get('special_concerns') or []
+    parts = [
+        f"{math.floor(lat / CELL_DEGREES)}:{math.floor(lon / CELL_DEGREES)}",
+        str(user_context.get('datetime') or '')[:13],  # prediction hour
+        str(aqi_band(_value(predictions, ('air_quality', 'aqi')))),
+    ]
+    parts.extend(_quantize(_value(predictions, path), step) for _, path, step in QUANTIZED_FIELDS)
+    parts.extend([
+        str(user_context.get('context_type') or 'general'),
+        str(user_context.get('analysis_depth') or 'brief'),
+        str(user_context.get('query_intent') or ''),
+        ','.join(sorted(str(c).lower() for c in concerns)) if isinstance(concerns, list) else str(concerns),
+    ])
+    return '|'.join(parts)
+
+
+def template_values(predictions: Dict, location_name: str) -> Dict[str, Any]:
+    values: Dict[str, Any] = {'location': location_name}
+    for name, path in TEMPLATE_FIELDS:
+        value = _value(predictions, path)
+        if value is not None:
+            values[name] = value
+    return values
+
+
+def make_template(analysis: Dict, values: Dict[str, Any], location_names=()) -> str:
+    """The analysis as JSON text, its display_text with the quoted numbers and place names as format fields
+
+    Only the prose is templated: structured fields (status codes, limits,
+    counts) are kept verbatim even when they equal one of the values.
+    """
+    text = str(analysis.get('display_text', '')).replace('{', '{{').replace('}', '}}')
+
+    for name in sorted({n for n in location_names if n}, key=len, reverse=True):
+        text = re.sub(rf'(?<!\w){re.escape(name)}(?!\w)', '{location}', text)
+
+    # Each number the model could have quoted, at the precisions it might use
+    renderings: Dict[str, str] = {}
+    for name, value in values.items():
+        if name == 'location':
+            continue
+        for decimals in (2, 1, 0):
+            rendered = f"{value:.{decimals}f}"
+            # Small whole numbers ("3 hours", "8 AM") are too likely to be something else
+            if decimals == 0 and abs(value) < 10:
+                continue
+            renderings.setdefault(rendered, f"{{{name}:.{decimals}f}}")
+
+    text = _NUMBER.sub(lambda m: renderings.get(m.group(), m.group()), text)
+    return json.dumps(dict(analysis, display_text=text))
+
+
+def render_template(template: str, values: Dict[str, Any]) -> Dict:
+    analysis = json.loads(template)
+    analysis['display_text'] = analysis['display_text'].format(**values)
+    return analysis
+
+
+class AnalysisCache:
+    """Persistent, de-duplicating cache of OutputAgent analyses"""
+
+    def __init__(self, cache: Optional[PersistentCache] = None):
+        self.cache = cache or PersistentCache(
+            'output_analysis', ANALYSIS_CACHE_TTL_SECONDS, max_entries=ANALYSIS_CACHE_MAX_ENTRIES
+        )
+        self._inflight: Dict[str, Future] = {}
+        # Keyed by (event loop, key): an asyncio.Future can only be awaited on its own loop
+        self._inflight_async: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'shared': 0, 'misses': 0}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        total = sum(stats.values())
+        stats['hit_rate'] = round((stats['hits'] + stats['shared']) / total, 3) if total else 0.0
+        return stats
+
+    def _count(self, outcome: str):
+        with self._lock:
+            self._stats[outcome] += 1
+
+    def get(self, predictions: Dict, user_context: Dict, lat: float, lon: float,
+            location_name: str) -> Optional[Dict]:
+        """Cached analysis rendered with these predictions' values, or None"""
+        template = self.cache.get(analysis_cache_key(predictions, user_context, lat, lon))
+        if template is MISSING or template is None:
+            self._count('misses')
+            return None
+        analysis = self._render(template, template_values(predictions, location_name))
+        self._count('hits' if analysis is not None else 'misses')
+        return analysis
+
+    def put(self, predictions: Dict, user_context: Dict, lat: float, lon: float,
+            location_name: str, analysis: Dict) -> str:
+        """Store ``analysis`` for requests matching these predictions and context; returns the template"""
+        template = make_template(
+            analysis, template_values(predictions, location_name), (location_name, user_context.get('location'))
+        )
+        self.cache.set(analysis_cache_key(predictions, user_context, lat, lon), template)
+        return template
+
+    def get_or_compute(self, predictions: Dict, user_context: Dict, lat: float, lon: float,
+                       location_name: str, compute: Callable[[], Dict]) -> Dict:
+        """Cached analysis for these predictions and context, or ``compute()`` (and cache it)"""
+        key = analysis_cache_key(predictions, user_context, lat, lon)
+        values = template_values(predictions, location_name)
+
+        template = self.cache.get(key)
+        if template is not MISSING and template is not None:
+            analysis = self._render(template, values)
+            if analysis is not None:
+                self._count('hits')
+                return analysis
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+
+        if not leader:
+            try:
+                template = future.result(timeout=INFLIGHT_WAIT_SECONDS)
+            except Exception:
+                template = None  # the shared call failed; make our own
+            analysis = self._render(template, values) if template else None
+            if analysis is not None:
+                self._count('shared')
+                return analysis
+            self._count('misses')
+            return compute()
+
+        self._count('misses')
+        try:
+            analysis = compute()
+            future.set_result(self.put(predictions, user_context, lat, lon, location_name, analysis))
+            return analysis
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def get_or_compute_async(self, predictions: Dict, user_context: Dict, lat: float, lon: float,
+                                   location_name: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """get_or_compute for asyncio callers: concurrent identical requests await one ``compute()``"""
+        key = analysis_cache_key(predictions, user_context, lat, lon)
+        values = template_values(predictions, location_name)
+
+        template = self.cache.get(key)
+        if template is not MISSING and template is not None:
+            analysis = self._render(template, values)
+            if analysis is not None:
+                self._count('hits')
+                return analysis
+
+        inflight_key = (asyncio.get_running_loop(), key)
+        future = self._inflight_async.get(inflight_key)
+        if future is not None:
+            try:
+                # Shielded, so a follower timing out doesn't cancel the shared result
+                template = await asyncio.wait_for(asyncio.shield(future), INFLIGHT_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                template = None
+            analysis = self._render(template, values) if template else None
+            if analysis is not None:
+                self._count('shared')
+                return analysis
+            self._count('misses')
+            return await compute()
+
+        future = self._inflight_async[inflight_key] = inflight_key[0].create_future()
+        self._count('misses')
+        template = None
+        try:
+            analysis = await compute()
+            template = self.put(predictions, user_context, lat, lon, location_name, analysis)
+            return analysis
+        finally:
+            self._inflight_async.pop(inflight_key, None)
+            # None (the call failed or was cancelled) sends followers to make their own
+            future.set_result(template)
+
+    @staticmethod
+    def _render(template: str, values: Dict[str, Any]) -> Optional[Dict]:
+        try:
+            return render_template(template, values)
+        except (KeyError, ValueError, IndexError) as e:
+            # e.g. a field the cached analysis quoted is missing from these predictions
+            logger.warning(f"Could not reuse cached analysis: {e}")
+            return None
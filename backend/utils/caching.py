@@ -0,0 +1,145 @@
+"""
+Persistent cache for AuraCast
+SQLite-backed key/value store shared by every worker process and kept across
+restarts, with per-entry TTLs and negative-result caching
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from .metrics import record_cache
+
+logger = logging.getLogger(__name__)
+
+# Default location of the on-disk cache (backend/data is not checked in)
+DEFAULT_CACHE_PATH = os.getenv(
+    'AURACAST_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'cache.sqlite3')
+)
+
+# Returned by PersistentCache.get when nothing (or only an expired entry) is stored
+MISSING = object()
+
+
+class PersistentCache:
+    """Namespaced, TTL-bound key/value cache in a shared SQLite file
+
+    Values are stored as JSON. Storing ``None`` records a negative result
+    ("looked up, nothing there") which expires after ``negative_ttl``;
+    ``get`` returns ``None`` for it and ``MISSING`` for a true miss.
+    Errors are logged and treated as misses so the cache never breaks a
+    request. With ``max_entries`` the namespace is trimmed back to that size
+    (dropping the entries closest to expiry) every ``TRIM_EVERY`` writes.
+    """
+
+    TRIM_EVERY = 100
+
+    def __init__(self, namespace: str, ttl: float, negative_ttl: Optional[float] = None,
+                 path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.path = path or DEFAULT_CACHE_PATH
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not thread-safe)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                ' namespace TEXT NOT NULL,'
+                ' key TEXT NOT NULL,'
+                ' value TEXT,'
+                ' expires_at REAL NOT NULL,'
+                ' PRIMARY KEY (namespace, key)'
+                ') WITHOUT ROWID'
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Any:
+        """Cached value for ``key``, ``None`` for a cached negative, else ``MISSING``"""
+        try:
+            row = self._connection().execute(
+                'SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?',
+                (self.namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Cache read failed ({self.namespace}): {e}")
+            record_cache(self.namespace, False)
+            return MISSING
+
+        if row is None or row[1] < time.time():
+            record_cache(self.namespace, False)
+            return MISSING
+        record_cache(self.namespace, True)
+        return None if row[0] is None else json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store ``value`` (``None`` = negative result) for ``ttl`` seconds"""
+        if ttl is None:
+            ttl = self.negative_ttl if value is None else self.ttl
+        payload = None if value is None else json.dumps(value)
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)',
+                (self.namespace, key, payload, time.time() + ttl)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Cache write failed ({self.namespace}): {e}")
+            return
+
+        if self.max_entries is not None:
+            self._writes += 1
+            if self._writes % self.TRIM_EVERY == 0:
+                self.trim()
+
+    def delete(self, key: str):
+        try:
+            self._connection().execute(
+                'DELETE FROM cache WHERE namespace = ? AND key = ?', (self.namespace, key)
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"Cache delete failed ({self.namespace}): {e}")
+
+    def purge_expired(self) -> int:
+        """Remove expired entries in this namespace; returns the number removed"""
+        try:
+            cursor = self._connection().execute(
+                'DELETE FROM cache WHERE namespace = ? AND expires_at < ?', (self.namespace, time.time())
+            )
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Cache purge failed ({self.namespace}): {e}")
+            return 0
+
+    def trim(self) -> int:
+        """Drop entries beyond ``max_entries``, soonest-expiring first; returns the number removed"""
+        if self.max_entries is None:
+            return 0
+        try:
+            cursor = self._connection().execute(
+                'DELETE FROM cache WHERE namespace = ? AND key IN ('
+                ' SELECT key FROM cache WHERE namespace = ?'
+                ' ORDER BY expires_at DESC LIMIT -1 OFFSET ?'
+                ')',
+                (self.namespace, self.namespace, self.max_entries)
+            )
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Cache trim failed ({self.namespace}): {e}")
+            return 0
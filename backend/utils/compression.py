@@ -0,0 +1,103 @@
+"""
+Response compression for AuraCast
+Compresses JSON and text responses of at least COMPRESSION_MIN_BYTES with
+brotli (when installed) or gzip, whichever the client accepts. Streamed NDJSON
+is compressed chunk by chunk and flushed after each chunk, so results still
+arrive as they resolve. Server-Sent Events are left alone. Responses that are
+already encoded, like the precompressed StaticPayloads, are passed through.
+"""
+
+import gzip
+import os
+import zlib
+from typing import Iterable, Iterator, Optional, Sequence
+
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+# Smaller bodies fit in a packet or two anyway
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+# Per-response levels (see the 'compression' benchmark group): most of the
+# size reduction of the maximum levels at a fraction of their CPU time
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+# Payloads compressed once at startup can afford the maximum
+STATIC_GZIP_LEVEL = 9
+STATIC_BROTLI_QUALITY = 11
+
+COMPRESSIBLE_TYPES = frozenset({
+    'application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml',
+    'text/plain', 'text/html', 'text/css', 'text/csv',
+})
+
+# In order of preference
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(available: Sequence[str] = ENCODINGS) -> Optional[str]:
+    """The first of ``available`` with the highest quality in the request's Accept-Encoding"""
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = request.accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+
+def _compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+def compress_response(response: Response) -> Response:
+    """after_request hook: compress ``response`` in place when it is worth it"""
+    if response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.cache_control.no_transform):
+        return response
+
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_BYTES:
+            return response
+        compressed = compress(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    # The compressed bytes differ, so a strong validator no longer holds
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -3,7 +3,7 @@ Dashboard Configuration for AuraCast
 Defines dashboard layouts, component configurations, and visualization settings
 """
 
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from dataclasses import dataclass
 
 @dataclass
@@ -17,6 +17,7 @@ class DashboardComponent:
     refresh_interval: int  # seconds
     data_source: str
     visualization_config: Dict[str, Any]
+    stream_event: Optional[str] = None  # SSE event that pushes updates (see /api/stream)
 
 class DashboardConfig:
     """Dashboard configuration manager"""
@@ -37,6 +38,7 @@ class DashboardConfig:
                 position={'x': 0, 'y': 0, 'width': 4, 'height': 3},
                 refresh_interval=60,
                 data_source='air_quality.aqi',
+                stream_event='reading',
                 visualization_config={
                     'min_value': 0,
                     'max_value': 300,
@@ -60,6 +62,7 @@ class DashboardConfig:
                 position={'x': 4, 'y': 0, 'width': 8, 'height': 3},
                 refresh_interval=60,
                 data_source='air_quality',
+                stream_event='reading',
                 visualization_config={
                     'x_axis': 'pollutant',
                     'y_axis': 'value',
@@ -103,6 +106,7 @@ class DashboardConfig:
                 position={'x': 0, 'y': 7, 'width': 6, 'height': 3},
                 refresh_interval=300,
                 data_source='weather_data',
+                stream_event='reading',
                 visualization_config={
                     'show_icon': True,
                     'show_temperature': True,
@@ -170,6 +174,7 @@ class DashboardConfig:
                 position={'x': 0, 'y': 13, 'width': 12, 'height': 2},
                 refresh_interval=60,
                 data_source='alerts',
+                stream_event='alert',
                 visualization_config={
                     'show_active_count': True,
                     'show_health_warnings': True,
@@ -263,7 +268,8 @@ class DashboardConfig:
             'available_color_schemes': list(self.color_schemes.keys()),
             'total_components': len(self.components),
             'default_layout': 'default',
-            'default_color_scheme': 'default'
+            'default_color_scheme': 'default',
+            'stream_endpoint': '/api/stream'
         }
     
     def get_component_list(self) -> List[Dict[str, Any]]:
@@ -274,7 +280,8 @@ class DashboardConfig:
                 'type': comp.component_type,
                 'title': comp.title,
                 'description': comp.description,
-                'refresh_interval': comp.refresh_interval
+                'refresh_interval': comp.refresh_interval,
+                'stream_event': comp.stream_event
             }
             for comp in self.components.values()
         ]
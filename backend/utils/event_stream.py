@@ -0,0 +1,111 @@
+"""
+Server-Sent Events broker for AuraCast
+Fans out alert and reading events to clients subscribed by location or contact
+"""
+
+import itertools
+import logging
+import queue
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def location_topic(location: str) -> str:
+    return f"location:{location.strip().lower()}"
+
+
+def contact_topic(contact_info: str) -> str:
+    return f"contact:{contact_info.strip()}"
+
+
+def format_sse(data: Any, event: Optional[str] = None, event_id: Optional[int] = None) -> str:
+    """Encode one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    payload = data if isinstance(data, str) else dumps(data, default=str)
+    for line in payload.splitlines() or ['']:
+        lines.append(f"data: {line}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class EventSubscription:
+    """A client's queue of pending events"""
+
+    def __init__(self, topics: Iterable[str], max_queue: int):
+        self.topics = set(topics)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+
+    def put(self, message: Dict[str, Any]):
+        """Enqueue without blocking; a slow client loses its oldest events"""
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """Next event, or None if nothing arrived within ``timeout`` seconds"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """Topic-based publish/subscribe for SSE clients"""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscriptions: Dict[str, List[EventSubscription]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics: Iterable[str]) -> EventSubscription:
+        subscription = EventSubscription(topics, self.max_queue)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscriptions.setdefault(topic, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: EventSubscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscriptions.get(topic, [])
+                if subscription in subscribers:
+                    subscribers.remove(subscription)
+                if not subscribers:
+                    self._subscriptions.pop(topic, None)
+
+    def has_subscribers(self, topic: str) -> bool:
+        return topic in self._subscriptions
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len({id(s) for subs in self._subscriptions.values() for s in subs})
+
+    def publish(self, topic: str, event: str, data: Any) -> int:
+        """Deliver an event to every subscriber of ``topic``; returns the delivery count"""
+        with self._lock:
+            subscribers = list(self._subscriptions.get(topic, ()))
+        if not subscribers:
+            return 0
+
+        message = {'id': next(self._ids), 'event': event, 'data': data}
+        for subscription in subscribers:
+            subscription.put(message)
+        return len(subscribers)
+
+
+# Global event broker instance
+event_broker = EventBroker()
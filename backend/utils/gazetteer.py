@@ -0,0 +1,455 @@
+"""
+Offline gazetteer for AuraCast
+Resolves place names locally from a bundled GeoNames extract so that most
+geocoding never has to leave the process. Names are indexed three ways:
+an exact map of folded names, a sorted name list for prefix completion and
+a word index with single-deletion variants (stored as sorted hashes) for
+token-aware fuzzy matching. Candidates are ranked by population. A k-d
+tree over the same places answers reverse (coordinate -> place) lookups.
+
+The bundled file (preprocessed_data/gazetteer.tsv.gz) covers places with
+15,000+ inhabitants. Set GAZETTEER_PATH to a GeoNames dump such as
+cities500.txt or allCountries.txt to use a larger dataset instead.
+Place data from GeoNames (geonames.org), licensed CC BY 4.0.
+"""
+
+import csv
+import gzip
+import io
+import itertools
+import logging
+import os
+import re
+import threading
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from .spatial_index import SpatialIndex
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'preprocessed_data')
+BUNDLED_GAZETTEER = os.path.join(DATA_DIR, 'gazetteer.tsv.gz')
+BUNDLED_COUNTRIES = os.path.join(DATA_DIR, 'gazetteer_countries.tsv')
+
+# Alternate names rank below a place's primary name at the same population
+ALTERNATE_NAME_WEIGHT = 0.5
+
+# Words that qualify rather than name a place ("downtown dallas", "new york city")
+LEADING_FILLERS = ('city of', 'greater', 'downtown', 'central', 'metropolitan', 'metro')
+TRAILING_FILLERS = ('metropolitan area', 'metro area', 'city centre', 'city center',
+                    'city', 'area', 'metro', 'downtown', 'centre', 'center')
+
+US_STATES = {
+    'alabama': 'AL', 'alaska': 'AK', 'arizona': 'AZ', 'arkansas': 'AR', 'california': 'CA',
+    'colorado': 'CO', 'connecticut': 'CT', 'delaware': 'DE', 'district of columbia': 'DC',
+    'florida': 'FL', 'georgia': 'GA', 'hawaii': 'HI', 'idaho': 'ID', 'illinois': 'IL',
+    'indiana': 'IN', 'iowa': 'IA', 'kansas': 'KS', 'kentucky': 'KY', 'louisiana': 'LA',
+    'maine': 'ME', 'maryland': 'MD', 'massachusetts': 'MA', 'michigan': 'MI', 'minnesota': 'MN',
+    'mississippi': 'MS', 'missouri': 'MO', 'montana': 'MT', 'nebraska': 'NE', 'nevada': 'NV',
+    'new hampshire': 'NH', 'new jersey': 'NJ', 'new mexico': 'NM', 'new york': 'NY',
+    'north carolina': 'NC', 'north dakota': 'ND', 'ohio': 'OH', 'oklahoma': 'OK', 'oregon': 'OR',
+    'pennsylvania': 'PA', 'rhode island': 'RI', 'south carolina': 'SC', 'south dakota': 'SD',
+    'tennessee': 'TN', 'texas': 'TX', 'utah': 'UT', 'vermont': 'VT', 'virginia': 'VA',
+    'washington': 'WA', 'west virginia': 'WV', 'wisconsin': 'WI', 'wyoming': 'WY',
+}
+US_STATE_CODES = frozenset(US_STATES.values())
+
+# Common English forms missing from the country list
+COUNTRY_ALIASES = {
+    'usa': 'US', 'us': 'US', 'america': 'US', 'united states of america': 'US',
+    'uk': 'GB', 'britain': 'GB', 'great britain': 'GB', 'england': 'GB', 'scotland': 'GB',
+    'wales': 'GB', 'northern ireland': 'GB', 'holland': 'NL', 'czechia': 'CZ',
+    'south korea': 'KR', 'north korea': 'KP', 'russia': 'RU', 'uae': 'AE',
+}
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class Place(NamedTuple):
+    name: str
+    country: str
+    admin1: str
+    lat: float
+    lon: float
+    population: int
+
+
+def fold_name(text: str) -> str:
+    """Accent-, case- and punctuation-insensitive form of a name ("São Paulo" -> "sao paulo")"""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c)).casefold()
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub(' ', text)).strip()
+
+
+def _variants(word: str) -> Set[str]:
+    """The word plus every form with one letter deleted"""
+    return {word, *(word[:i] + word[i + 1:] for i in range(len(word)))}
+
+
+def _within_one_edit(a: str, b: str) -> bool:
+    """True if ``a`` and ``b`` differ by at most one insertion, deletion,
+    substitution or transposition of adjacent letters"""
+    if a == b:
+        return True
+    la, lb = len(a), len(b)
+    if abs(la - lb) > 1:
+        return False
+    if la > lb:
+        a, b, la, lb = b, a, lb, la
+    i = 0
+    while i < la and a[i] == b[i]:
+        i += 1
+    if la < lb:
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (
+        i + 1 < la and a[i] == b[i + 1] and a[i + 1] == b[i] and a[i + 2:] == b[i + 2:]
+    )
+
+
+class Gazetteer:
+    """In-memory place-name index, loaded on first use"""
+
+    def __init__(self, path: Optional[str] = None, countries_path: Optional[str] = None):
+        self.path = path or os.getenv('GAZETTEER_PATH') or BUNDLED_GAZETTEER
+        self.countries_path = countries_path or BUNDLED_COUNTRIES
+
+        self.places: List[Place] = []
+        self._names: List[str] = []                                # sorted folded names
+        self._name_places: Dict[str, List[Tuple[int, bool]]] = {}   # name -> [(place, is_primary)]
+        self._countries: Dict[str, str] = {}                        # folded name/ISO -> ISO2
+        self._country_names: Dict[str, str] = {}                    # ISO2 -> name
+        self._spatial: Optional[SpatialIndex[int]] = None
+        # Fuzzy index, built on first use: word -> names containing it, plus the
+        # hashes of every word's one-deletion variants (sorted) -> word
+        self._words: List[str] = []
+        self._word_names: Optional[Dict[str, array]] = None
+        self._variant_hashes = np.empty(0, dtype=np.int64)
+        self._variant_words = np.empty(0, dtype=np.int32)
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        self.load()
+        return len(self.places)
+
+    # ------------------------------------------------------------------ loading
+
+    def load(self):
+        """Read and index the gazetteer (idempotent)"""
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            self._load_countries()
+            names: Dict[str, List[Tuple[int, bool]]] = defaultdict(list)
+            try:
+                for place, alternates in self._read_places(self.path):
+                    index = len(self.places)
+                    self.places.append(place)
+                    primary = fold_name(place.name)
+                    names[primary].append((index, True))
+                    for alternate in alternates:
+                        folded = fold_name(alternate)
+                        if folded and folded != primary:
+                            names[folded].append((index, False))
+            except OSError as e:
+                logger.error(f"Could not load gazetteer from {self.path}: {e}")
+
+            for candidates in names.values():
+                candidates.sort(key=lambda c: -self._rank(c))
+            self._name_places = dict(names)
+            self._names = sorted(self._name_places)
+            self._loaded = True
+            logger.info(f"Gazetteer loaded: {len(self.places)} places, {len(self._names)} names")
+
+    def preload(self):
+        """Load the gazetteer and build the fuzzy index up front (e.g. at app startup)"""
+        self.load()
+        self._build_fuzzy_index()
+        self._build_spatial_index()
+
+    def _load_countries(self):
+        try:
+            with open(self.countries_path, encoding='utf-8') as f:
+                for row in csv.DictReader(f, delimiter='\t'):
+                    iso = row['iso']
+                    self._country_names[iso] = row['name']
+                    self._countries[fold_name(row['name'])] = iso
+                    self._countries[iso.lower()] = iso
+                    self._countries[row['iso3'].lower()] = iso
+        except OSError as e:
+            logger.warning(f"Could not load country names: {e}")
+        self._countries.update(COUNTRY_ALIASES)
+
+    @staticmethod
+    def _open(path: str) -> io.TextIOBase:
+        if path.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8')
+        return open(path, encoding='utf-8')
+
+    def _read_places(self, path: str) -> Iterable[Tuple[Place, List[str]]]:
+        """Yield (place, alternate_names) from the bundled TSV or a GeoNames dump"""
+        with self._open(path) as f:
+            first = f.readline()
+            if first.startswith('name\t'):
+                for line in f:
+                    name, country, admin1, lat, lon, population, alternates = line.rstrip('\n').split('\t')
+                    yield (Place(name, country, admin1, float(lat), float(lon), int(population)),
+                           alternates.split('|') if alternates else [])
+                return
+
+            # GeoNames dump: geonameid, name, asciiname, alternatenames, lat, lon,
+            # feature class, feature code, country, cc2, admin1, ..., population, ...
+            for line in itertools.chain((first,), f):
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) < 15 or fields[6] != 'P':
+                    continue
+                place = Place(fields[1], fields[8], fields[10], float(fields[4]), float(fields[5]),
+                              int(fields[14] or 0))
+                yield place, [fields[2], *fields[3].split(',')] if fields[3] else [fields[2]]
+
+    def _rank(self, candidate: Tuple[int, bool]) -> float:
+        index, is_primary = candidate
+        population = self.places[index].population
+        return population if is_primary else population * ALTERNATE_NAME_WEIGHT
+
+    def _build_fuzzy_index(self):
+        """Word postings over every name plus a deletion-variant index over the vocabulary"""
+        with self._lock:
+            if self._word_names is not None:
+                return
+            word_names: Dict[str, array] = defaultdict(lambda: array('I'))
+            for name_id, name in enumerate(self._names):
+                for word in set(name.split()):
+                    word_names[word].append(name_id)
+            self._words = sorted(word_names)
+
+            hashes = array('q')
+            word_ids = array('i')
+            for word_id, word in enumerate(self._words):
+                for variant in _variants(word) if len(word) >= 3 else (word,):
+                    hashes.append(hash(variant))
+                    word_ids.append(word_id)
+            hashes = np.frombuffer(hashes, dtype=np.int64)
+            order = np.argsort(hashes, kind='stable')
+            self._variant_hashes = hashes[order]
+            self._variant_words = np.frombuffer(word_ids, dtype=np.int32)[order]
+            self._word_names = dict(word_names)
+
+    def _build_spatial_index(self):
+        with self._lock:
+            if self._spatial is not None:
+                return
+            self._spatial = SpatialIndex(
+                [p.lat for p in self.places], [p.lon for p in self.places], range(len(self.places))
+            )
+
+    # ------------------------------------------------------------------ queries
+
+    def lookup(self, query: str, fuzzy: bool = True, alternates: bool = True) -> Optional[Place]:
+        """Best matching place for a free-text name, or None"""
+        matches = self.search(query, limit=1, fuzzy=fuzzy, alternates=alternates)
+        return matches[0] if matches else None
+
+    def search(self, query: str, limit: int = 5, fuzzy: bool = True, alternates: bool = True) -> List[Place]:
+        """Ranked candidate places for a name such as "Paris", "Paris, TX" or "Athlone Ireland"
+
+        With ``fuzzy=False`` only exact (folded) names and aliases match; with
+        ``alternates=False`` only places' primary names do.
+        """
+        self.load()
+        parts = [fold_name(p) for p in query.split(',')]
+        name, qualifiers = parts[0], [q for q in parts[1:] if q]
+        if not name:
+            return []
+
+        # Each qualifier's readings as (country, admin1 or None); a place has to
+        # match one reading of every qualifier
+        readings: List[List[Tuple[str, Optional[str]]]] = []
+        unresolved = False
+        for qualifier in qualifiers:
+            qualifier_readings = self._resolve_qualifier(qualifier)
+            if qualifier_readings:
+                readings.append(qualifier_readings)
+            else:
+                unresolved = True
+
+        candidates = self._exact(name, alternates)
+        if not candidates:
+            name, readings = self._strip_trailing_country(name, readings)
+            candidates = self._exact(name, alternates) or self._exact(self._strip_fillers(name), alternates)
+        if not candidates and fuzzy:
+            candidates = [c for c in self._fuzzy(name) if alternates or c[1]]
+
+        if readings:
+            candidates = [
+                c for c in candidates
+                if all(any(self._in_region(self.places[c[0]], country, admin1) for country, admin1 in options)
+                       for options in readings)
+            ]
+
+        # An unknown qualifier ("Dublin, Leinster") is only safe to ignore if the name is unambiguous
+        if unresolved and len({c[0] for c in candidates}) > 1:
+            return []
+
+        results: List[Place] = []
+        seen: Set[int] = set()
+        for index, _ in candidates:
+            if index not in seen:
+                seen.add(index)
+                results.append(self.places[index])
+                if len(results) >= limit:
+                    break
+        return results
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Place]:
+        """Most populous places whose name starts with ``prefix``"""
+        self.load()
+        prefix = fold_name(prefix)
+        if not prefix:
+            return []
+
+        candidates: List[Tuple[int, bool]] = []
+        start = bisect_left(self._names, prefix)
+        for name in self._names[start:start + 2000]:
+            if not name.startswith(prefix):
+                break
+            candidates.extend(self._name_places[name])
+        candidates.sort(key=lambda c: -self._rank(c))
+
+        results, seen = [], set()
+        for index, _ in candidates:
+            if index not in seen:
+                seen.add(index)
+                results.append(self.places[index])
+                if len(results) >= limit:
+                    break
+        return results
+
+    def nearest(self, lat: float, lon: float, max_km: Optional[float] = None,
+                k: int = 1) -> List[Tuple[Place, float]]:
+        """Closest places to a coordinate as (place, distance_km), nearest first"""
+        self.load()
+        if self._spatial is None:
+            self._build_spatial_index()
+        return [(self.places[i], km) for i, km in self._spatial.nearest(lat, lon, k=k, max_km=max_km)]
+
+    def country_name(self, iso: str) -> str:
+        self.load()
+        return self._country_names.get(iso, iso)
+
+    def _exact(self, name: str, alternates: bool = True) -> List[Tuple[int, bool]]:
+        candidates = self._name_places.get(name, [])
+        return candidates if alternates else [c for c in candidates if c[1]]
+
+    def _resolve_qualifier(self, qualifier: str) -> List[Tuple[str, Optional[str]]]:
+        """Regions a qualifier may name, as (country, admin1 or None)
+
+        Both readings of an ambiguous qualifier are kept ("IL" is Illinois
+        and Israel, "Georgia" a state and a country); the place decides.
+        """
+        readings: List[Tuple[str, Optional[str]]] = []
+        if qualifier in US_STATES:
+            readings.append(('US', US_STATES[qualifier]))
+        elif len(qualifier) == 2 and qualifier.upper() in US_STATE_CODES:
+            readings.append(('US', qualifier.upper()))
+        if qualifier in self._countries:
+            readings.append((self._countries[qualifier], None))
+        return readings
+
+    @staticmethod
+    def _in_region(place: Place, country: str, admin1: Optional[str]) -> bool:
+        return place.country == country and (admin1 is None or place.admin1 == admin1)
+
+    def _strip_trailing_country(self, name: str, readings: List[List[Tuple[str, Optional[str]]]]
+                                ) -> Tuple[str, List[List[Tuple[str, Optional[str]]]]]:
+        """Treat trailing words naming a country or state as a qualifier ("athlone ireland")"""
+        tokens = name.split()
+        for size in (3, 2, 1):
+            if len(tokens) <= size:
+                continue
+            tail_readings = self._resolve_qualifier(' '.join(tokens[-size:]))
+            if tail_readings:
+                return ' '.join(tokens[:-size]), readings + [tail_readings]
+        return name, readings
+
+    @staticmethod
+    def _strip_fillers(name: str) -> str:
+        for filler in LEADING_FILLERS:
+            if name.startswith(filler + ' '):
+                name = name[len(filler) + 1:]
+                break
+        for filler in TRAILING_FILLERS:
+            if name.endswith(' ' + filler):
+                name = name[:-len(filler) - 1]
+                break
+        return name
+
+    def _similar_words(self, word: str) -> Dict[str, int]:
+        """Vocabulary words equal to ``word`` or (for 4+ letters) one typo away, with the distance"""
+        if len(word) < 4:
+            return {word: 0} if word in self._word_names else {}
+
+        # Two words one edit apart always share a one-deletion variant
+        keys = np.fromiter((hash(v) for v in _variants(word)), dtype=np.int64)
+        starts = np.searchsorted(self._variant_hashes, keys, side='left')
+        ends = np.searchsorted(self._variant_hashes, keys, side='right')
+
+        similar = {}
+        for start, end in zip(starts, ends):
+            for word_id in self._variant_words[start:end]:
+                candidate = self._words[word_id]
+                if candidate not in similar and _within_one_edit(word, candidate):
+                    similar[candidate] = 0 if candidate == word else 1
+        return similar
+
+    def _fuzzy(self, name: str) -> List[Tuple[int, bool]]:
+        """Token-aware fuzzy match: same words in the same order, one typo per word
+
+        Every word on either side needs a counterpart, which is what stops
+        "new york" matching "york" or "dallas" matching "dallasville".
+        """
+        if self._word_names is None:
+            self._build_fuzzy_index()
+
+        tokens = name.split()
+        per_token = [self._similar_words(token) for token in tokens]
+        if not all(per_token):
+            return []
+
+        # Names containing a close variant of every query word
+        name_ids: Optional[Set[int]] = None
+        for similar in sorted(per_token, key=len):
+            ids = set()
+            for word in similar:
+                ids.update(self._word_names[word])
+            name_ids = ids if name_ids is None else name_ids & ids
+            if not name_ids:
+                return []
+
+        scored = []
+        for name_id in name_ids:
+            candidate = self._names[name_id]
+            words = candidate.split()
+            if len(words) != len(tokens):
+                continue
+            distances = [similar.get(word) for similar, word in zip(per_token, words)]
+            if None in distances:
+                continue
+            for entry in self._name_places[candidate]:
+                scored.append((sum(distances), self._rank(entry), entry))
+
+        scored.sort(key=lambda s: (s[0], -s[1]))
+        return [entry for _, _, entry in scored]
+
+
+# Global gazetteer instance
+gazetteer = Gazetteer()
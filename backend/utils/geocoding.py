@@ -1,19 +1,69 @@
-import requests
-from typing import Dict, Optional, Tuple
+import asyncio
+import logging
+import re
 import time
-from .location_cache import MAJOR_CITIES_CACHE, get_cached_coordinates
+import unicodedata
+from concurrent.futures import FIRST_COMPLETED, TimeoutError as FutureTimeoutError, wait
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from .caching import MISSING, PersistentCache
+from .geocoding_client import GeocodingBusy, NominatimClient
+from .gazetteer import gazetteer
+from .location_cache import get_cached_coordinates
+from .metrics import record_cache, timed
+
+# How long Nominatim answers are kept in the shared on-disk cache
+GEOCODE_TTL_SECONDS = 90 * 24 * 3600
+GEOCODE_NEGATIVE_TTL_SECONDS = 24 * 3600
+
+# Longest a request thread waits on a queued Nominatim lookup
+GEOCODE_WAIT_SECONDS = 10.0
+
+# Largest number of names accepted by one geocode_many call
+MAX_BATCH_LOCATIONS = 1000
+
+# Longest one geocode_many call waits on Nominatim in total (about 60 lookups at 1 req/s)
+GEOCODE_BATCH_DEADLINE_SECONDS = 60.0
+
+# Reverse lookups resolve to the nearest gazetteer place within this distance
+REVERSE_GEOCODE_MAX_KM = 25.0
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[^\w\s,]+")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_location_name(location_name: str) -> str:
+    """Canonical cache key for a place name ("  New-York,USA " -> "new york, usa")"""
+    name = unicodedata.normalize('NFKC', location_name).casefold()
+    name = _PUNCTUATION.sub(' ', name)
+    name = _WHITESPACE.sub(' ', name.replace(',', ', ')).replace(' ,', ',')
+    return name.strip(' ,')
+
+def coordinate_key(lat: float, lon: float) -> str:
+    """Cache key for a coordinate pair (~10 m resolution)"""
+    return f"{lat:.4f},{lon:.4f}"
 
 class GeocodingService:
-    def __init__(self):
+    def __init__(self, cache: Optional[PersistentCache] = None,
+                 reverse_cache: Optional[PersistentCache] = None,
+                 client: Optional[NominatimClient] = None):
         # Using OpenStreetMap Nominatim (free, no API key required)
-        self.base_url = "https://nominatim.openstreetmap.org/search"
         self.headers = {
             'User-Agent': 'NASA-SpaceApps-AirQuality/1.0'
         }
+        # Queued, globally rate-limited Nominatim access (1 req/s across workers)
+        self.client = client or NominatimClient(self.headers)
+        self.wait_seconds = GEOCODE_WAIT_SECONDS
         
-        # Initialize with static cache and runtime cache
-        self.location_cache = dict(MAJOR_CITIES_CACHE)  # Start with major cities
+        # Persistent caches shared across workers and restarts
+        self.location_cache = cache or PersistentCache(
+            'geocode', GEOCODE_TTL_SECONDS, GEOCODE_NEGATIVE_TTL_SECONDS
+        )
+        self.reverse_cache = reverse_cache or PersistentCache(
+            'reverse_geocode', GEOCODE_TTL_SECONDS, GEOCODE_NEGATIVE_TTL_SECONDS
+        )
     
+    @timed('geocoding')
     def geocode(self, location_name: str) -> Optional[Dict[str, float]]:
         """
         Convert location name to coordinates
@@ -28,60 +78,190 @@ class GeocodingService:
             return None
             
         # Normalize location name
-        normalized_name = location_name.lower().strip()
+        normalized_name = normalize_location_name(location_name)
+        if not normalized_name:
+            return None
         
+        cached_result, _ = self._lookup_local(normalized_name, location_name)
+        if cached_result is MISSING:
+            # If not in any cache, queue a Nominatim lookup (shared with concurrent
+            # requests for the same name); the worker caches the answer, even a miss
+            future = self.client.search(
+                normalized_name, location_name,
+                on_result=lambda result: self.location_cache.set(normalized_name, result)
+            )
+            cached_result = self._wait(future, f"'{location_name}'")
+            if not self._not_found(future):
+                return cached_result
+        
+        return cached_result or self._closest_match(normalized_name)
+    
+    async def geocode_async(self, location_name: str) -> Optional[Dict[str, float]]:
+        """geocode for asyncio callers: waits on the Nominatim queue without holding a thread"""
+        with timed('geocoding'):
+            normalized_name = normalize_location_name(location_name or '')
+            if not normalized_name:
+                return None
+            
+            cached_result, _ = self._lookup_local(normalized_name, location_name)
+            if cached_result is MISSING:
+                future = self.client.search(
+                    normalized_name, location_name,
+                    on_result=lambda result: self.location_cache.set(normalized_name, result)
+                )
+                description = f"'{location_name}'"
+                cached_result = None
+                try:
+                    # Shielded: the lookup may be shared with other requests, so a timeout here must not cancel it
+                    cached_result = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)),
+                                                           self.wait_seconds)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Geocoding {description} is still queued after {self.wait_seconds}s")
+                except GeocodingBusy as e:
+                    logger.warning(f"Geocoding {description} refused: {e}")
+                except Exception as e:
+                    logger.error(f"Geocoding error for {description}: {e}")
+                if not self._not_found(future):
+                    return cached_result
+            
+            return cached_result or self._closest_match(normalized_name)
+    
+    def geocode_many(self, location_names: Iterable[str], remote: bool = True,
+                     deadline_seconds: float = GEOCODE_BATCH_DEADLINE_SECONDS
+                     ) -> Iterator[Tuple[str, Optional[Dict[str, Any]], str]]:
+        """
+        Geocode a batch of names, yielding results as they resolve
+        
+        Names are deduplicated by their normalized form. Gazetteer and cache
+        hits are yielded first in one pass; only the remaining misses go to
+        the rate-limited Nominatim queue (unless ``remote`` is False), and
+        are yielded in completion order. Names still unresolved
+        ``deadline_seconds`` into the remote pass are yielded as 'timeout';
+        lookups already queued finish in the background and are cached, so
+        retrying them later is cheap.
+        
+        Yields:
+            (location_name, result or None, source) with source one of
+            'gazetteer', 'cache', 'nominatim', 'not_found', 'skipped',
+            'timeout' or 'error'
+        """
+        groups: Dict[str, List[str]] = {}
+        for location_name in location_names:
+            normalized_name = normalize_location_name(location_name or '')
+            if not normalized_name:
+                yield location_name, None, 'not_found'
+                continue
+            groups.setdefault(normalized_name, []).append(location_name)
+        
+        # 1. Local pass: gazetteer and persistent cache
+        misses: List[str] = []
+        for normalized_name, names in groups.items():
+            result, source = self._lookup_local(normalized_name, names[0])
+            if result is MISSING:
+                misses.append(normalized_name)
+                continue
+            for name in names:
+                yield name, self._for_name(result, name, source), source if result else 'not_found'
+        
+        if not remote:
+            for normalized_name in misses:
+                for name in groups[normalized_name]:
+                    yield name, None, 'skipped'
+            return
+        
+        # 2. Remote pass: keep a bounded window of lookups queued so single
+        # geocode() calls from other requests still get a slot; those run
+        # ahead of this batch's queued lookups
+        window = max(1, self.client.max_pending // 2)
+        deadline = time.monotonic() + deadline_seconds
+        queued = iter(misses)
+        in_flight: Dict[Any, str] = {}
+        while True:
+            for normalized_name in queued:
+                future = self.client.search(
+                    normalized_name, groups[normalized_name][0],
+                    on_result=lambda result, key=normalized_name: self.location_cache.set(key, result),
+                    batch=True
+                )
+                in_flight[future] = normalized_name
+                if len(in_flight) >= window:
+                    break
+            if not in_flight:
+                return
+            
+            done, _ = wait(list(in_flight), timeout=max(0.0, deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                unresolved = [*in_flight.values(), *queued]
+                logger.warning(f"Batch geocoding deadline of {deadline_seconds:g}s reached, "
+                               f"{len(unresolved)} names unresolved")
+                for normalized_name in unresolved:
+                    for name in groups[normalized_name]:
+                        yield name, None, 'timeout'
+                return
+            
+            for future in done:
+                normalized_name = in_flight.pop(future)
+                try:
+                    result, source = future.result(), 'nominatim'
+                except Exception as e:
+                    logger.error(f"Geocoding error for '{normalized_name}': {e}")
+                    result, source = None, 'error'
+                for name in groups[normalized_name]:
+                    yield name, result, source if result or source == 'error' else 'not_found'
+    
+    def _lookup_local(self, normalized_name: str, location_name: str) -> Tuple[Any, Optional[str]]:
+        """Gazetteer, then persistent cache: (result, source), or (MISSING, None)"""
         # First check the static cache using smart matching
         cached_result = get_cached_coordinates(normalized_name)
+        record_cache('gazetteer', bool(cached_result))
         if cached_result:
-            display_name = location_name  # Use original name for display
-            cached_result['display_name'] = display_name
-            return cached_result
+            # Copy so the shared static entry is never modified
+            return dict(cached_result, display_name=location_name), 'gazetteer'
         
-        # Then check runtime cache
-        if normalized_name in self.location_cache:
-            return self.location_cache[normalized_name]
+        # Then check the persistent cache (None = known not to exist)
+        cached_result = self.location_cache.get(normalized_name)
+        if cached_result is not MISSING:
+            return cached_result, 'cache'
         
-        try:
-            # If not in any cache, make API request to Nominatim (global search)
-            params = {
-                'q': location_name,
-                'format': 'json',
-                'limit': 1,
-                'addressdetails': 1
-            }
-            
-            response = requests.get(
-                self.base_url, 
-                params=params, 
-                headers=self.headers,
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if data and len(data) > 0:
-                    result = data[0]
-                    
-                    location_info = {
-                        'lat': float(result['lat']),
-                        'lon': float(result['lon']),
-                        'display_name': result.get('display_name', location_name)
-                    }
-                    
-                    # Cache the result
-                    self.location_cache[normalized_name] = location_info
-                    
-                    # Be nice to the free API - add small delay
-                    time.sleep(0.1)
-                    
-                    return location_info
-                    
+        return MISSING, None
+    
+    @staticmethod
+    def _not_found(future) -> bool:
+        """True if a finished Nominatim lookup found nothing (not a timeout or error)"""
+        return future.done() and not future.cancelled() and future.exception() is None \
+            and future.result() is None
+    
+    @staticmethod
+    def _closest_match(normalized_name: str) -> Optional[Dict[str, Any]]:
+        """Gazetteer match allowing one typo per word or an alternate name, for names
+        Nominatim doesn't know ("dubln"); displayed under the matched place's own name
+        so a wrong guess is visible"""
+        place = gazetteer.lookup(normalized_name)
+        if not place:
             return None
-            
+        display_name = f"{place.name}, {gazetteer.country_name(place.country)}"
+        logger.info("No geocoding result for '%s', using closest gazetteer match %s", normalized_name, display_name)
+        return {'lat': place.lat, 'lon': place.lon, 'display_name': display_name}
+    
+    @staticmethod
+    def _for_name(result: Optional[Dict[str, Any]], location_name: str, source: str):
+        """Gazetteer results are displayed under the name the caller used"""
+        if result and source == 'gazetteer':
+            return dict(result, display_name=location_name)
+        return result
+    
+    def _wait(self, future, description: str):
+        """Result of a queued lookup, or None if it failed or took too long"""
+        try:
+            return future.result(timeout=self.wait_seconds)
+        except FutureTimeoutError:
+            logger.warning(f"Geocoding {description} is still queued after {self.wait_seconds}s")
+        except GeocodingBusy as e:
+            logger.warning(f"Geocoding {description} refused: {e}")
         except Exception as e:
-            print(f"Geocoding error for '{location_name}': {str(e)}")
-            return None
+            logger.error(f"Geocoding error for {description}: {e}")
+        return None
     
     def reverse_geocode(self, lat: float, lon: float) -> Optional[str]:
         """
@@ -94,35 +274,22 @@ class GeocodingService:
         Returns:
             Location name or None if not found
         """
-        try:
-            url = "https://nominatim.openstreetmap.org/reverse"
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'format': 'json',
-                'addressdetails': 1
-            }
-            
-            response = requests.get(
-                url, 
-                params=params, 
-                headers=self.headers,
-                timeout=5
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                if 'display_name' in data:
-                    # Be nice to the free API
-                    time.sleep(0.1)
-                    return data['display_name']
-                    
-            return None
-            
-        except Exception as e:
-            print(f"Reverse geocoding error for ({lat}, {lon}): {str(e)}")
-            return None
+        # Nearest named place from the offline gazetteer (k-d tree, no network)
+        nearest = gazetteer.nearest(lat, lon, max_km=REVERSE_GEOCODE_MAX_KM)
+        if nearest:
+            place, _ = nearest[0]
+            return f"{place.name}, {gazetteer.country_name(place.country)}"
+        
+        key = coordinate_key(lat, lon)
+        cached_name = self.reverse_cache.get(key)
+        if cached_name is not MISSING:
+            return cached_name
+        
+        future = self.client.reverse(
+            key, lat, lon,
+            on_result=lambda name: self.reverse_cache.set(key, name)
+        )
+        return self._wait(future, f"({lat}, {lon})")
     
     def is_valid_coordinates(self, lat: float, lon: float) -> bool:
         """
@@ -162,4 +329,7 @@ class GeocodingService:
                 'region': 'Global' if self.is_valid_coordinates(coords['lat'], coords['lon']) else 'Invalid Coordinates'
             }
         
-        return None
\ No newline at end of file
+        return None
+
+# Global geocoding service instance, shared by every caller in the process
+geocoding_service = GeocodingService()
@@ -0,0 +1,147 @@
+"""
+Queued Nominatim client for AuraCast
+Concurrent lookups are queued to a single worker thread that honours
+Nominatim's usage policy (1 request/second, shared by every process through
+a token bucket). Callers receive a Future instead of sleeping on a request
+thread, and concurrent lookups for the same normalized key share one request.
+Batch lookups (geocode_many) wait behind interactive ones, so a bulk import
+never holds up a user's query.
+"""
+
+import itertools
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import requests
+
+from .rate_limit import SharedTokenBucket, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_BASE_URL = os.getenv('NOMINATIM_BASE_URL', "https://nominatim.openstreetmap.org").rstrip('/')
+NOMINATIM_SEARCH_URL = f"{NOMINATIM_BASE_URL}/search"
+NOMINATIM_REVERSE_URL = f"{NOMINATIM_BASE_URL}/reverse"
+NOMINATIM_RATE_PER_SECOND = float(os.getenv('NOMINATIM_RATE_PER_SECOND', 1.0))
+
+# Lookups queued beyond this are refused rather than left to pile up
+MAX_PENDING_LOOKUPS = 60
+
+# Queue priorities: lower runs first, FIFO within a priority
+INTERACTIVE, BATCH = 0, 1
+
+
+class GeocodingBusy(Exception):
+    """Raised (through the Future) when the lookup queue is full"""
+
+
+class NominatimClient:
+    """Rate-limited, de-duplicating access to Nominatim through a worker queue"""
+
+    def __init__(self, headers: Dict[str, str], rate_limiter: Optional[TokenBucket] = None,
+                 max_pending: int = MAX_PENDING_LOOKUPS, timeout: float = 5):
+        self.headers = headers
+        self.rate_limiter = rate_limiter or SharedTokenBucket('nominatim', NOMINATIM_RATE_PER_SECOND)
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._pending: Dict[Hashable, Future] = {}
+        self._priorities: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+
+    def search(self, key: Hashable, query: str,
+               on_result: Optional[Callable[[Any], None]] = None, batch: bool = False) -> Future:
+        """Future resolving to the first match ({'lat', 'lon', 'display_name'}) or None
+
+        ``batch`` lookups run only when no interactive lookup is waiting.
+        """
+        return self._submit(('search', key), self._search, (query,), on_result, BATCH if batch else INTERACTIVE)
+
+    def reverse(self, key: Hashable, lat: float, lon: float,
+                on_result: Optional[Callable[[Any], None]] = None) -> Future:
+        """Future resolving to the display name at a coordinate, or None"""
+        return self._submit(('reverse', key), self._reverse, (lat, lon), on_result, INTERACTIVE)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _submit(self, key: Hashable, fn: Callable, args: tuple,
+                on_result: Optional[Callable[[Any], None]], priority: int) -> Future:
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                # Same lookup already queued or in flight; an interactive caller
+                # moves a queued batch lookup up (the worker skips the stale entry)
+                if priority < self._priorities[key]:
+                    self._priorities[key] = priority
+                    self._queue.put((priority, next(self._sequence), key, fn, args, on_result, future))
+                return future
+
+            future = Future()
+            if len(self._pending) >= self.max_pending:
+                future.set_exception(GeocodingBusy(f"{len(self._pending)} geocoding lookups already queued"))
+                return future
+
+            self._pending[key] = future
+            self._priorities[key] = priority
+            self._queue.put((priority, next(self._sequence), key, fn, args, on_result, future))
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='nominatim-client', daemon=True)
+                self._worker.start()
+        return future
+
+    def _run(self):
+        while True:
+            _, _, key, fn, args, on_result, future = self._queue.get()
+            try:
+                if future.done():
+                    continue  # moved up and already run, or cancelled
+                self.rate_limiter.acquire()
+                result = fn(*args)
+                if on_result is not None:
+                    on_result(result)
+                future.set_result(result)
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    if self._pending.get(key) is future:
+                        del self._pending[key]
+                        del self._priorities[key]
+
+    def _search(self, query: str) -> Optional[Dict[str, Any]]:
+        params = {
+            'q': query,
+            'format': 'json',
+            'limit': 1,
+            'addressdetails': 1
+        }
+        response = requests.get(NOMINATIM_SEARCH_URL, params=params, headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            return None
+        result = data[0]
+        return {
+            'lat': float(result['lat']),
+            'lon': float(result['lon']),
+            'display_name': result.get('display_name', query)
+        }
+
+    def _reverse(self, lat: float, lon: float) -> Optional[str]:
+        params = {
+            'lat': lat,
+            'lon': lon,
+            'format': 'json',
+            'addressdetails': 1
+        }
+        response = requests.get(NOMINATIM_REVERSE_URL, params=params, headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get('display_name')
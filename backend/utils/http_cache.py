@@ -0,0 +1,90 @@
+"""
+HTTP caching for AuraCast
+Static payloads are serialized (and compressed) once at startup and served
+with a strong ETag.
+Prediction responses get a weak ETag derived from what determines them
+(model version, grid cell, hour), so a matching If-None-Match is answered
+with 304 before anything is computed. Both carry Cache-Control, so browsers
+and CDNs can serve repeat reads themselves.
+"""
+
+import hashlib
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from flask import Response, request
+
+from .compression import (COMPRESSION_MIN_BYTES, ENCODINGS, STATIC_BROTLI_QUALITY, STATIC_GZIP_LEVEL,
+                          choose_encoding, compress)
+from .serialization import dumps_bytes
+
+# How long clients may reuse static payloads before revalidating
+STATIC_MAX_AGE_SECONDS = int(os.getenv('STATIC_MAX_AGE_SECONDS', 3600))
+# Predictions are keyed to cells this size (degrees)
+PREDICTION_CELL_DEGREES = 0.01
+
+
+def make_etag(*parts: Any) -> str:
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:20]
+
+
+def grid_cell(lat: float, lon: float, degrees: float = PREDICTION_CELL_DEGREES) -> str:
+    return f"{math.floor(lat / degrees)}:{math.floor(lon / degrees)}"
+
+
+def seconds_until_next_hour(now: Optional[datetime] = None) -> int:
+    now = now or datetime.now()
+    next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    return max(1, math.ceil((next_hour - now).total_seconds()))
+
+
+def _set_cache_headers(response: Response, etag: str, weak: bool, max_age: int) -> Response:
+    response.set_etag(etag, weak=weak)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response
+
+
+def cached_response(etag: str, build: Callable[[], Response], weak: bool = True,
+                    max_age: int = STATIC_MAX_AGE_SECONDS) -> Response:
+    """304 for a matching If-None-Match, otherwise ``build()`` with caching headers"""
+    # If-None-Match always uses weak comparison
+    if request.if_none_match.contains_weak(etag):
+        return _set_cache_headers(Response(status=304), etag, weak, max_age)
+    response = build()
+    if response.status_code != 200:
+        return response
+    return _set_cache_headers(response, etag, weak, max_age)
+
+
+class StaticPayload:
+    """A JSON payload serialized and compressed once, served with a strong ETag per encoding"""
+
+    LEVELS = {'gzip': STATIC_GZIP_LEVEL, 'br': STATIC_BROTLI_QUALITY}
+
+    def __init__(self, payload: Any, max_age: int = STATIC_MAX_AGE_SECONDS):
+        self.body = dumps_bytes(payload) + b'\n'
+        self.etag = hashlib.sha1(self.body).hexdigest()[:20]
+        self.max_age = max_age
+        self.encoded = {}
+        if len(self.body) >= COMPRESSION_MIN_BYTES:
+            for encoding in ENCODINGS:
+                self.encoded[encoding] = compress(self.body, encoding, self.LEVELS[encoding])
+
+    def response(self) -> Response:
+        encoding = choose_encoding(tuple(self.encoded))
+
+        def build() -> Response:
+            if encoding is None:
+                response = Response(self.body, mimetype='application/json')
+            else:
+                response = Response(self.encoded[encoding], mimetype='application/json')
+                response.headers['Content-Encoding'] = encoding
+            if self.encoded:
+                response.vary.add('Accept-Encoding')
+            return response
+
+        etag = f"{self.etag}-{encoding}" if encoding else self.etag
+        return cached_response(etag, build, weak=False, max_age=self.max_age)
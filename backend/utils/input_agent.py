@@ -1,24 +1,35 @@
-import google.generativeai as genai
 from dotenv import load_dotenv
 import os
 import json
-from typing import Dict, Optional, Union
+import hashlib
+import threading
+from typing import Dict, Optional, Tuple, Union
 from .config.ai_config import INPUT_AGENT_PROMPT
+from .caching import MISSING, PersistentCache
+from .query_extractor import QueryExtractor, normalize_prompt, resolve_datetime
+from .llm_client import make_model
+from .metrics import timed
+from .logging_config import Payload, SAMPLED
 
 # Load environment variables
 load_dotenv()
 
+# Gemini extractions are reused for identical (normalized) prompts for this long
+EXTRACTION_CACHE_TTL_SECONDS = int(os.getenv('EXTRACTION_CACHE_TTL_SECONDS', 7 * 24 * 3600))
+EXTRACTION_CACHE_MAX_ENTRIES = 50000
+
 class InputAgent:
     def __init__(self):
-        api_key = os.getenv('GOOGLE_AI_STUDIO_KEY')
-        if not api_key:
-            raise ValueError("GOOGLE_AI_STUDIO_KEY not found in environment variables")
-        
-        # Configure Gemini
-        genai.configure(api_key=api_key)
+        # Initialize the model (Gemini, or a stand-in at GEMINI_BASE_URL)
+        self.model = make_model()
         
-        # Initialize the model
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        # Rule-based extraction answers simple queries without a Gemini call
+        self.query_extractor = QueryExtractor()
+        self.extraction_cache = PersistentCache(
+            'input_extraction', EXTRACTION_CACHE_TTL_SECONDS, max_entries=EXTRACTION_CACHE_MAX_ENTRIES
+        )
+        self._stats = {'fast_path': 0, 'cache': 0, 'llm': 0}
+        self._stats_lock = threading.Lock()
         
         # System prompt for parameter extraction
         self.system_prompt = """Extract parameters from the input and respond with ONLY a JSON object (no markdown, no code blocks) in this format:
@@ -40,64 +51,150 @@ class InputAgent:
         - "understand", "analyze", "source" → analysis intent
         - "forecast", "prediction" → forecast intent
         DO NOT wrap the JSON in code blocks. Return ONLY the raw JSON object."""
+        
+        # Cached extractions are only valid for the prompt that produced them
+        self._prompt_version = hashlib.sha1(self.system_prompt.encode('utf-8')).hexdigest()[:8]
+
+    def get_stats(self) -> Dict[str, Union[int, float]]:
+        """How many extractions were answered by the rules, the cache and the LLM"""
+        with self._stats_lock:
+            fast_path, cache, llm = self._stats['fast_path'], self._stats['cache'], self._stats['llm']
+        total = fast_path + cache + llm
+        return {
+            'fast_path': fast_path,
+            'cache': cache,
+            'llm': llm,
+            'fast_path_rate': round(fast_path / total, 3) if total else 0.0,
+            'cache_hit_rate': round(cache / (cache + llm), 3) if cache + llm else 0.0
+        }
+
+    def _count(self, path: str):
+        with self._stats_lock:
+            self._stats[path] += 1
 
     def extract_parameters(self, prompt: str) -> Dict[str, Optional[str]]:
+        extracted_params, cache_key = self._extract_without_llm(prompt)
+        if extracted_params is None:
+            extracted_params = self._extract_with_llm(prompt)
+            self._store_extraction(cache_key, extracted_params)
+        
+        extracted_params['datetime'] = resolve_datetime(extracted_params.get('time_descriptor'))
+        return extracted_params
+
+    async def extract_parameters_async(self, prompt: str) -> Dict[str, Optional[str]]:
+        """extract_parameters for asyncio callers: the Gemini call is awaited rather than blocking a thread"""
+        extracted_params, cache_key = self._extract_without_llm(prompt)
+        if extracted_params is None:
+            extracted_params = await self._extract_with_llm_async(prompt)
+            self._store_extraction(cache_key, extracted_params)
+        
+        extracted_params['datetime'] = resolve_datetime(extracted_params.get('time_descriptor'))
+        return extracted_params
+
+    def _extract_without_llm(self, prompt: str) -> Tuple[Optional[Dict[str, Optional[str]]], Optional[str]]:
+        """(parameters, None) from the rules or the cache, or (None, cache key) when Gemini is needed"""
+        from flask import current_app
+        current_app.logger.info("=== Parameter Extraction Started ===")
+        current_app.logger.info("Input prompt: %s", Payload(prompt), extra=SAMPLED)
+        
+        extracted_params, confidence = self.query_extractor.extract(prompt)
+        if confidence >= self.query_extractor.min_confidence:
+            self._count('fast_path')
+            current_app.logger.info("Extracted locally (confidence %s): %s", confidence, Payload(extracted_params))
+            return extracted_params, None
+        
+        # Relative time words are cached as written ("tomorrow") and resolved per request
+        cache_key = self._cache_key(prompt)
+        extracted_params = self.extraction_cache.get(cache_key)
+        if extracted_params is not MISSING and extracted_params is not None:
+            self._count('cache')
+            current_app.logger.info("Extraction cache hit (local confidence %s)", confidence)
+            return extracted_params, None
+        
+        current_app.logger.info("Local extraction confidence %s, asking Gemini", confidence)
+        self._count('llm')
+        return None, cache_key
+
+    def _store_extraction(self, cache_key: str, extracted_params: Dict[str, Optional[str]]):
+        if any(value is not None for value in extracted_params.values()):
+            self.extraction_cache.set(cache_key, extracted_params)
+
+    def _cache_key(self, prompt: str) -> str:
+        normalized = normalize_prompt(prompt)
+        return f"{self._prompt_version}:{hashlib.sha1(normalized.encode('utf-8')).hexdigest()}"
+
+    @timed('llm_extraction')
+    def _extract_with_llm(self, prompt: str) -> Dict[str, Optional[str]]:
         try:
             from flask import current_app
-            current_app.logger.info("=== Parameter Extraction Started ===")
-            current_app.logger.info(f"Input prompt: {prompt}")
             
             # Combine system prompt with user query
             full_prompt = f"{self.system_prompt}\n\nInput text: {prompt}"
             
             # Generate response with minimal configuration
             current_app.logger.info("Calling Gemini API...")
-            response = self.model.generate_content(full_prompt)
-            
-            current_app.logger.info(f"Raw Gemini response: {response.text}")
-            
-            try:
-                # Extract the JSON part from the response
-                json_str = response.text.strip()
-                
-                # Remove code block markers if present
-                if json_str.startswith('```'):
-                    json_str = json_str.split('\n', 1)[1]  # Remove first line with ```json
-                if json_str.endswith('```'):
-                    json_str = json_str.rsplit('\n', 1)[0]  # Remove last line with ```
-                
-                # Parse the JSON
-                extracted_params = json.loads(json_str)
-                
-                current_app.logger.info("Extracted parameters:")
-                for key, value in extracted_params.items():
-                    current_app.logger.info(f"{key}: {value}")
-                
-                # Validate required fields
-                required_fields = ['location', 'time_descriptor', 'context_type', 'analysis_depth', 'special_concerns', 'query_intent']
-                for field in required_fields:
-                    if field not in extracted_params:
-                        current_app.logger.info(f"Missing required field: {field}")
-                        extracted_params[field] = None
-                
-                current_app.logger.info("=== Parameter Extraction Completed ===")
-                return extracted_params
+            response_text = self.model.generate_content(full_prompt).text
             
-            except json.JSONDecodeError:
-                # If response is not valid JSON, return None for all parameters
-                return {
-                    'location': None,
-                    'time_descriptor': None,
-                    'context_type': None,
-                    'analysis_depth': None,
-                    'special_concerns': None,
-                    'query_intent': None
-                }
-                
         except Exception as e:
             # Log the error
             current_app.logger.error(f"Error in Gemini API call: {str(e)}")
             raise
+        
+        return self._parse_extraction(response_text)
+
+    async def _extract_with_llm_async(self, prompt: str) -> Dict[str, Optional[str]]:
+        from flask import current_app
+        with timed('llm_extraction'):
+            try:
+                current_app.logger.info("Calling Gemini API...")
+                response = await self.model.generate_content_async(f"{self.system_prompt}\n\nInput text: {prompt}")
+                response_text = response.text
+            except Exception as e:
+                current_app.logger.error(f"Error in Gemini API call: {str(e)}")
+                raise
+        
+        return self._parse_extraction(response_text)
+
+    def _parse_extraction(self, response_text: str) -> Dict[str, Optional[str]]:
+        """Parameters from Gemini's reply (all None if it isn't valid JSON)"""
+        from flask import current_app
+        current_app.logger.info("Raw Gemini response: %s", Payload(response_text), extra=SAMPLED)
+        
+        try:
+            # Extract the JSON part from the response
+            json_str = response_text.strip()
+            
+            # Remove code block markers if present
+            if json_str.startswith('```'):
+                json_str = json_str.split('\n', 1)[1]  # Remove first line with ```json
+            if json_str.endswith('```'):
+                json_str = json_str.rsplit('\n', 1)[0]  # Remove last line with ```
+            
+            # Parse the JSON
+            extracted_params = json.loads(json_str)
+            
+            current_app.logger.info("Extracted parameters: %s", Payload(extracted_params))
+            
+            # Validate required fields
+            required_fields = ['location', 'time_descriptor', 'context_type', 'analysis_depth', 'special_concerns', 'query_intent']
+            for field in required_fields:
+                if field not in extracted_params:
+                    current_app.logger.info("Missing required field: %s", field)
+                    extracted_params[field] = None
+            
+            current_app.logger.info("=== Parameter Extraction Completed ===")
+            return extracted_params
+        
+        except json.JSONDecodeError:
+            # If response is not valid JSON, return None for all parameters
+            return {
+                'location': None,
+                'time_descriptor': None,
+                'context_type': None,
+                'analysis_depth': None,
+                'special_concerns': None,
+                'query_intent': None
+            }
 
     def validate_parameters(self, params: Dict[str, Optional[str]]) -> Dict[str, Union[str, list]]:
         """
@@ -130,7 +227,7 @@ Return ONLY the raw JSON object."""
             response = self.model.generate_content(validation_prompt)
             validation_result = json.loads(response.text.strip())
             
-            current_app.logger.info(f"AI Validation result: {validation_result}")
+            current_app.logger.info("AI Validation result: %s", Payload(validation_result))
             
             if validation_result.get('sufficient', False):
                 return {
@@ -0,0 +1,119 @@
+"""
+LLM client for AuraCast
+The agents get their model from make_model(). By default that is Gemini via
+google.generativeai. With GEMINI_BASE_URL set, generate_content goes over
+plain HTTP to any server speaking the Gemini REST API instead, such as the
+stand-in in loadtest/standins.py. The API key is then optional, so the
+stack can run offline. Both kinds of model also have generate_content_async,
+which the ASGI mode (asgi.py) uses.
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = 'gemini-2.0-flash'
+GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL')
+GEMINI_TIMEOUT_SECONDS = 60
+
+
+class GeminiHTTPResponse:
+    """The part of a google.generativeai response the agents use"""
+
+    def __init__(self, payload: Dict[str, Any]):
+        self.payload = payload
+
+    @property
+    def text(self) -> str:
+        candidates = self.payload.get('candidates') or []
+        if not candidates:
+            raise ValueError("Response contains no candidates")
+        parts = candidates[0].get('content', {}).get('parts', [])
+        return ''.join(part.get('text', '') for part in parts)
+
+
+class GeminiHTTPModel:
+    """generate_content over the Gemini REST API at ``base_url``"""
+
+    def __init__(self, model_name: str, base_url: str, api_key: Optional[str] = None,
+                 timeout: float = GEMINI_TIMEOUT_SECONDS):
+        self.model_name = model_name
+        self.base_url = base_url.rstrip('/')
+        self.api_key = api_key
+        self.timeout = timeout
+        self._local = threading.local()
+        self._async_client = None
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _url(self, method: str) -> str:
+        return f"{self.base_url}/v1beta/models/{self.model_name}:{method}"
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        body = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+        params = {'key': self.api_key} if self.api_key else {}
+        if stream:
+            return self._stream(body, params)
+
+        response = self._session().post(self._url('generateContent'), params=params, json=body, timeout=self.timeout)
+        response.raise_for_status()
+        return GeminiHTTPResponse(response.json())
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        """generate_content for asyncio callers; with ``stream`` the result is an async iterator"""
+        body = {'contents': [{'role': 'user', 'parts': [{'text': prompt}]}]}
+        params = {'key': self.api_key} if self.api_key else {}
+        if stream:
+            return self._stream_async(body, params)
+
+        response = await self._client().post(self._url('generateContent'), params=params, json=body)
+        response.raise_for_status()
+        return GeminiHTTPResponse(response.json())
+
+    def _client(self):
+        if self._async_client is None:
+            import httpx  # only needed in ASGI mode
+            self._async_client = httpx.AsyncClient(timeout=self.timeout)
+        return self._async_client
+
+    async def _stream_async(self, body: Dict[str, Any], params: Dict[str, str]) -> AsyncIterator[GeminiHTTPResponse]:
+        async with self._client().stream('POST', self._url('streamGenerateContent'),
+                                         params=dict(params, alt='sse'), json=body) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line and line.startswith('data:'):
+                    yield GeminiHTTPResponse(json.loads(line[5:]))
+
+    def _stream(self, body: Dict[str, Any], params: Dict[str, str]) -> Iterator[GeminiHTTPResponse]:
+        response = self._session().post(self._url('streamGenerateContent'), params=dict(params, alt='sse'),
+                                        json=body, timeout=self.timeout, stream=True)
+        response.raise_for_status()
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if line and line.startswith('data:'):
+                    yield GeminiHTTPResponse(json.loads(line[5:]))
+
+
+def make_model(model_name: str = GEMINI_MODEL):
+    """The configured model: Gemini, or a Gemini-compatible server at GEMINI_BASE_URL"""
+    api_key = os.getenv('GOOGLE_AI_STUDIO_KEY')
+    if GEMINI_BASE_URL:
+        logger.info(f"Using Gemini-compatible endpoint at {GEMINI_BASE_URL}")
+        return GeminiHTTPModel(model_name, GEMINI_BASE_URL, api_key)
+
+    if not api_key:
+        raise ValueError("GOOGLE_AI_STUDIO_KEY not found in environment variables")
+
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
@@ -2,6 +2,8 @@
 Geocoding cache for frequently accessed locations
 """
 
+from .gazetteer import gazetteer
+
 # Pre-computed coordinates for major North American cities
 MAJOR_CITIES_CACHE = {
     # United States
@@ -46,13 +48,13 @@ MAJOR_CITIES_CACHE = {
 
 def get_cached_coordinates(location: str) -> dict:
     """
-    Get coordinates for a location from the cache.
+    Get coordinates for a location from the cache or the offline gazetteer.
     
     Args:
         location (str): Location name to look up
         
     Returns:
-        dict: Dictionary with 'lat' and 'lon' if found, None if not in cache
+        dict: Dictionary with 'lat' and 'lon' if found, None if not known locally
     """
     # Normalize the location string
     normalized_location = location.lower().strip()
@@ -61,9 +63,10 @@ def get_cached_coordinates(location: str) -> dict:
     if normalized_location in MAJOR_CITIES_CACHE:
         return MAJOR_CITIES_CACHE[normalized_location]
     
-    # Try partial matches (e.g., "new york city" -> "new york")
-    for city in MAJOR_CITIES_CACHE:
-        if city in normalized_location or normalized_location in city:
-            return MAJOR_CITIES_CACHE[city]
+    # Then the gazetteer, primary names only: a typo or alternate-name match
+    # ("trim" -> Rome) is not trusted ahead of Nominatim
+    place = gazetteer.lookup(normalized_location, fuzzy=False, alternates=False)
+    if place:
+        return {'lat': place.lat, 'lon': place.lon}
     
-    return None
\ No newline at end of file
+    return None
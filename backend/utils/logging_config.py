@@ -0,0 +1,128 @@
+"""
+Logging setup for AuraCast
+Request threads only put log records on a queue; a background listener
+thread formats them (JSON on Cloud Run, text elsewhere) and writes them to
+stdout, so message arguments are rendered on that thread and show their
+values as of then. Large payloads are logged through ``Payload`` with ``extra=SAMPLED``:
+they are truncated when formatted, and only a sample of them is logged at all.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+from typing import Any, Optional
+
+# Level for the root logger (the utils modules); app.py sets its own logger to INFO
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'WARNING').upper()
+# 'json' (one object per line, Cloud Logging fields) or 'text'; JSON by default on Cloud Run
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json' if os.getenv('K_SERVICE') else 'text')
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', 0.01))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv('LOG_PAYLOAD_MAX_CHARS', 2000))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Pass as ``extra`` for records carrying a large payload
+SAMPLED = {'sampled': True}
+
+# LogRecord attributes that are not user-supplied ``extra`` fields
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'sampled'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class Payload:
+    """A value rendered (as JSON where possible, truncated) only if its log record is emitted"""
+
+    __slots__ = ('value', 'max_chars')
+
+    def __init__(self, value: Any, max_chars: int = LOG_PAYLOAD_MAX_CHARS):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        try:
+            text = json.dumps(self.value, default=str, ensure_ascii=False)
+        except (TypeError, ValueError):
+            text = repr(self.value)
+        except RuntimeError:
+            # Changed by the request while the listener was rendering it
+            text = f"<{type(self.value).__name__} modified while logging>"
+        if len(text) > self.max_chars:
+            return f"{text[:self.max_chars]}... ({len(text)} chars)"
+        return text
+
+
+class PayloadSampler(logging.Filter):
+    """Drops all but ``rate`` of the records logged with ``extra=SAMPLED``"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, 'sampled', False):
+            return random.random() < self.rate
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener thread
+
+    The stock prepare() formats each record on the logging thread so it can be
+    pickled; this queue stays in the process, so the record is only copied and
+    its message (and any Payload) is rendered by the listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with ``extra`` fields as top-level keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'severity': record.levelname,
+            'message': record.getMessage(),
+            'logger': record.name,
+            'time': self.formatTime(record),
+            'thread': record.threadName,
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        elif record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+def configure_logging(stream=None) -> logging.handlers.QueueListener:
+    """Route every logger through a queue to a stdout writer thread (safe to call more than once)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(PayloadSampler(LOG_PAYLOAD_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    # Flush what's queued on shutdown
+    atexit.register(_listener.stop)
+    return _listener
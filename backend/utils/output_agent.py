@@ -2,15 +2,19 @@
 Output Agent for processing model predictions and generating user-friendly responses
 """
 
+import asyncio
 import json
 import logging
-import os
-import numpy as np
+import re
 from datetime import datetime
 from dotenv import load_dotenv
-import google.generativeai as genai
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Any, Tuple
 from .visualization_config import VISUALIZATION_MAPPINGS, SUPPORTED_VISUALIZATIONS
+from .analysis_cache import AnalysisCache
+from .llm_client import make_model
+from .metrics import timed
+from .logging_config import Payload, SAMPLED
+from .serialization import dumps
 
 # Load environment variables
 load_dotenv()
@@ -18,17 +22,68 @@ load_dotenv()
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Model replies are JSON with display_text first; this finds its value as it streams in
+_DISPLAY_TEXT_START = re.compile(r'"display_text"\s*:\s*"')
+
+# Dashboard shown while a streamed analysis is still being generated
+STREAM_DEFAULT_VISUALIZATIONS = ['time_series', 'concentration map', 'wind_rose']
+
+
+class DisplayTextStream:
+    """Incrementally decodes the "display_text" string from a streamed JSON reply"""
+
+    def __init__(self):
+        self.buffer = ''
+        self.position: Optional[int] = None  # next undecoded character of the string
+        self.finished = False
+        self.text = ''
+
+    def feed(self, chunk: str) -> str:
+        """Add model output; returns the newly available part of the display text"""
+        self.buffer += chunk
+        if self.finished:
+            return ''
+        if self.position is None:
+            match = _DISPLAY_TEXT_START.search(self.buffer)
+            if not match:
+                return ''
+            self.position = match.end()
+
+        decoded = []
+        i = self.position
+        while i < len(self.buffer):
+            char = self.buffer[i]
+            if char == '"':
+                self.finished = True
+                i += 1
+                break
+            if char == '\\':
+                length = 6 if self.buffer[i + 1:i + 2] == 'u' else 2
+                if i + length > len(self.buffer):
+                    break  # escape split across chunks; wait for the rest
+                try:
+                    decoded.append(json.loads(f'"{self.buffer[i:i + length]}"'))
+                except ValueError:
+                    decoded.append(self.buffer[i + 1:i + length])
+                i += length
+                continue
+            decoded.append(char)
+            i += 1
+        self.position = i
+        new_text = ''.join(decoded)
+        self.text += new_text
+        return new_text
+
+
 class OutputAgent:
     def __init__(self):
         """Initialize the output agent with AI model"""
         
-        # Initialize Gemini model
-        api_key = os.getenv('GOOGLE_AI_STUDIO_KEY')
-        if not api_key:
-            raise ValueError("GOOGLE_AI_STUDIO_KEY not found in environment variables")
+        # Initialize Gemini model (or a stand-in at GEMINI_BASE_URL)
+        self.model = make_model()
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash')
+        # Analyses are shared between requests with matching (quantized) predictions and context
+        self.analysis_cache = AnalysisCache()
     
     def analyze_predictions(self, 
                           predictions: Dict, 
@@ -51,25 +106,222 @@ class OutputAgent:
             }
         """
         try:
-            # Convert numpy values to Python native types
-            def convert_numpy_values(obj: Any) -> Any:
-                if isinstance(obj, np.integer):
-                    return int(obj)
-                elif isinstance(obj, np.floating):
-                    return round(float(obj), 2)
-                elif isinstance(obj, np.ndarray):
-                    return obj.tolist()
-                elif isinstance(obj, dict):
-                    return {k: convert_numpy_values(v) for k, v in obj.items()}
-                elif isinstance(obj, (list, tuple)):
-                    return [convert_numpy_values(item) for item in obj]
-                return obj
+            analysis_result = self.analysis_cache.get_or_compute(
+                predictions, user_context, lat, lon, location_name,
+                lambda: self._generate_analysis(predictions, user_context)
+            )
+            
+            return self._build_response(analysis_result, predictions, user_context, lat, lon, location_name)
+            
+        except json.JSONDecodeError as e:
+            error_msg = f"JSON parsing error: {str(e)}"
+            logger.error(f"Error parsing AI response: {error_msg}")
+            return self.fallback_response(predictions, user_context, error_msg)
+            
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"Error in AI analysis: {error_msg}")
+            return self._error_response(error_msg)
+
+    def stream_analysis(self,
+                        predictions: Dict,
+                        user_context: Dict,
+                        lat: float,
+                        lon: float,
+                        location_name: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Streaming analyze_predictions: yields ('text', chunk) as the display text is
+        generated, then ('result', response) with the analyze_predictions structure
+        """
+        display_text = DisplayTextStream()
+        try:
+            analysis_result = self.analysis_cache.get(predictions, user_context, lat, lon, location_name)
+            if analysis_result is None:
+                with timed('llm_analysis'):
+                    response = self.model.generate_content(
+                        self._analysis_prompt(predictions, user_context), stream=True
+                    )
+                    for chunk in response:
+                        text = display_text.feed(chunk.text)
+                        if text:
+                            yield 'text', text
+                analysis_result = self._parse_analysis(display_text.buffer)
+                self.analysis_cache.put(predictions, user_context, lat, lon, location_name, analysis_result)
+            
+            # Cache hits, and replies that didn't lead with display_text, arrive in one piece
+            remaining = analysis_result.get('display_text', '')[len(display_text.text):]
+            if remaining:
+                yield 'text', remaining
+            
+            yield 'result', self._build_response(analysis_result, predictions, user_context, lat, lon, location_name)
+            
+        except json.JSONDecodeError as e:
+            error_msg = f"JSON parsing error: {str(e)}"
+            logger.error(f"Error parsing streamed AI response: {error_msg}")
+            yield 'result', self.fallback_response(predictions, user_context, error_msg)
+            
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"Error in streamed AI analysis: {error_msg}")
+            yield 'result', self._error_response(error_msg)
+
+    async def analyze_predictions_async(self, predictions: Dict, user_context: Dict,
+                                        lat: float, lon: float, location_name: str) -> Dict:
+        """analyze_predictions for asyncio callers: the model call is awaited rather than blocking a thread"""
+        async def generate() -> Dict:
+            with timed('llm_analysis'):
+                response = await self.model.generate_content_async(self._analysis_prompt(predictions, user_context))
+                return self._parse_analysis(response.text)
+        
+        try:
+            analysis_result = await self.analysis_cache.get_or_compute_async(
+                predictions, user_context, lat, lon, location_name, generate
+            )
+            
+            return self._build_response(analysis_result, predictions, user_context, lat, lon, location_name)
+            
+        except json.JSONDecodeError as e:
+            error_msg = f"JSON parsing error: {str(e)}"
+            logger.error(f"Error parsing AI response: {error_msg}")
+            return self.fallback_response(predictions, user_context, error_msg)
+            
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"Error in AI analysis: {error_msg}")
+            return self._error_response(error_msg)
+
+    async def stream_analysis_async(self, predictions: Dict, user_context: Dict, lat: float, lon: float,
+                                    location_name: str) -> AsyncIterator[Tuple[str, Any]]:
+        """stream_analysis for asyncio callers
+        
+        Identical concurrent requests share one model call: the one making it
+        streams the text, the others receive the finished analysis in one piece.
+        """
+        display_text = DisplayTextStream()
+        chunks: asyncio.Queue = asyncio.Queue()
+        
+        async def generate() -> Dict:
+            with timed('llm_analysis'):
+                response = await self.model.generate_content_async(
+                    self._analysis_prompt(predictions, user_context), stream=True
+                )
+                async for chunk in response:
+                    text = display_text.feed(chunk.text)
+                    if text:
+                        chunks.put_nowait(text)
+            return self._parse_analysis(display_text.buffer)
+        
+        try:
+            analysis = asyncio.ensure_future(self.analysis_cache.get_or_compute_async(
+                predictions, user_context, lat, lon, location_name, generate
+            ))
+            next_chunk = None
+            try:
+                while not analysis.done():
+                    next_chunk = asyncio.ensure_future(chunks.get())
+                    await asyncio.wait({analysis, next_chunk}, return_when=asyncio.FIRST_COMPLETED)
+                    if next_chunk.done():
+                        yield 'text', next_chunk.result()
+                while not chunks.empty():
+                    yield 'text', chunks.get_nowait()
+            finally:
+                # The client went away (or the analysis finished): stop waiting on either
+                for task in (analysis, next_chunk):
+                    if task is not None and not task.done():
+                        task.cancel()
+            analysis_result = analysis.result()
+            
+            remaining = analysis_result.get('display_text', '')[len(display_text.text):]
+            if remaining:
+                yield 'text', remaining
+            
+            yield 'result', self._build_response(analysis_result, predictions, user_context, lat, lon, location_name)
             
-            # Convert predictions before JSON serialization
-            converted_predictions = convert_numpy_values(predictions)
+        except json.JSONDecodeError as e:
+            error_msg = f"JSON parsing error: {str(e)}"
+            logger.error(f"Error parsing streamed AI response: {error_msg}")
+            yield 'result', self.fallback_response(predictions, user_context, error_msg)
             
-            # Use AI to analyze predictions and generate response
-            analysis_prompt = f"""You are an expert air quality analyst. Analyze the provided data and user context to generate a comprehensive response.
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"Error in streamed AI analysis: {error_msg}")
+            yield 'result', self._error_response(error_msg)
+
+    def _build_response(self, analysis_result: Dict, predictions: Dict, user_context: Dict,
+                        lat: float, lon: float, location_name: str) -> Dict:
+        """Response structure for a parsed model analysis, with its dashboard"""
+        # Build dashboard details
+        dashboard_details = self.build_dashboard_details(
+            predictions=predictions,
+            location=user_context.get('location', 'Unknown'),
+            suggested_vis=analysis_result.get('suggested_visualizations', []),
+            latitude=lat,
+            longitude=lon,
+            location_name=location_name
+        )
+
+        return {
+            'status_code': analysis_result.get('status_code', 200),
+            'display_text': analysis_result.get('display_text', 'Analysis completed'),
+            'metadata': {
+                'status': 'success',
+                'analysis': {
+                    'results': analysis_result.get('analysis_results', {}),
+                    'recommendations': analysis_result.get('recommendations', []),
+                    'suggested_visualizations': analysis_result.get('suggested_visualizations', [])
+                },
+                'context': {
+                    'analyzed_parameters': list(analysis_result.get('analysis_results', {}).keys()),
+                    'context_type': user_context.get('context_type', 'general'),
+                    'analysis_depth': user_context.get('analysis_depth', 'brief'),
+                    'original_prompt': user_context.get('original_prompt', '')
+                }
+            },
+            'dashboard_details': dashboard_details
+        }
+
+    def fallback_response(self, predictions: Dict, user_context: Dict, error_msg: str) -> Dict:
+        """Response when the model's reply could not be parsed"""
+        return {
+            'status_code': 200,
+            'display_text': f"Based on the air quality data for {user_context.get('location', 'your location')}, the current AQI is {predictions.get('air_quality', {}).get('aqi', 'unknown')}. Please check the detailed analysis results for more information.",
+            'metadata': {
+                'status': 'partial_success',
+                'analysis': {
+                    'results': {},
+                    'recommendations': ['Check local air quality updates regularly'],
+                    'suggested_visualizations': ['aqi_gauge', 'daily_forecast']
+                },
+                'context': {
+                    'analyzed_parameters': [],
+                    'context_type': user_context.get('context_type', 'general'),
+                    'analysis_depth': user_context.get('analysis_depth', 'brief'),
+                    'original_prompt': user_context.get('original_prompt', '')
+                },
+                'error': error_msg
+            }
+        }
+
+    @staticmethod
+    def _error_response(error_msg: str) -> Dict:
+        return {
+            'status_code': 500,
+            'display_text': "I apologize, but I'm having trouble analyzing the air quality data right now. Please try again in a moment.",
+            'metadata': {
+                'status': 'error',
+                'error': error_msg
+            }
+        }
+
+    @timed('llm_analysis')
+    def _generate_analysis(self, predictions: Dict, user_context: Dict) -> Dict:
+        """Ask the model to analyze the predictions; raises JSONDecodeError on a malformed reply"""
+        response = self.model.generate_content(self._analysis_prompt(predictions, user_context))
+        return self._parse_analysis(response.text)
+
+    def _analysis_prompt(self, predictions: Dict, user_context: Dict) -> str:
+        # Use AI to analyze predictions and generate response
+        return f"""You are an expert air quality analyst. Analyze the provided data and user context to generate a comprehensive response.
 
 USER QUERY: {user_context.get('original_prompt', 'Unknown query')}
 
@@ -82,7 +334,7 @@ EXTRACTED CONTEXT:
 - Query Intent: {user_context.get('query_intent', 'analysis')}
 
 AIR QUALITY DATA:
-{json.dumps(converted_predictions, indent=2)}
+{dumps(predictions, indent=True)}
 
 Generate a response that:
 1. Directly addresses the user's specific query and location
@@ -115,95 +367,28 @@ Example format:
 }}
 
 Now generate your response:"""
-            
-            response = self.model.generate_content(analysis_prompt)
-            
-            # Clean and validate the response
-            response_text = response.text.strip()
-            logger.info(f"Raw AI response: {response_text}")
-            
-            # Remove any markdown formatting if present
-            if response_text.startswith('```json'):
-                response_text = response_text[7:]  # Remove ```json
-            if response_text.endswith('```'):
-                response_text = response_text[:-3]  # Remove ```
-            
-            response_text = response_text.strip()
-            
-            # Validate JSON
-            if not response_text:
-                raise ValueError("Empty response from AI model")
-            
-            analysis_result = json.loads(response_text)
-            
-            # Build dashboard details
-            dashboard_details = self.build_dashboard_details(
-                predictions=converted_predictions,
-                location=user_context.get('location', 'Unknown'),
-                suggested_vis=analysis_result.get('suggested_visualizations', []),
-                latitude=lat,
-                longitude=lon,
-                location_name=location_name
-            )
 
-            return {
-                'status_code': analysis_result.get('status_code', 200),
-                'display_text': analysis_result.get('display_text', 'Analysis completed'),
-                'metadata': {
-                    'status': 'success',
-                    'analysis': {
-                        'results': analysis_result.get('analysis_results', {}),
-                        'recommendations': analysis_result.get('recommendations', []),
-                        'suggested_visualizations': analysis_result.get('suggested_visualizations', [])
-                    },
-                    'context': {
-                        'analyzed_parameters': list(analysis_result.get('analysis_results', {}).keys()),
-                        'context_type': user_context.get('context_type', 'general'),
-                        'analysis_depth': user_context.get('analysis_depth', 'brief'),
-                        'original_prompt': user_context.get('original_prompt', '')
-                    }
-                },
-                'dashboard_details': dashboard_details
-            }
-            
-        except json.JSONDecodeError as e:
-            error_msg = f"JSON parsing error: {str(e)}"
-            logger.error(f"Error parsing AI response: {error_msg}")
-            
-            # Fallback response
-            return {
-                'status_code': 200,
-                'display_text': f"Based on the air quality data for {user_context.get('location', 'your location')}, the current AQI is {predictions.get('air_quality', {}).get('aqi', 'unknown')}. Please check the detailed analysis results for more information.",
-                'metadata': {
-                    'status': 'partial_success',
-                    'analysis': {
-                        'results': {},
-                        'recommendations': ['Check local air quality updates regularly'],
-                        'suggested_visualizations': ['aqi_gauge', 'daily_forecast']
-                    },
-                    'context': {
-                        'analyzed_parameters': [],
-                        'context_type': user_context.get('context_type', 'general'),
-                        'analysis_depth': user_context.get('analysis_depth', 'brief'),
-                        'original_prompt': user_context.get('original_prompt', '')
-                    },
-                    'error': error_msg
-                }
-            }
-            
-        except Exception as e:
-            error_msg = str(e)
-            logger.error(f"Error in AI analysis: {error_msg}")
-            
-            return {
-                'status_code': 500,
-                'display_text': "I apologize, but I'm having trouble analyzing the air quality data right now. Please try again in a moment.",
-                'metadata': {
-                    'status': 'error',
-                    'error': error_msg
-                }
-            }
+    @staticmethod
+    def _parse_analysis(response_text: str) -> Dict:
+        # Clean and validate the response
+        response_text = response_text.strip()
+        logger.debug("Raw AI response: %s", Payload(response_text), extra=SAMPLED)
+        
+        # Remove any markdown formatting if present
+        if response_text.startswith('```json'):
+            response_text = response_text[7:]  # Remove ```json
+        if response_text.endswith('```'):
+            response_text = response_text[:-3]  # Remove ```
+        
+        response_text = response_text.strip()
+        
+        # Validate JSON
+        if not response_text:
+            raise ValueError("Empty response from AI model")
+        
+        return json.loads(response_text)
 
+    @timed('dashboard')
     def build_dashboard_details(self, predictions: Dict, location: str, suggested_vis: List[str], latitude: float, longitude: float, location_name: str) -> Dict:
         """
         Build the dashboard details from predictions and visualization suggestions
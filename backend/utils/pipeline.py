@@ -0,0 +1,283 @@
+"""
+Query pipeline for AuraCast
+Runs /api/extract-parameters as concurrent stages (parameter extraction,
+geocoding, prediction, analysis) on a shared thread pool. When the
+rule-based extractor is confident in its location guess, geocoding starts on
+it speculatively while the full extraction is still running. Every stage has
+its own timeout, and stage timings are returned in ``metadata['timings']``.
+AsyncQueryPipeline runs the same stages on an asyncio event loop (asgi.py).
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .geocoding import normalize_location_name
+from .metrics import timed
+from .query_extractor import resolve_datetime
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', 32))
+
+# Seconds each stage may take before the request gives up on it
+STAGE_TIMEOUTS = {
+    'extraction': float(os.getenv('EXTRACTION_TIMEOUT_SECONDS', 20)),
+    'geocoding': float(os.getenv('GEOCODING_TIMEOUT_SECONDS', 12)),
+    'prediction': float(os.getenv('PREDICTION_TIMEOUT_SECONDS', 5)),
+    'analysis': float(os.getenv('ANALYSIS_TIMEOUT_SECONDS', 30)),
+}
+
+# Used when a location can't be geocoded
+DEFAULT_LOCATION = (40.7128, -74.0060, "New York")
+
+NO_LOCATION_MESSAGE = "I couldn't find a location in your request. Could you please mention which area you'd like to know about? For example: 'How is the air quality in Dublin?' or 'What's the pollution level in Galway?'"
+
+
+class StageTimeout(Exception):
+    """A pipeline stage did not finish within its timeout"""
+
+    def __init__(self, stage: str, timeout: float):
+        super().__init__(f"{stage} did not finish within {timeout:g}s")
+        self.stage = stage
+
+
+class QueryPipeline:
+    """Concurrent extraction -> geocoding -> prediction -> analysis for one prompt"""
+
+    def __init__(self, input_agent, output_agent, geocoder, predictor,
+                 timeouts: Optional[Dict[str, float]] = None, max_workers: int = PIPELINE_WORKERS):
+        self.input_agent = input_agent
+        self.output_agent = output_agent
+        self.geocoder = geocoder
+        self.predictor = predictor
+        self.timeouts = dict(STAGE_TIMEOUTS, **(timeouts or {}))
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pipeline')
+
+    # ------------------------------------------------------------------ stages
+
+    def locate(self, location_name: str) -> Tuple[float, float, str]:
+        """Coordinates and display name for a location (New York if it can't be found)"""
+        coords = self.geocoder.geocode(location_name)
+        if coords:
+            logger.info("Coordinates found: %s, %s", coords['lat'], coords['lon'])
+            return coords['lat'], coords['lon'], coords['display_name']
+        logger.warning("Could not geocode location: %s, using default coordinates", location_name)
+        return DEFAULT_LOCATION
+
+    def predict(self, lat: float, lon: float, datetime_str: str) -> Dict[str, Any]:
+        # numpy values are kept as-is; responses round them when serialized
+        with timed('prediction'):
+            return self.predictor.predict_comprehensive(lat, lon, datetime_str)
+
+    # ------------------------------------------------------------------ running
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        """Run ``fn`` on the pool with the caller's context (Flask's app context included)"""
+        context = contextvars.copy_context()
+
+        def timed():
+            started = time.perf_counter()
+            result = context.run(fn, *args)
+            return result, (time.perf_counter() - started) * 1000
+
+        return self.executor.submit(timed)
+
+    def _wait(self, stage: str, future: Future, timings: Dict[str, Any]) -> Any:
+        try:
+            result, elapsed_ms = future.result(timeout=self.timeouts[stage])
+        except FutureTimeout:
+            timings[stage] = round(self.timeouts[stage] * 1000, 1)
+            raise StageTimeout(stage, self.timeouts[stage])
+        timings[stage] = round(elapsed_ms, 1)
+        return result
+
+    def run(self, prompt: str) -> Tuple[Dict[str, Any], int]:
+        """Answer a prompt; returns the /api/extract-parameters response and its status code"""
+        started = time.perf_counter()
+        timings: Dict[str, Any] = {}
+        metadata: Dict[str, Any] = {}
+        try:
+            response = self._run(prompt, timings, metadata)
+        except StageTimeout as e:
+            logger.error(f"Pipeline stage timed out: {e}")
+            response = {
+                'status_code': 504,
+                'display_text': "This is taking longer than usual. Please try again in a moment.",
+                'metadata': {
+                    'status': 'error',
+                    'error': str(e),
+                    'stage': e.stage
+                }
+            }
+        timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+        response.setdefault('metadata', {}).update(metadata, timings=timings)
+        return response, response.get('status_code', 200)
+
+    def _speculative_location(self, prompt: str) -> Optional[str]:
+        """The rule-based extractor's location, if it is confident enough to geocode ahead of extraction
+
+        A low-confidence guess (a typo match, a dropped qualifier) is likely to
+        be wrong and would spend a Nominatim lookup from the shared budget.
+        """
+        extractor = self.input_agent.query_extractor
+        guess, confidence = extractor.extract(prompt)
+        return guess.get('location') if confidence >= extractor.min_confidence else None
+
+    def _run(self, prompt: str, timings: Dict[str, Any], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        # Start geocoding the rule-based extractor's location guess while the
+        # full extraction runs
+        guessed_location = self._speculative_location(prompt)
+        speculative = self._submit(self.locate, guessed_location) if guessed_location else None
+
+        extracted_params = self._wait('extraction', self._submit(self.input_agent.extract_parameters, prompt), timings)
+        extracted_params['original_prompt'] = prompt
+
+        location_name = extracted_params.get('location')  # Don't provide default
+        if not location_name:
+            logger.error("No location found in prompt")
+            return {
+                'status_code': 400,
+                'display_text': NO_LOCATION_MESSAGE,
+                'metadata': {
+                    'status': 'error',
+                    'error': 'Location missing in prompt'
+                }
+            }
+
+        datetime_str = extracted_params.get('datetime') or resolve_datetime(None)
+        logger.info("Location: %s, DateTime: %s", location_name, datetime_str)
+
+        if speculative is not None and normalize_location_name(location_name) == normalize_location_name(guessed_location):
+            located = speculative
+            metadata['geocoding_speculative'] = True
+        else:
+            located = self._submit(self.locate, location_name)
+        lat, lon, display_name = self._wait('geocoding', located, timings)
+
+        predictions = self._wait('prediction', self._submit(self.predict, lat, lon, datetime_str), timings)
+
+        analysis = self._submit(self.output_agent.analyze_predictions,
+                                predictions, extracted_params, lat, lon, display_name)
+        try:
+            return self._wait('analysis', analysis, timings)
+        except StageTimeout as e:
+            # The predictions are still worth returning without the written analysis
+            logger.error(f"Analysis timed out: {e}")
+            return self.output_agent.fallback_response(predictions, extracted_params, str(e))
+
+
+class AsyncQueryPipeline(QueryPipeline):
+    """QueryPipeline for asyncio callers
+
+    Extraction, geocoding and analysis are awaited, so a request waiting on
+    Gemini or Nominatim holds no thread; only the CPU-bound prediction runs
+    on the thread pool.
+    """
+
+    async def locate_async(self, location_name: str) -> Tuple[float, float, str]:
+        coords = await self.geocoder.geocode_async(location_name)
+        if coords:
+            logger.info("Coordinates found: %s, %s", coords['lat'], coords['lon'])
+            return coords['lat'], coords['lon'], coords['display_name']
+        logger.warning("Could not geocode location: %s, using default coordinates", location_name)
+        return DEFAULT_LOCATION
+
+    async def predict_async(self, lat: float, lon: float, datetime_str: str) -> Dict[str, Any]:
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, functools.partial(context.run, self.predict, lat, lon, datetime_str)
+        )
+
+    @staticmethod
+    def _start(coro) -> asyncio.Task:
+        """Run ``coro`` as a task that returns (result, elapsed ms)"""
+        async def timed():
+            started = time.perf_counter()
+            result = await coro
+            return result, (time.perf_counter() - started) * 1000
+
+        return asyncio.ensure_future(timed())
+
+    async def _wait_async(self, stage: str, task: asyncio.Task, timings: Dict[str, Any]) -> Any:
+        try:
+            result, elapsed_ms = await asyncio.wait_for(task, self.timeouts[stage])
+        except asyncio.TimeoutError:
+            timings[stage] = round(self.timeouts[stage] * 1000, 1)
+            raise StageTimeout(stage, self.timeouts[stage])
+        timings[stage] = round(elapsed_ms, 1)
+        return result
+
+    async def run_async(self, prompt: str) -> Tuple[Dict[str, Any], int]:
+        """run() for asyncio callers"""
+        started = time.perf_counter()
+        timings: Dict[str, Any] = {}
+        metadata: Dict[str, Any] = {}
+        try:
+            response = await self._run_async(prompt, timings, metadata)
+        except StageTimeout as e:
+            logger.error(f"Pipeline stage timed out: {e}")
+            response = {
+                'status_code': 504,
+                'display_text': "This is taking longer than usual. Please try again in a moment.",
+                'metadata': {
+                    'status': 'error',
+                    'error': str(e),
+                    'stage': e.stage
+                }
+            }
+        timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+        response.setdefault('metadata', {}).update(metadata, timings=timings)
+        return response, response.get('status_code', 200)
+
+    async def _run_async(self, prompt: str, timings: Dict[str, Any], metadata: Dict[str, Any]) -> Dict[str, Any]:
+        guessed_location = self._speculative_location(prompt)
+        speculative = self._start(self.locate_async(guessed_location)) if guessed_location else None
+
+        try:
+            extracted_params = await self._wait_async(
+                'extraction', self._start(self.input_agent.extract_parameters_async(prompt)), timings
+            )
+            extracted_params['original_prompt'] = prompt
+
+            location_name = extracted_params.get('location')
+            if not location_name:
+                logger.error("No location found in prompt")
+                return {
+                    'status_code': 400,
+                    'display_text': NO_LOCATION_MESSAGE,
+                    'metadata': {
+                        'status': 'error',
+                        'error': 'Location missing in prompt'
+                    }
+                }
+
+            datetime_str = extracted_params.get('datetime') or resolve_datetime(None)
+            logger.info("Location: %s, DateTime: %s", location_name, datetime_str)
+
+            if speculative is not None and normalize_location_name(location_name) == normalize_location_name(guessed_location):
+                located = speculative
+                metadata['geocoding_speculative'] = True
+            else:
+                located = self._start(self.locate_async(location_name))
+            lat, lon, display_name = await self._wait_async('geocoding', located, timings)
+        finally:
+            # An unused guess still fills the geocoding cache: the Nominatim lookup itself isn't cancelled
+            if speculative is not None and not speculative.done():
+                speculative.cancel()
+
+        predictions = await self._wait_async('prediction', self._start(self.predict_async(lat, lon, datetime_str)), timings)
+
+        analysis = self._start(self.output_agent.analyze_predictions_async(
+            predictions, extracted_params, lat, lon, display_name
+        ))
+        try:
+            return await self._wait_async('analysis', analysis, timings)
+        except StageTimeout as e:
+            logger.error(f"Analysis timed out: {e}")
+            return self.output_agent.fallback_response(predictions, extracted_params, str(e))
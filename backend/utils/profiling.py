@@ -0,0 +1,227 @@
+"""
+Profiling for AuraCast
+Opt-in profiles of single requests (cProfile, or a stack sampler that also
+sees the pipeline worker threads) and time-boxed sampling profiles of the
+whole process, monitoring threads included. Sampled profiles are written in
+collapsed-stack format ("thread;outer;inner count" per line) for flamegraph.pl
+or speedscope; cProfile profiles as pstats dumps. Everything is gated by
+ADMIN_TOKEN and off when it is unset.
+"""
+
+import cProfile
+import hmac
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+PROFILE_DIR = os.getenv(
+    'PROFILE_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'profiles')
+)
+
+PROFILE_MODES = ('cprofile', 'sample')
+SAMPLE_INTERVAL_SECONDS = 0.005
+MAX_PROCESS_PROFILE_SECONDS = 300
+MAX_STACK_DEPTH = 128
+
+_PROFILE_NAME = re.compile(r'^[\w.-]+$')
+
+
+def admin_token_valid(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stacks of selected threads every ``interval`` seconds into collapsed-stack counts"""
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL_SECONDS,
+                 thread_filter: Optional[Callable[[threading.Thread], bool]] = None,
+                 max_seconds: Optional[float] = None):
+        self.interval = interval
+        self.thread_filter = thread_filter
+        self.max_seconds = max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        self.started_at = time.time()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> 'StackSampler':
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = self.started_at + self.max_seconds if self.max_seconds else None
+        while not self._stop.wait(self.interval):
+            threads = {t.ident: t for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                thread = threads.get(thread_id)
+                if thread_id == own_id or thread is None or thread.name.startswith('stack-sampler'):
+                    continue
+                if self.thread_filter is not None and not self.thread_filter(thread):
+                    continue
+                self.stacks[self._collapse(thread, frame)] += 1
+            self.samples += 1
+            if deadline is not None and time.time() >= deadline:
+                break
+        self.stopped_at = time.time()
+
+    @staticmethod
+    def _collapse(thread: threading.Thread, frame) -> str:
+        labels = []
+        while frame is not None and len(labels) < MAX_STACK_DEPTH:
+            labels.append(_frame_label(frame))
+            frame = frame.f_back
+        # Group pool threads ("ThreadPoolExecutor-0_3") by pool
+        name = re.sub(r'_\d+$', '', thread.name)
+        return ';'.join([name] + labels[::-1])
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """One request run under cProfile or the stack sampler"""
+
+    def __init__(self, mode: str):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode '{mode}'. Must be one of: {', '.join(PROFILE_MODES)}")
+        self.mode = mode
+        self.profile_id = f"request-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+
+    def start(self):
+        if self.mode == 'cprofile':
+            # Deterministic, but only sees the request thread (pipeline stages show up as waits)
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            request_thread = threading.current_thread()
+            self._sampler = StackSampler(
+                thread_filter=lambda t: t is request_thread or t.name.startswith('pipeline')
+            )
+            self._sampler.start()
+
+    def stop(self) -> str:
+        """Stop profiling and store the result; returns the profile file name"""
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        if self._profiler is not None:
+            self._profiler.disable()
+            name = f"{self.profile_id}.prof"
+            self._profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+        else:
+            name = f"{self.profile_id}.collapsed"
+            with open(os.path.join(PROFILE_DIR, name), 'w') as f:
+                f.write(self._sampler.stop().collapsed())
+        logger.info(f"Request profile written to {name}")
+        return name
+
+
+class ProcessProfiler:
+    """At most one time-boxed whole-process sampling profile at a time"""
+
+    def __init__(self):
+        self._sampler: Optional[StackSampler] = None
+        self._profile_id: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def start(self, seconds: float, interval: float = SAMPLE_INTERVAL_SECONDS) -> Dict[str, Any]:
+        seconds = min(max(float(seconds), 0.1), MAX_PROCESS_PROFILE_SECONDS)
+        with self._lock:
+            if self._sampler is not None and self._sampler.running:
+                raise RuntimeError("A process profile is already running")
+            self._profile_id = f"process-{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+            self._sampler = StackSampler(interval=interval, max_seconds=seconds)
+            self._sampler.start()
+        # Write the profile when the time box ends even if nobody calls stop()
+        timer = threading.Timer(seconds + interval * 2, self._finish, args=(self._sampler,))
+        timer.name, timer.daemon = 'stack-sampler-timer', True
+        timer.start()
+        logger.info(f"Process profile {self._profile_id} started for {seconds:g}s")
+        return {'profile_id': self._profile_id, 'seconds': seconds, 'interval': interval}
+
+    def stop(self) -> Dict[str, Any]:
+        with self._lock:
+            sampler = self._sampler
+        if sampler is None:
+            raise RuntimeError("No process profile has been started")
+        return self._finish(sampler)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            sampler, profile_id = self._sampler, self._profile_id
+        if sampler is None:
+            return {'running': False}
+        return {
+            'running': sampler.running,
+            'profile_id': profile_id,
+            'samples': sampler.samples,
+            'elapsed_seconds': round((sampler.stopped_at or time.time()) - sampler.started_at, 1)
+        }
+
+    def _finish(self, sampler: StackSampler) -> Dict[str, Any]:
+        with self._lock:
+            if sampler is not self._sampler:
+                return {'running': False}
+            profile_id = self._profile_id
+            name = f"{profile_id}.collapsed"
+            path = os.path.join(PROFILE_DIR, name)
+            if not os.path.exists(path):
+                sampler.stop()
+                os.makedirs(PROFILE_DIR, exist_ok=True)
+                with open(path, 'w') as f:
+                    f.write(sampler.collapsed())
+                logger.info(f"Process profile written to {name} ({sampler.samples} samples)")
+        return {'running': False, 'profile_id': profile_id, 'file': name, 'samples': sampler.samples}
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in sorted(os.listdir(PROFILE_DIR), reverse=True):
+        path = os.path.join(PROFILE_DIR, name)
+        profiles.append({'file': name, 'bytes': os.path.getsize(path),
+                         'created': datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec='seconds')})
+    return profiles
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Path of a stored profile, or None for unknown or unsafe names"""
+    if not _PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+# Global process profiler instance
+process_profiler = ProcessProfiler()
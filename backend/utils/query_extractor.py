@@ -0,0 +1,296 @@
+"""
+Rule-based query extraction for AuraCast
+Resolves location, time, context type and intent from keywords and the
+offline gazetteer, with a confidence score. Most queries look like
+"air quality in <city> tomorrow morning" and are answered here without a
+Gemini round trip; anything the rules are unsure about goes to the LLM.
+"""
+
+import os
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from .gazetteer import Place, gazetteer
+from .time_parser import TimeParser
+
+# Queries scoring below this are sent to the LLM instead
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv('FAST_PATH_MIN_CONFIDENCE', 0.75))
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_DAY = r'(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon|tue|wed|thu|fri|sat|sun)'
+_MONTH = (r'(?:january|february|march|april|may|june|july|august|september|october|november|december'
+          r'|jan|feb|mar|apr|jun|jul|aug|sep|oct|nov|dec)')
+
+# Time expressions, in the forms TimeParser understands. Bare numbers are not
+# times here ("PM2.5", "AQI 50"); a clock time needs am/pm or a colon.
+TIME_EXPRESSION = re.compile(
+    r'\b(?:'
+    r'right now|now|currently|at the moment'
+    r'|today|tomorrow|yesterday|tonight'
+    rf'|(?:next|this) (?:{_DAY}|week|weekend|month)|(?:on )?{_DAY}'
+    r'|in \d+ (?:hours?|minutes?|days?)'
+    r'|(?:in the |this )?(?:morning|afternoon|evening|night)'
+    r'|(?:at )?\d{1,2}(?::\d{2})? ?(?:am|pm)|(?:at )?\d{1,2}:\d{2}'
+    rf'|{_MONTH} \d{{1,2}}(?:st|nd|rd|th)?'
+    r'|\d{1,2}[/-]\d{1,2}(?:[/-]\d{2,4})?'
+    r')\b'
+)
+
+# Descriptors TimeParser has no rule for, rewritten into ones it does
+TIME_ALIASES = (
+    (re.compile(r'\btonight\b'), 'today night'),
+    (re.compile(r'\b(?:this|next) weekend\b'), 'next saturday'),
+    (re.compile(r'\bnext week\b'), 'in 7 days'),
+    (re.compile(rf'\b(?:on )?(?<!next )(?<!this )({_DAY})\b'), r'next \1'),
+)
+NOW_WORDS = ('right now', 'now', 'currently', 'at the moment')
+
+# Keyword rules mirroring the LLM extraction prompt, checked in this order
+CONTEXT_KEYWORDS = (
+    ('industrial', ('industrial', 'industry', 'factory', 'factories', 'manufacturing', 'plant')),
+    ('health', ('asthma', 'asthmatic', 'respiratory', 'health', 'breathing', 'lungs', 'copd', 'allergy', 'allergies')),
+    ('outdoor_activity', ('outdoor', 'outdoors', 'outside', 'exercise', 'sports', 'sport', 'run', 'running', 'jog',
+                          'jogging', 'cycle', 'cycling', 'bike', 'hike', 'hiking', 'walk', 'walking', 'picnic')),
+    ('traffic', ('traffic', 'highway', 'road', 'roads', 'commute', 'commuting', 'motorway', 'driving')),
+    ('residential', ('residential', 'home', 'neighbourhood', 'neighborhood')),
+)
+SPECIAL_CONCERNS = {
+    'asthma': 'asthma', 'asthmatic': 'asthma',
+    'copd': 'COPD',
+    'allergy': 'allergies', 'allergies': 'allergies', 'pollen': 'allergies',
+    'child': 'children', 'children': 'children', 'kids': 'children', 'kid': 'children', 'baby': 'children',
+    'elderly': 'elderly', 'senior': 'elderly', 'seniors': 'elderly',
+    'pregnant': 'pregnancy', 'pregnancy': 'pregnancy',
+    'heart': 'heart condition',
+}
+DETAILED_WORDS = ('detailed', 'detail', 'details', 'depth', 'explain', 'comprehensive', 'breakdown', 'why')
+DETAILED_TIMES = ('today', 'this week', 'this month')
+BRIEF_WORDS = ('quick', 'brief', 'briefly', 'short', 'summary')
+ANALYSIS_WORDS = ('understand', 'analyze', 'analyse', 'analysis', 'source', 'sources', 'cause', 'causes', 'why')
+FORECAST_WORDS = ('forecast', 'prediction', 'predict', 'expected', 'will')
+# Words that mark a question about more than one place, which only the LLM answers
+COMPARISON_WORDS = ('vs', 'versus', 'or', 'than', 'compare', 'compared', 'comparing', 'comparison')
+
+# Words after which a place name is expected (the last few catch second places
+# in comparisons)
+LOCATION_PREPOSITIONS = ('in', 'at', 'for', 'near', 'around', 'across', 'over', 'of',
+                         'from', 'to', 'between', 'and', 'or', 'vs', 'versus')
+
+# Ordinary words in air quality questions. Anything else outside the location
+# and time is something the rules don't understand and lowers the confidence.
+VOCABULARY = frozenset("""
+a an the is are was were be been it its it's this that these those there what what's whats how how's hows
+which when where who will would should could can do does did i i'm me my we our you your they their
+to of in at on for near around across over from by with about and or but if so than then like
+any some much many more most less very too also just still currently right now today tomorrow tonight
+please tell show give get check know let see find want need going go
+air quality aqi pollution polluted pollutant pollutants pollen smog haze smoke dust level levels index
+pm pm2.5 pm25 pm10 no2 o3 so2 co ozone nitrogen dioxide particulate particulates particles matter
+weather conditions condition forecast forecasts prediction predictions predict expected expect outlook
+good bad safe unsafe healthy unhealthy clean dirty high low poor fair moderate okay ok fine risk risky
+city town area region place outdoors outside inside indoors day week weekend month time
+current latest update report reading readings status situation looking look
+""".split())
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9'.]*")
+_BREAK = re.compile(r"[.?!;:()\"\n]")
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical form of a query for caching ("AQI in Dublin?" -> "aqi in dublin")
+
+    Time words are kept as written, so a cached "tomorrow" still means the
+    day after whichever day the prompt is asked.
+    """
+    text = unicodedata.normalize('NFKC', prompt).casefold()
+    return _WHITESPACE.sub(' ', _PUNCTUATION.sub(' ', text)).strip()
+
+
+def resolve_datetime(time_descriptor: Optional[str],
+                     reference_time: Optional[datetime] = None) -> str:
+    """Prediction timestamp for a time descriptor (now when there is none)"""
+    reference_time = reference_time or datetime.now()
+    descriptor = (time_descriptor or '').lower().strip()
+    if not descriptor or descriptor in NOW_WORDS:
+        return reference_time.strftime(DATETIME_FORMAT)
+    for pattern, replacement in TIME_ALIASES:
+        descriptor = pattern.sub(replacement, descriptor)
+    parsed = TimeParser().parse_time(descriptor, reference_time)
+    return (parsed or reference_time).strftime(DATETIME_FORMAT)
+
+
+def _words(text: str) -> List[str]:
+    return [w.rstrip('.') for w in _WORD.findall(text)]
+
+
+def _first_match(words: set, keywords) -> bool:
+    return any(k in words for k in keywords)
+
+
+class QueryExtractor:
+    """Keyword and gazetteer based parameter extraction with a confidence score"""
+
+    def __init__(self, min_confidence: float = FAST_PATH_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+
+    def extract(self, prompt: str) -> Tuple[Dict[str, Any], float]:
+        """Extracted parameters (same fields as the LLM returns) and a 0-1 confidence"""
+        lowered = prompt.lower()
+
+        time_spans = [m.span() for m in TIME_EXPRESSION.finditer(lowered)]
+        time_descriptor = ' '.join(lowered[s:e] for s, e in time_spans) or None
+
+        # Blank out time expressions so "in 3 hours" is not read as a place
+        masked = list(prompt)
+        for start, end in time_spans:
+            masked[start:end] = ';' * (end - start)
+        masked = ''.join(masked)
+
+        location, location_score, location_span, others = self._find_location(masked)
+
+        # Keywords are read from whatever is neither the place nor a time
+        remainder = lowered
+        for start, end in time_spans + ([location_span] if location_span else []):
+            remainder = remainder[:start] + ' ' * (end - start) + remainder[end:]
+        words = _words(remainder)
+        word_set = set(words)
+
+        params = {
+            'location': location,
+            'time_descriptor': time_descriptor,
+            'context_type': self._context_type(word_set),
+            'analysis_depth': self._analysis_depth(word_set, time_descriptor),
+            'special_concerns': sorted({SPECIAL_CONCERNS[w] for w in words if w in SPECIAL_CONCERNS}),
+            'query_intent': self._query_intent(word_set, time_descriptor)
+        }
+
+        confidence = location_score
+        if others or _first_match(word_set, COMPARISON_WORDS):
+            confidence *= 0.5  # comparisons between places need the LLM
+        unknown = [w for w in words if not self._known(w)]
+        confidence -= 0.1 * max(0, len(unknown) - 2)
+        return params, round(max(0.0, confidence), 2)
+
+    # ------------------------------------------------------------------ location
+
+    def _find_location(self, masked: str) -> Tuple[Optional[str], float, Optional[Tuple[int, int]], int]:
+        """(location text, score, span in the prompt, number of other places named)"""
+        found: List[Tuple[str, float, Tuple[int, int], Place]] = []
+
+        # "... in <place> ..." is by far the most common phrasing
+        preposition = re.compile(r'\b(?:%s)\s+(?:the\s+)?' % '|'.join(LOCATION_PREPOSITIONS), re.IGNORECASE)
+        for match in preposition.finditer(masked):
+            chunk_end = _BREAK.search(masked, match.end())
+            chunk = masked[match.end():chunk_end.start() if chunk_end else len(masked)]
+            hit = self._match_span(chunk, match.end(), allow_fuzzy=True)
+            if hit:
+                found.append(hit)
+
+        # Places named on their own ("Dublin air quality", "Dublin vs Cork"): the
+        # location if no preposition matched, else other places in a comparison
+        for token in re.finditer(r"[^\W\d_][\w'-]*", masked):
+            if any(start <= token.start() < end for _, _, (start, end), _ in found):
+                continue
+            if found and (not token.group()[0].isupper() or self._known(token.group().lower())):
+                continue
+            hit = self._match_span(masked[token.start():], token.start(), allow_fuzzy=False, score=0.85)
+            if hit:
+                found.append(hit)
+
+        if not found:
+            return None, 0.0, None, 0
+
+        text, score, span, place = found[0]
+        others = len({(p.lat, p.lon) for _, _, _, p in found[1:]} - {(place.lat, place.lon)})
+        return text, score, span, others
+
+    def _match_span(self, chunk: str, offset: int, allow_fuzzy: bool,
+                    score: float = 1.0) -> Optional[Tuple[str, float, Tuple[int, int], Place]]:
+        """Longest run of words at the start of ``chunk`` naming a place"""
+        tokens = list(re.finditer(r"[^\W\d_][\w'-]*|,", chunk))
+        words = []
+        for token in tokens[:6]:
+            if token.group() != ',' and token.group().lower() in ('and', 'or', 'with', 'to', 'on', 'during'):
+                break
+            words.append(token)
+        while words and words[-1].group() == ',':
+            words.pop()
+
+        for size in range(len(words), 0, -1):
+            span = words[:size]
+            if span[-1].group() == ',':
+                continue
+            text = chunk[span[0].start():span[-1].end()]
+            if not self._plausible_name(text):
+                continue
+            place = gazetteer.lookup(text, fuzzy=False)
+            if place:
+                span_score = score if text[0].isupper() else score - 0.15
+                text = text.title() if text.islower() else text
+                # "Springfield, IL" unresolved: the bare name may be a different place
+                if self._unresolved_qualifier(words, size):
+                    span_score = min(span_score, self.min_confidence - 0.1)
+                return text, span_score, (offset + span[0].start(), offset + span[-1].end()), place
+
+        # One typo in a short place name ("Dubln") is still taken as the location,
+        # but only the LLM can tell a typo from a place the gazetteer doesn't know
+        if allow_fuzzy and words and len(words) <= 3:
+            text = chunk[words[0].start():words[-1].end()]
+            if self._plausible_name(text):
+                place = gazetteer.lookup(text)
+                if place:
+                    return text, min(score - 0.2, self.min_confidence - 0.1), \
+                        (offset + words[0].start(), offset + words[-1].end()), place
+        return None
+
+    def _unresolved_qualifier(self, words: List[re.Match], size: int) -> bool:
+        """True if the matched name is followed by ", <word>" that isn't ordinary text"""
+        if len(words) < size + 2 or words[size].group() != ',':
+            return False
+        return not self._known(words[size + 1].group().lower())
+
+    def _plausible_name(self, text: str) -> bool:
+        """Lowercase runs of ordinary words ("for health") are not taken as place names"""
+        if text[:1].isupper():
+            return True
+        return not all(self._known(w) for w in _words(text))
+
+    # ------------------------------------------------------------------ keywords
+
+    @staticmethod
+    def _known(word: str) -> bool:
+        if word in VOCABULARY or word in SPECIAL_CONCERNS or word.replace('.', '').isdigit():
+            return True
+        if word in DETAILED_WORDS or word in BRIEF_WORDS or word in ANALYSIS_WORDS or word in FORECAST_WORDS:
+            return True
+        return any(word in keywords for _, keywords in CONTEXT_KEYWORDS)
+
+    @staticmethod
+    def _context_type(words: set) -> str:
+        for context_type, keywords in CONTEXT_KEYWORDS:
+            if _first_match(words, keywords):
+                return context_type
+        return 'general'
+
+    @staticmethod
+    def _analysis_depth(words: set, time_descriptor: Optional[str]) -> str:
+        if _first_match(words, BRIEF_WORDS):
+            return 'brief'
+        if _first_match(words, DETAILED_WORDS) or any(t in (time_descriptor or '') for t in DETAILED_TIMES):
+            return 'detailed'
+        return 'brief'
+
+    @staticmethod
+    def _query_intent(words: set, time_descriptor: Optional[str]) -> str:
+        if _first_match(words, ANALYSIS_WORDS):
+            return 'analysis'
+        if _first_match(words, FORECAST_WORDS):
+            return 'forecast'
+        if time_descriptor and not any(time_descriptor.strip() == w for w in NOW_WORDS):
+            return 'forecast'
+        return 'current_conditions'
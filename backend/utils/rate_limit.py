@@ -0,0 +1,117 @@
+"""
+Rate limiting for AuraCast
+Token buckets for outbound API politeness: an in-process bucket, and one
+stored in the shared SQLite file so every worker process draws from the
+same budget.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from .caching import DEFAULT_CACHE_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Thread-safe token bucket: ``rate`` tokens per second, bursts up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Take a token if one is available; otherwise return seconds until one is"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def try_acquire(self) -> bool:
+        return self._take() == 0.0
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Block until a token is available (or ``timeout`` seconds pass)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self._take()
+            if wait == 0.0:
+                return True
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket whose state lives in SQLite, shared by every process using ``path``
+
+    Falls back to in-process limiting if the database cannot be used.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: float = 1.0, path: Optional[str] = None):
+        super().__init__(rate, capacity)
+        self.name = name
+        self.path = path or DEFAULT_CACHE_PATH
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS rate_limits ('
+                ' name TEXT PRIMARY KEY,'
+                ' tokens REAL NOT NULL,'
+                ' updated_at REAL NOT NULL'
+                ')'
+            )
+            self._local.conn = conn
+        return conn
+
+    def _take(self) -> float:
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = conn.execute(
+                    'SELECT tokens, updated_at FROM rate_limits WHERE name = ?', (self.name,)
+                ).fetchone()
+                tokens = self.capacity if row is None else min(
+                    self.capacity, row[0] + max(0.0, now - row[1]) * self.rate
+                )
+                wait = 0.0
+                if tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait = (1 - tokens) / self.rate
+                conn.execute(
+                    'INSERT OR REPLACE INTO rate_limits (name, tokens, updated_at) VALUES (?, ?, ?)',
+                    (self.name, tokens, now)
+                )
+                conn.execute('COMMIT')
+                return wait
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        except sqlite3.Error as e:
+            logger.warning(f"Shared rate limiter unavailable ({self.name}), limiting per process: {e}")
+            return super()._take()
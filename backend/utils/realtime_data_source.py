@@ -10,10 +10,16 @@ from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import time
 import threading
+from .event_stream import event_broker, location_topic
+from .geocoding import geocoding_service
+from .station_catalog import OPENAQ_BASE_URL, StationCatalog
+from .metrics import record_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+OPENAQ_MEASUREMENTS_URL = f"{OPENAQ_BASE_URL}/v2/measurements"
+
 class RealtimeDataSource:
     """Real-time data source for alert monitoring"""
     
@@ -31,72 +37,113 @@ class RealtimeDataSource:
         self.location_cache_duration = 3600  # 1 hour for location details
         self.historical_cache_duration = 3600  # 1 hour for historical data
         
-        self.monitoring_locations = set()
+        # OpenAQ stations near each location, answered from a local spatial index
+        self.station_catalog = StationCatalog(self.openaq_api_key)
+        
+        self.monitoring_locations: Dict[str, int] = {}  # location -> number of add_monitoring_location calls
+        self.monitoring_thread = None
+        self._monitoring_lock = threading.Lock()
+        self.monitoring_interval_seconds = 60
+        self.last_monitoring_pass: Optional[float] = None  # time.time() when the last pass finished
+        self.event_broker = event_broker
+        self._async_client = None  # httpx.AsyncClient for the *_async methods
         
     def add_monitoring_location(self, location: str):
-        """Add a location to monitor for alerts"""
-        self.monitoring_locations.add(location.lower())
+        """Add a location to monitor for alerts (counted: each add needs its own remove)"""
+        key = location.lower()
+        with self._monitoring_lock:
+            self.monitoring_locations[key] = self.monitoring_locations.get(key, 0) + 1
         logger.info(f"Added monitoring location: {location}")
     
     def remove_monitoring_location(self, location: str):
-        """Remove a location from monitoring"""
-        self.monitoring_locations.discard(location.lower())
+        """Remove a location from monitoring once nothing else is monitoring it"""
+        key = location.lower()
+        with self._monitoring_lock:
+            remaining = self.monitoring_locations.get(key, 0) - 1
+            if remaining > 0:
+                self.monitoring_locations[key] = remaining
+                return
+            self.monitoring_locations.pop(key, None)
         logger.info(f"Removed monitoring location: {location}")
     
     def get_realtime_data(self, location: str) -> Optional[Dict[str, Any]]:
         """Get real-time air quality data for a location"""
         # Check cache first
-        cache_key = f"{location.lower()}_{datetime.now().strftime('%Y%m%d%H%M')}"
-        if cache_key in self.data_cache:
-            cached_data = self.data_cache[cache_key]
-            if datetime.now() - cached_data['timestamp'] < timedelta(seconds=self.cache_duration):
-                return cached_data['data']
+        cache_key, cached_data = self._cached_realtime_data(location)
+        if cached_data is not None:
+            return cached_data
         
         # Fetch fresh data
         try:
-            # Try OpenAQ first
-            data = self._fetch_openaq_data(location)
-            if data:
-                # Cache the data
-                self.data_cache[cache_key] = {
-                    'data': data,
-                    'timestamp': datetime.now()
-                }
-                return data
+            # Try OpenAQ first, fall back to simulated data for demo
+            data = self._fetch_openaq_data(location) or self._generate_simulated_data(location)
+            return self._store_realtime_data(cache_key, location, data)
             
-            # Fallback to simulated data for demo
-            data = self._generate_simulated_data(location)
-            self.data_cache[cache_key] = {
-                'data': data,
-                'timestamp': datetime.now()
-            }
-            return data
+        except Exception as e:
+            logger.error(f"Error fetching real-time data for {location}: {str(e)}")
+            return None
+    
+    async def get_realtime_data_async(self, location: str) -> Optional[Dict[str, Any]]:
+        """get_realtime_data for asyncio callers: OpenAQ and geocoding are awaited"""
+        cache_key, cached_data = self._cached_realtime_data(location)
+        if cached_data is not None:
+            return cached_data
+        
+        try:
+            data = await self._fetch_openaq_data_async(location) or self._generate_simulated_data(location)
+            return self._store_realtime_data(cache_key, location, data)
             
         except Exception as e:
             logger.error(f"Error fetching real-time data for {location}: {str(e)}")
             return None
     
+    def _cached_realtime_data(self, location: str):
+        """(cache key, cached data or None) for a location's current reading"""
+        cache_key = f"{location.lower()}_{datetime.now().strftime('%Y%m%d%H%M')}"
+        if cache_key in self.data_cache:
+            cached_data = self.data_cache[cache_key]
+            if datetime.now() - cached_data['timestamp'] < timedelta(seconds=self.data_cache_duration):
+                record_cache('realtime_data', True)
+                return cache_key, cached_data['data']
+        record_cache('realtime_data', False)
+        return cache_key, None
+    
+    def _store_realtime_data(self, cache_key: str, location: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        # Cache the data
+        self.data_cache[cache_key] = {
+            'data': data,
+            'timestamp': datetime.now()
+        }
+        
+        # Push the new reading to any streaming clients
+        self.event_broker.publish(location_topic(location), 'reading', data)
+        return data
+    
+    @staticmethod
+    def _openaq_params(coords: Dict[str, float]) -> Dict[str, Any]:
+        return {
+            'date_from': (datetime.now() - timedelta(hours=1)).isoformat() + 'Z',
+            'date_to': datetime.now().isoformat() + 'Z',
+            'coordinates': f"{coords['lat']},{coords['lon']}",
+            'radius': 10000,  # 10km radius
+            'parameter': 'pm25,o3,no2,co',
+            'limit': 100,
+            'order_by': 'datetime',
+            'sort': 'desc'
+        }
+    
     def _fetch_openaq_data(self, location: str) -> Optional[Dict[str, Any]]:
         """Fetch data from OpenAQ API"""
         try:
             # Use OpenAQ API v2
-            url = "https://api.openaq.org/v2/measurements"
+            url = OPENAQ_MEASUREMENTS_URL
             
             # Get coordinates for the location (simplified - in real app, use geocoding)
             coords = self._get_location_coordinates(location)
             if not coords:
                 return None
             
-            params = {
-                'date_from': (datetime.now() - timedelta(hours=1)).isoformat() + 'Z',
-                'date_to': datetime.now().isoformat() + 'Z',
-                'coordinates': f"{coords['lat']},{coords['lon']}",
-                'radius': 10000,  # 10km radius
-                'parameter': 'pm25,o3,no2,co',
-                'limit': 100,
-                'order_by': 'datetime',
-                'sort': 'desc'
-            }
+            params = self._openaq_params(coords)
             
             headers = {'X-API-Key': self.openaq_api_key}
             
@@ -115,23 +162,62 @@ class RealtimeDataSource:
             logger.error(f"Error fetching OpenAQ data: {str(e)}")
             return None
     
+    async def _fetch_openaq_data_async(self, location: str) -> Optional[Dict[str, Any]]:
+        try:
+            coords = await self._get_location_coordinates_async(location)
+            if not coords:
+                return None
+            
+            response = await self._client().get(OPENAQ_MEASUREMENTS_URL, params=self._openaq_params(coords),
+                                                headers={'X-API-Key': self.openaq_api_key})
+            if response.status_code == 200:
+                measurements = response.json().get('results', [])
+                if measurements:
+                    return self._process_openaq_measurements(measurements, location)
+            
+            return None
+            
+        except Exception as e:
+            logger.error(f"Error fetching OpenAQ data: {str(e)}")
+            return None
+    
+    def _client(self):
+        if self._async_client is None:
+            import httpx  # only needed in ASGI mode
+            self._async_client = httpx.AsyncClient(timeout=10)
+        return self._async_client
+    
+    @staticmethod
+    def _parse_coordinates(location: str) -> Optional[Dict[str, float]]:
+        """Coordinates given directly as "lat,lon", or None"""
+        if ',' in location:
+            try:
+                parts = location.split(',')
+                if len(parts) == 2:
+                    lat, lon = float(parts[0].strip()), float(parts[1].strip())
+                    if -90 <= lat <= 90 and -180 <= lon <= 180:
+                        return {'lat': lat, 'lon': lon}
+            except ValueError:
+                pass
+        return None
+    
+    async def _get_location_coordinates_async(self, location: str) -> Optional[Dict[str, float]]:
+        coords = self._parse_coordinates(location)
+        if coords:
+            return coords
+        coords = await geocoding_service.geocode_async(location)
+        if coords:
+            return {'lat': coords['lat'], 'lon': coords['lon']}
+        logger.warning(f"Could not geocode location: {location}. Using simulated data.")
+        return None
+    
     def _get_location_coordinates(self, location: str) -> Optional[Dict[str, float]]:
         """Get coordinates for any location using geocoding"""
         try:
             # Try to extract coordinates if they're already provided
-            if ',' in location:
-                try:
-                    parts = location.split(',')
-                    if len(parts) == 2:
-                        lat, lon = float(parts[0].strip()), float(parts[1].strip())
-                        if -90 <= lat <= 90 and -180 <= lon <= 180:
-                            return {'lat': lat, 'lon': lon}
-                except ValueError:
-                    pass
-            
-            # Use the existing geocoding service
-            from .geocoding import GeocodingService
-            geocoding_service = GeocodingService()
+            coords = self._parse_coordinates(location)
+            if coords:
+                return coords
             
             # Get coordinates for the location
             coords = geocoding_service.geocode(location)
@@ -234,7 +320,9 @@ class RealtimeDataSource:
         if cache_key in self.historical_cache:
             cached_data = self.historical_cache[cache_key]
             if datetime.now() - cached_data['timestamp'] < timedelta(seconds=self.historical_cache_duration):
+                record_cache('realtime_historical', True)
                 return cached_data['data']
+        record_cache('realtime_historical', False)
         
         try:
             # Get sensors for location
@@ -248,7 +336,7 @@ class RealtimeDataSource:
             
             # Fetch historical data from OpenAQ
             for sensor_id in sensor_ids:
-                url = "https://api.openaq.org/v2/measurements"
+                url = OPENAQ_MEASUREMENTS_URL
                 params = {
                     'date_from': start_date.isoformat() + 'Z',
                     'date_to': end_date.isoformat() + 'Z',
@@ -288,36 +376,25 @@ class RealtimeDataSource:
         if cache_key in self.sensor_cache:
             cached_data = self.sensor_cache[cache_key]
             if datetime.now() - cached_data['timestamp'] < timedelta(seconds=self.sensor_cache_duration):
+                record_cache('realtime_sensors', True)
                 return cached_data['sensor_ids']
+        record_cache('realtime_sensors', False)
         
         try:
             coords = self._get_location_coordinates(location)
             if not coords:
                 return []
             
-            url = "https://api.openaq.org/v2/sensors"
-            params = {
-                'coordinates': f"{coords['lat']},{coords['lon']}",
-                'radius': 10000,  # 10km radius
-                'limit': 100
-            }
+            # Stations within 10km, from the cached station catalog
+            sensor_ids = self.station_catalog.sensor_ids_near(coords['lat'], coords['lon'], radius_km=10)
             
-            headers = {'X-API-Key': self.openaq_api_key}
-            response = requests.get(url, params=params, headers=headers, timeout=10)
+            # Cache the sensor IDs
+            self.sensor_cache[cache_key] = {
+                'sensor_ids': sensor_ids,
+                'timestamp': datetime.now()
+            }
             
-            if response.status_code == 200:
-                data = response.json()
-                sensor_ids = [sensor['sensor_id'] for sensor in data.get('results', [])]
-                
-                # Cache the sensor IDs
-                self.sensor_cache[cache_key] = {
-                    'sensor_ids': sensor_ids,
-                    'timestamp': datetime.now()
-                }
-                
-                return sensor_ids
-                
-            return []
+            return sensor_ids
             
         except Exception as e:
             logger.error(f"Error fetching sensors for {location}: {str(e)}")
@@ -484,7 +561,12 @@ class RealtimeDataSource:
     
     def get_dashboard_data(self, location: str) -> Dict[str, Any]:
         """Generate dashboard JSON data for frontend visualization"""
-        realtime_data = self.get_realtime_data(location)
+        return self._build_dashboard_data(location, self.get_realtime_data(location))
+    
+    async def get_dashboard_data_async(self, location: str) -> Dict[str, Any]:
+        return self._build_dashboard_data(location, await self.get_realtime_data_async(location))
+    
+    def _build_dashboard_data(self, location: str, realtime_data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         if not realtime_data:
             return {}
         
@@ -619,11 +701,8 @@ class RealtimeDataSource:
         """Get active alerts for location"""
         try:
             from .alert_system import alert_system
-            # Get recent alerts for this location
-            alerts = alert_system.get_alert_history(location=location, hours=1)
-            # Filter for unresolved alerts
-            active_alerts = [alert for alert in alerts if not alert.get('is_resolved', True)]
-            return active_alerts
+            # Open breaches come straight from the per-threshold alert state
+            return alert_system.get_active_alerts(location)
         except Exception as e:
             logger.error(f"Error getting active alerts: {e}")
             return []
@@ -644,11 +723,13 @@ class RealtimeDataSource:
         return warnings
     
     def start_monitoring(self, alert_system):
-        """Start monitoring all locations for alerts"""
+        """Start monitoring all locations for alerts (no-op if already running)"""
         def monitoring_loop():
             while True:
                 try:
-                    for location in list(self.monitoring_locations):
+                    with self._monitoring_lock:
+                        locations = list(self.monitoring_locations)
+                    for location in locations:
                         data = self.get_realtime_data(location)
                         if data:
                             # Check for alerts
@@ -659,16 +740,26 @@ class RealtimeDataSource:
                                 logger.info(f"Alert triggered for {location}: {alert.message}")
                     
                     # Wait before next check
-                    time.sleep(60)  # Check every minute
+                    self.last_monitoring_pass = time.time()
+                    time.sleep(self.monitoring_interval_seconds)
                     
                 except Exception as e:
                     logger.error(f"Error in monitoring loop: {e}")
                     time.sleep(30)
         
         # Start monitoring in background thread
-        monitoring_thread = threading.Thread(target=monitoring_loop, daemon=True)
-        monitoring_thread.start()
+        with self._monitoring_lock:
+            if self.monitoring_thread is not None and self.monitoring_thread.is_alive():
+                return
+            self.monitoring_thread = threading.Thread(target=monitoring_loop, name='realtime-monitoring', daemon=True)
+            self.monitoring_thread.start()
         logger.info("Real-time monitoring started")
+    
+    def monitoring_lag_seconds(self) -> Optional[float]:
+        """How far the monitoring loop is behind its schedule (None if it hasn't completed a pass)"""
+        if self.last_monitoring_pass is None:
+            return None
+        return max(0.0, time.time() - self.last_monitoring_pass - self.monitoring_interval_seconds)
 
 # Global data source instance
 realtime_data_source = RealtimeDataSource()
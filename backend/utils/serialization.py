@@ -0,0 +1,91 @@
+"""
+JSON serialization for AuraCast responses
+Encodes numpy scalars and arrays (floats rounded to FLOAT_DECIMALS places) and
+datetimes as they are met, so results no longer need converting to Python
+types first. Uses orjson when it is installed and the stdlib encoder otherwise;
+note the stdlib encoder writes numpy float64 scalars (a float subclass) unrounded.
+"""
+
+import json
+from datetime import date, datetime, time
+from typing import Any, Callable, Optional
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Decimal places kept for numpy floats (model outputs) in responses
+FLOAT_DECIMALS = 2
+
+
+def encode_value(obj: Any, decimals: int = FLOAT_DECIMALS) -> Any:
+    """JSON-ready form of a value the encoders don't handle themselves"""
+    if isinstance(obj, np.floating):
+        return round(float(obj), decimals)
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.bool_):
+        return bool(obj)
+    if isinstance(obj, np.ndarray):
+        if obj.dtype.kind == 'f':
+            obj = np.round(obj, decimals)
+        return obj.tolist()
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _default_for(fallback: Optional[Callable[[Any], Any]]) -> Callable[[Any], Any]:
+    if fallback is None:
+        return encode_value
+
+    def default(obj: Any) -> Any:
+        try:
+            return encode_value(obj)
+        except TypeError:
+            return fallback(obj)
+    return default
+
+
+def dumps_bytes(obj: Any, indent: bool = False, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """UTF-8 JSON; ``default`` is tried for values encode_value can't handle (e.g. ``str``)"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=_default_for(default), option=option)
+    return dumps(obj, indent, default).encode('utf-8')
+
+
+def dumps(obj: Any, indent: bool = False, default: Optional[Callable[[Any], Any]] = None) -> str:
+    if orjson is not None:
+        return dumps_bytes(obj, indent, default).decode('utf-8')
+    return json.dumps(obj, default=_default_for(default), ensure_ascii=False,
+                      indent=2 if indent else None, separators=None if indent else (',', ':'))
+
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider (jsonify, request.get_json) backed by this module"""
+
+    # Keys in the order responses are built, rather than sorted
+    sort_keys = False
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return dumps(obj)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
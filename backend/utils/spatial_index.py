@@ -0,0 +1,79 @@
+"""
+Spatial index for AuraCast
+Nearest-neighbour and radius queries over lat/lon points using a k-d tree on
+unit-sphere coordinates. Straight-line (chord) distance between unit vectors
+grows monotonically with great-circle distance, so the tree gives exact
+haversine neighbours.
+"""
+
+import math
+from typing import Generic, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+EARTH_RADIUS_KM = 6371.0088
+
+T = TypeVar('T')
+
+
+def to_unit_vectors(lats, lons) -> np.ndarray:
+    """Convert degrees to (n, 3) points on the unit sphere"""
+    lat = np.radians(np.asarray(lats, dtype=np.float64))
+    lon = np.radians(np.asarray(lons, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack((cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)))
+
+
+def km_to_chord(km: float) -> float:
+    return 2 * math.sin(min(km / EARTH_RADIUS_KM, math.pi) / 2)
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+class SpatialIndex(Generic[T]):
+    """Immutable point index returning (item, distance_km) pairs, nearest first"""
+
+    def __init__(self, lats: Sequence[float], lons: Sequence[float], items: Sequence[T]):
+        self.items = list(items)
+        self._tree = cKDTree(to_unit_vectors(lats, lons)) if self.items else None
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def nearest(self, lat: float, lon: float, k: int = 1,
+                max_km: Optional[float] = None) -> List[Tuple[T, float]]:
+        """Up to ``k`` closest items, optionally no further than ``max_km``"""
+        if self._tree is None or k <= 0:
+            return []
+        upper = km_to_chord(max_km) if max_km is not None else np.inf
+        distances, indices = self._tree.query(to_unit_vectors([lat], [lon])[0],
+                                              k=min(k, len(self.items)),
+                                              distance_upper_bound=upper)
+        distances, indices = np.atleast_1d(distances), np.atleast_1d(indices)
+        found = indices < len(self.items)
+        return [
+            (self.items[i], float(km))
+            for i, km in zip(indices[found], chord_to_km(distances[found]))
+        ]
+
+    def within(self, lat: float, lon: float, radius_km: float,
+               limit: Optional[int] = None) -> List[Tuple[T, float]]:
+        """Items within ``radius_km``, nearest first"""
+        if self._tree is None:
+            return []
+        point = to_unit_vectors([lat], [lon])[0]
+        indices = self._tree.query_ball_point(point, km_to_chord(radius_km))
+        if not indices:
+            return []
+        indices = np.asarray(indices)
+        chords = np.linalg.norm(self._tree.data[indices] - point, axis=1)
+        order = np.argsort(chords)
+        if limit is not None:
+            order = order[:limit]
+        return [
+            (self.items[i], float(km))
+            for i, km in zip(indices[order], chord_to_km(chords[order]))
+        ]
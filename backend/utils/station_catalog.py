@@ -0,0 +1,194 @@
+"""
+OpenAQ station catalog for AuraCast
+Keeps monitoring locations (and their sensor IDs) in a local k-d tree so
+"which stations are near here?" is answered in-process. Stations are fetched
+from OpenAQ one grid cell at a time, the first time any query touches that
+cell, and persisted in the shared on-disk cache. The cells a query needs are
+fetched in parallel without holding the catalog lock.
+"""
+
+import logging
+import math
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import requests
+
+from .caching import MISSING, PersistentCache
+from .spatial_index import SpatialIndex
+
+logger = logging.getLogger(__name__)
+
+OPENAQ_BASE_URL = os.getenv('OPENAQ_BASE_URL', "https://api.openaq.org").rstrip('/')
+OPENAQ_LOCATIONS_URL = f"{OPENAQ_BASE_URL}/v2/locations"
+
+# Grid cells are CELL_DEGREES on a side; each is fetched as a circle around its
+# centre that covers the whole cell (OpenAQ caps the radius at 25 km)
+CELL_DEGREES = 0.2
+CELL_FETCH_RADIUS_M = 25000
+STATION_CATALOG_TTL_SECONDS = 24 * 3600
+
+# A cell whose fetch failed is not retried for this long
+FAILED_CELL_RETRY_SECONDS = 300
+
+# Cells a query needs are fetched in parallel, this many at a time
+CELL_FETCH_WORKERS = 4
+# A query needing a cell another query is fetching waits this long for it
+CELL_WAIT_SECONDS = 15
+
+
+def _cell(lat: float, lon: float) -> Tuple[int, int]:
+    return math.floor(lat / CELL_DEGREES), math.floor(lon / CELL_DEGREES)
+
+
+def _cell_key(cell: Tuple[int, int]) -> str:
+    return f"{cell[0]}:{cell[1]}"
+
+
+class StationCatalog:
+    """Lazily-filled, disk-cached catalog of OpenAQ stations with a spatial index"""
+
+    def __init__(self, api_key: Optional[str] = None, cache: Optional[PersistentCache] = None):
+        self.api_key = api_key
+        self.cache = cache or PersistentCache('openaq_stations', STATION_CATALOG_TTL_SECONDS)
+        self.stations: Dict[int, Dict[str, Any]] = {}
+        self._loaded_cells: Set[Tuple[int, int]] = set()
+        self._failed_cells: Dict[Tuple[int, int], float] = {}
+        self._inflight: Dict[Tuple[int, int], Future] = {}
+        self._index: SpatialIndex = SpatialIndex([], [], [])
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def stations_near(self, lat: float, lon: float, radius_km: float = 10,
+                      limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Stations within ``radius_km``, nearest first, each with a 'distance_km'"""
+        self._ensure_cells(self._cells_covering(lat, lon, radius_km))
+        return [
+            dict(station, distance_km=round(km, 3))
+            for station, km in self._index.within(lat, lon, radius_km, limit=limit)
+        ]
+
+    def nearest_station(self, lat: float, lon: float, max_km: float = 25) -> Optional[Dict[str, Any]]:
+        stations = self.stations_near(lat, lon, max_km, limit=1)
+        return stations[0] if stations else None
+
+    def sensor_ids_near(self, lat: float, lon: float, radius_km: float = 10) -> List[int]:
+        sensor_ids = []
+        for station in self.stations_near(lat, lon, radius_km):
+            sensor_ids.extend(station['sensor_ids'])
+        return sensor_ids
+
+    @staticmethod
+    def _cells_covering(lat: float, lon: float, radius_km: float) -> Set[Tuple[int, int]]:
+        """Grid cells overlapping the bounding box of a circle"""
+        dlat = radius_km / 111.0
+        dlon = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+        south, west = _cell(max(lat - dlat, -90.0), lon - dlon)
+        north, east = _cell(min(lat + dlat, 90.0), lon + dlon)
+        return {(i, j) for i in range(south, north + 1) for j in range(west, east + 1)}
+
+    def _ensure_cells(self, cells: Iterable[Tuple[int, int]]):
+        now = time.time()
+        owned: List[Tuple[int, int]] = []
+        shared: List[Future] = []
+        with self._lock:
+            for cell in cells:
+                if cell in self._loaded_cells or now - self._failed_cells.get(cell, 0.0) < FAILED_CELL_RETRY_SECONDS:
+                    continue
+                future = self._inflight.get(cell)
+                if future is None:
+                    self._inflight[cell] = Future()
+                    owned.append(cell)
+                else:
+                    shared.append(future)  # another query is already loading it
+
+        if owned:
+            # Loaded without the lock held, so other lookups keep using the index meanwhile
+            try:
+                loaded = self._load_cells(owned)
+                with self._lock:
+                    added = False
+                    for cell, stations in loaded.items():
+                        if stations is None:
+                            self._failed_cells[cell] = now  # transient failure; retry later
+                            continue
+                        for station in stations:
+                            self.stations[station['id']] = station
+                        self._loaded_cells.add(cell)
+                        self._failed_cells.pop(cell, None)
+                        added = added or bool(stations)
+
+                    if added:
+                        stations = list(self.stations.values())
+                        self._index = SpatialIndex(
+                            [s['lat'] for s in stations], [s['lon'] for s in stations], stations
+                        )
+            finally:
+                with self._lock:
+                    futures = [self._inflight.pop(cell) for cell in owned]
+                for future in futures:
+                    future.set_result(None)
+
+        if shared:
+            wait(shared, timeout=CELL_WAIT_SECONDS)
+
+    def _load_cells(self, cells: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Optional[List[Dict[str, Any]]]]:
+        """Stations per cell from the disk cache, or fetched from OpenAQ in parallel (None if that failed)"""
+        loaded = {cell: self.cache.get(_cell_key(cell)) for cell in cells}
+        to_fetch = [cell for cell, stations in loaded.items() if stations is MISSING]
+        if to_fetch:
+            with ThreadPoolExecutor(max_workers=min(len(to_fetch), CELL_FETCH_WORKERS),
+                                    thread_name_prefix='station-catalog') as pool:
+                for cell, stations in zip(to_fetch, pool.map(self._fetch_cell, to_fetch)):
+                    if stations is not None:
+                        self.cache.set(_cell_key(cell), stations)
+                    loaded[cell] = stations
+        return loaded
+
+    def _fetch_cell(self, cell: Tuple[int, int]) -> Optional[List[Dict[str, Any]]]:
+        """Stations inside one grid cell, or None if OpenAQ could not be reached"""
+        south, west = cell[0] * CELL_DEGREES, cell[1] * CELL_DEGREES
+        params = {
+            'coordinates': f"{south + CELL_DEGREES / 2:.4f},{west + CELL_DEGREES / 2:.4f}",
+            'radius': CELL_FETCH_RADIUS_M,
+            'limit': 1000
+        }
+        headers = {'X-API-Key': self.api_key} if self.api_key else {}
+        try:
+            response = requests.get(OPENAQ_LOCATIONS_URL, params=params, headers=headers, timeout=10)
+            if response.status_code != 200:
+                logger.warning(f"OpenAQ locations request failed for cell {cell}: HTTP {response.status_code}")
+                return None
+            results = response.json().get('results', [])
+        except Exception as e:
+            logger.error(f"Error fetching OpenAQ stations for cell {cell}: {e}")
+            return None
+
+        stations = []
+        for result in results:
+            station = self._parse_station(result)
+            # The fetch circle spills into neighbouring cells; keep only this cell's stations
+            if station and _cell(station['lat'], station['lon']) == cell:
+                stations.append(station)
+        return stations
+
+    @staticmethod
+    def _parse_station(result: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        coordinates = result.get('coordinates') or {}
+        if coordinates.get('latitude') is None or coordinates.get('longitude') is None:
+            return None
+        sensors = result.get('sensors') or result.get('parameters') or []
+        return {
+            'id': result['id'],
+            'name': result.get('name'),
+            'lat': float(coordinates['latitude']),
+            'lon': float(coordinates['longitude']),
+            'sensor_ids': [s['id'] for s in sensors if 'id' in s],
+            'parameters': sorted({s.get('parameter', {}).get('name') if isinstance(s.get('parameter'), dict)
+                                  else s.get('parameter') for s in sensors} - {None})
+        }
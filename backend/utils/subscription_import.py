@@ -0,0 +1,192 @@
+"""
+Bulk Subscription Import for AuraCast Alerts
+Parses NDJSON/CSV subscription batches, validates and geocodes them once per
+unique location, and inserts each location's rows in one transaction as soon
+as that location resolves
+"""
+
+import csv
+import io
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .alert_system import AlertSystem, AlertType
+from .alert_templates import AlertTemplates
+
+logger = logging.getLogger(__name__)
+
+# Largest batch accepted in a single request
+MAX_BULK_ROWS = 50000
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonlines')
+CSV_TYPES = ('text/csv', 'application/csv')
+
+
+def parse_subscription_rows(body: str, content_type: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (row_number, row) pairs from an NDJSON, CSV or JSON array body
+
+    Rows that cannot be decoded are yielded as exceptions so the caller can
+    report them against their row number.
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+
+    if content_type in CSV_TYPES:
+        reader = csv.DictReader(io.StringIO(body))
+        for row_number, row in enumerate(reader, start=1):
+            yield row_number, {k.strip(): v.strip() for k, v in row.items() if k and v}
+        return
+
+    if content_type == 'application/json':
+        try:
+            rows = json.loads(body)
+        except json.JSONDecodeError as e:
+            yield 1, ValueError(f"Invalid JSON: {e}")
+            return
+        if not isinstance(rows, list):
+            rows = rows.get('subscriptions', []) if isinstance(rows, dict) else []
+        for row_number, row in enumerate(rows, start=1):
+            yield row_number, row
+        return
+
+    # NDJSON (default)
+    row_number = 0
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            yield row_number, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, ValueError(f"Invalid JSON: {e}")
+
+
+class SubscriptionImporter:
+    """Validates, geocodes and inserts subscription batches"""
+
+    def __init__(self, alert_system: AlertSystem, geocoding_service=None):
+        self.alert_system = alert_system
+        self.geocoding_service = geocoding_service
+
+    def run(self, rows: Iterable[Tuple[int, Any]]) -> Iterator[Dict[str, Any]]:
+        """Import rows, yielding one result per row as it is decided, then a summary
+
+        Invalid rows are reported first. Valid rows are inserted and reported
+        location by location as geocoding resolves, so rows for gazetteer and
+        cache hits don't wait behind names queued for Nominatim.
+        """
+        summary = {'created': 0, 'exists': 0, 'error': 0}
+
+        def report(result: Dict[str, Any]) -> Dict[str, Any]:
+            summary[result['status']] += 1
+            return result
+
+        # 1. Validate every row, grouping valid ones by location
+        by_location: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        for row_number, row in rows:
+            if row_number > MAX_BULK_ROWS:
+                yield report(self._error(row_number, f"Batch limit of {MAX_BULK_ROWS} rows exceeded"))
+                break
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                item = self._validate_row(row)
+            except (ValueError, KeyError, TypeError) as e:
+                yield report(self._error(row_number, str(e)))
+                continue
+            by_location.setdefault(item['location'].lower(), []).append((row_number, item))
+
+        # 2. Geocode each distinct location once; 3. insert its rows in one transaction
+        for group, coords, source in self._geocoded_groups(by_location):
+            if self.geocoding_service is not None and coords is None:
+                reason = 'Geocoding timed out for' if source == 'timeout' else 'Could not geocode'
+                for row_number, item in group:
+                    yield report(self._error(row_number, f"{reason} location: {item['location']}"))
+                continue
+
+            for row_number, item in group:
+                item['coordinates'] = coords
+            inserted = self.alert_system.bulk_subscribe([item for _, item in group])
+            for (row_number, item), outcome in zip(group, inserted):
+                yield report({
+                    'row': row_number,
+                    'status': 'created' if outcome['created'] else 'exists',
+                    'alert_id': outcome['alert_id'],
+                    'location': item['location'],
+                    'alert_type': item['alert_type'].value,
+                    'template_id': item.get('template_id')
+                })
+
+        logger.info(f"Bulk import finished: {summary}")
+        yield {'summary': dict(summary, total=sum(summary.values()))}
+
+    def _validate_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Turn a raw row into subscribe_user_alert keyword arguments"""
+        if not isinstance(row, dict):
+            raise ValueError("Row must be an object")
+
+        contact_info = row.get('contact_info') or row.get('user_id')
+        if not contact_info:
+            raise ValueError("Missing required field: contact_info")
+
+        location = (row.get('location') or '').strip()
+        if not location:
+            raise ValueError("Missing required field: location")
+
+        notification_methods = row.get('notification_methods') or row.get('notification_method')
+        if not notification_methods:
+            raise ValueError("Missing required field: notification_methods")
+        if isinstance(notification_methods, str):
+            notification_methods = [m.strip() for m in notification_methods.replace(';', ',').split(',') if m.strip()]
+
+        template_id = row.get('template_id')
+        if template_id:
+            subscription = AlertTemplates.create_subscription_from_template(
+                template_id=template_id,
+                user_id=contact_info,
+                location=location,
+                notification_methods=notification_methods
+            )
+            alert_type = AlertType(subscription['alert_type'])
+            thresholds = subscription['custom_thresholds']
+        else:
+            try:
+                alert_type = AlertType(row.get('alert_type') or AlertType.GENERAL.value)
+            except ValueError:
+                raise ValueError(f"Invalid alert_type. Must be one of: {[t.value for t in AlertType]}")
+            thresholds = row.get('custom_thresholds')
+            if thresholds:
+                thresholds = [self.alert_system._coerce_threshold(t) for t in thresholds]
+
+        return {
+            'user_id': contact_info,
+            'location': location,
+            'alert_type': alert_type,
+            'notification_methods': notification_methods,
+            'custom_thresholds': thresholds,
+            'template_id': template_id
+        }
+
+    def _geocoded_groups(self, by_location: Dict[str, List[Tuple[int, Dict[str, Any]]]]
+                         ) -> Iterator[Tuple[List[Tuple[int, Dict[str, Any]]], Optional[Dict[str, float]], str]]:
+        """(rows, coordinates or None, geocoding source) per location, in the order locations resolve"""
+        if self.geocoding_service is None:
+            for group in by_location.values():
+                yield group, None, 'skipped'
+            return
+
+        remaining = dict(by_location)
+        names = [group[0][1]['location'] for group in by_location.values()]
+        try:
+            for location, coords, source in self.geocoding_service.geocode_many(names):
+                group = remaining.pop(location.lower(), None)
+                if group is not None:
+                    yield group, ({'lat': coords['lat'], 'lon': coords['lon']} if coords else None), source
+        except Exception as e:
+            logger.error(f"Geocoding failed during bulk import: {e}")
+        for group in remaining.values():
+            yield group, None, 'error'
+    
+    @staticmethod
+    def _error(row_number: int, message: str) -> Dict[str, Any]:
+        return {'row': row_number, 'status': 'error', 'message': message}
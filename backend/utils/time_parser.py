@@ -235,7 +235,9 @@ class TimeParser:
     
     def _apply_specific_time(self, time_desc: str, target_datetime: datetime) -> datetime:
         """Apply specific time (3 PM, 10:30 AM, etc.)"""
-        match = re.search(self.time_patterns['specific_time'], time_desc)
+        # A bare number is not a clock time ("in 3 hours", "PM2.5")
+        match = next((m for m in re.finditer(self.time_patterns['specific_time'], time_desc)
+                      if m.group(2) or m.group(3)), None)
         if not match:
             return target_datetime
             